@@ -1,13 +1,39 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse
 from fastapi.templating import Jinja2Templates
 import os 
+import signal
+import asyncio
 from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
 
 from .api_routers import llm_test
 from .api_routers import prompt
-from db.utils import make_db_from_env, get_conn
+from .api_routers import batch
+from .api_routers import history
+from .api_routers import export
+from db.utils import make_db_from_env, make_role_cache, make_role_search_index, make_history_writer, get_conn
+from model.gemini_utils import shutdown_executor, model_registry, gemini_api_certification
+from model.context_cache import make_context_cache_from_settings
+from utils.response_cache import make_response_cache_from_settings
+from utils.rate_limit import make_rate_limiter_from_settings
+from utils.hedge import make_hedger_from_settings
+from utils.single_flight import SingleFlight
+from utils.preflight import make_preflight_from_settings
+from utils.shared_state import make_shared_state_from_settings, ROLE_CACHE_CHANNEL
+from utils.cancellation import CancelRegistry, CANCEL_CHANNEL
+from utils.batch import BatchJobManager
+from utils.metrics import render_metrics, METRICS_CONTENT_TYPE
+from utils.log import setup_logging, shutdown_logging, get_logger, RequestIdMiddleware
+from utils.compression import CompressionMiddleware
+from utils.http_cache import FingerprintedStaticFiles, static_assets
+from utils.startup import StartupTracker, ReadinessMiddleware
+from config.base import settings
+from config.db import db_settings
+from metadata.script_format.main_script_format import TEST_SYSTEM_PROMPT
+
+logger = get_logger("app")
 
 def create_app() -> FastAPI:
 
@@ -17,6 +43,22 @@ def create_app() -> FastAPI:
         version="1.0.0"
     )
 
+    ## 구조화 로깅: 백그라운드 writer 시작, 요청마다 request_id 부여
+    setup_logging()
+    app.add_middleware(RequestIdMiddleware)
+
+    ## 시작 준비(DB 연결 풀, 모델 클라이언트 등)가 끝나기 전의 요청은 503 (/_internal, /metrics 제외)
+    app.add_middleware(ReadinessMiddleware)
+
+    ## JSON/정적 파일 응답 압축 (SSE 스트리밍 응답은 제외)
+    if settings.COMPRESSION_ENABLED:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.COMPRESSION_MIN_SIZE,
+            gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+            brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+        )
+
     # CORS 미들웨어 설정
     app.add_middleware(
         CORSMiddleware,
@@ -26,33 +68,186 @@ def create_app() -> FastAPI:
         allow_headers=["*"],  
     )
 
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+    ## 템플릿의 static_url()이 만든 fingerprint URL(?v=해시)은 immutable 장기 캐시
+    app.mount("/static", FingerprintedStaticFiles(directory="static", assets=static_assets), name="static")
 
     app.include_router(llm_test.router)
     app.include_router(prompt.router)
+    app.include_router(batch.router)
+    app.include_router(history.router)
+    app.include_router(export.router)
 
-    async def _startup() -> None:
+    async def _init_models() -> None:
+        ## Gemini 인증(자격 증명 로드 + genai import)과 모델 클라이언트 생성은 블로킹이므로 스레드에서
+        if settings.GEMINI_BACKEND in ("gemini", "record"):
+            await run_in_threadpool(gemini_api_certification)
+        await run_in_threadpool(model_registry.warm, settings.GEMINI_MODELS)
+
+    async def _init_db() -> None:
+        ## Cloud SQL 커넥터 생성(자격 증명 로드)도 블로킹이므로 스레드에서
+        app.state.cloudsql_db = await run_in_threadpool(make_db_from_env)
+        ## 연결 테스트 겸 풀 예열: DB_POOL_WARMUP 개의 연결을 병렬로 생성
         try:
-            app.state.cloudsql_db = make_db_from_env()
+            warmup_s = await run_in_threadpool(
+                app.state.cloudsql_db.warm_up, max(1, db_settings.DB_POOL_WARMUP)
+            )
+            logger.info("DB 연결 풀 예열 완료: %d개, %.4f s", max(1, db_settings.DB_POOL_WARMUP), warmup_s)
+        except Exception as e:
+            raise RuntimeError(f"DB 연결 테스트 실패: {e}")
+
+        ## LocalDatabase(DB_LOCAL_ASYNC_URL)는 생성 시 async 엔진을 이미 갖고 있음
+        if db_settings.DB_ASYNC_ENABLED and app.state.cloudsql_db.async_engine is None:
+            await app.state.cloudsql_db.init_async_engine(
+                db_settings.DB_ASYNC_DRIVER, db_settings.DB_ASYNC_API_DRIVER
+            )
+        if app.state.cloudsql_db.async_engine is not None and db_settings.DB_POOL_WARMUP:
+            await app.state.cloudsql_db.warm_up_async(db_settings.DB_POOL_WARMUP)
+
+        app.state.role_cache = make_role_cache(app.state.cloudsql_db)
+        app.state.role_cache_watcher = asyncio.create_task(app.state.role_cache.run_version_watcher())
+        ## 멀티 워커: 다른 워커에서 발생한 무효화를 받아 이 워커의 캐시에도 적용
+        if app.state.shared_state is not None:
+            role_cache = app.state.role_cache
+            app.state.role_cache_listener = asyncio.create_task(
+                app.state.shared_state.listen(ROLE_CACHE_CHANNEL, lambda msg: role_cache.invalidate(msg.get("role_id")))
+            )
+
+        ## role 검색 색인: role 캐시가 무효화되면(버전 변경, 다른 워커의 무효화 포함) 함께 갱신
+        if db_settings.ROLE_SEARCH_ENABLED:
+            app.state.role_search = make_role_search_index(app.state.cloudsql_db)
+            app.state.role_cache.add_listener(app.state.role_search.on_invalidate)
+            try:
+                await app.state.role_search.rebuild()
+            except Exception as e:
+                logger.warning("Role 검색 색인 생성 실패, 다음 무효화 때 다시 시도합니다: %s", e)
+
+        ## 쿼리 이력 writer: 테이블 생성 실패 시(권한 등) 이력 저장만 끄고 계속 진행
+        if db_settings.HISTORY_ENABLED:
+            history_writer = make_history_writer(app.state.cloudsql_db)
             try:
-                engine = app.state.cloudsql_db.get_engine()
-                with engine.connect() as conn:
-                    pass
+                await run_in_threadpool(history_writer.create_table)
+                history_writer.start()
+                app.state.history_writer = history_writer
             except Exception as e:
-                raise RuntimeError(f"DB 연결 테스트 실패: {e}")
+                logger.warning("쿼리 이력 테이블 준비 실패, 이력 저장을 비활성화합니다: %s", e)
+
+    async def _warm_up() -> None:
+        tracker: StartupTracker = app.state.startup
+        try:
+            ## 서로 독립적인 단계(모델 클라이언트, DB 연결 풀)는 동시에 진행
+            async def _models():
+                async with tracker.step("models"):
+                    await _init_models()
+
+            async def _db():
+                async with tracker.step("db"):
+                    await _init_db()
+
+            await asyncio.gather(_models(), _db())
+
+            ## 배치 작업 관리자: 이전에 중단된 작업은 이어서 실행 (DB, 모델 준비 후)
+            async with tracker.step("batch_jobs"):
+                app.state.batch_jobs = BatchJobManager(
+                    settings.BATCH_JOBS_DIR,
+                    role_cache=app.state.role_cache,
+                    rate_limiter=app.state.rate_limiter,
+                    preflight=app.state.preflight,
+                    shared_state=app.state.shared_state,
+                    default_concurrency=settings.BATCH_DEFAULT_CONCURRENCY,
+                    default_qps=settings.BATCH_DEFAULT_QPS,
+                )
+                ## 멀티 워커: 작업별 잠금을 얻은 워커 하나만 재개, 다른 워커로 들어온 취소는 소유 워커가 처리
+                await app.state.batch_jobs.resume_incomplete()
+                if app.state.shared_state is not None:
+                    app.state.batch_cancel_listener = asyncio.create_task(app.state.batch_jobs.listen_for_cancels())
+            tracker.mark_ready()
         except Exception as e:
+            tracker.mark_failed(e)
             raise
 
+    def _on_warm_up_done(task: asyncio.Task) -> None:
+        if task.cancelled() or task.exception() is None:
+            return
+        logger.error("백그라운드 시작 준비 실패", exc_info=task.exception())
+        if settings.STARTUP_EXIT_ON_FAILURE:
+            ## 준비되지 않은 채 계속 떠 있지 않도록 종료 -> 프로세스 관리자(gunicorn, Cloud Run 등)가 다시 시작
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    async def _startup() -> None:
+        app.state.startup = StartupTracker()
+        app.state.response_cache = make_response_cache_from_settings(settings)
+        app.state.shared_state = make_shared_state_from_settings(settings)
+        app.state.rate_limiter = make_rate_limiter_from_settings(settings, app.state.shared_state)
+        app.state.hedger = make_hedger_from_settings(settings)
+        app.state.cancel_registry = CancelRegistry()
+        ## 멀티 워커: 다른 워커로 들어온 /cancel 요청을 받아 이 워커의 스트림에 적용
+        if app.state.shared_state is not None:
+            cancel_registry = app.state.cancel_registry
+            app.state.cancel_listener = asyncio.create_task(
+                app.state.shared_state.listen(
+                    CANCEL_CHANNEL, lambda msg: cancel_registry.cancel(msg.get("request_id"), record=False)
+                )
+            )
+        app.state.preflight = make_preflight_from_settings(settings, TEST_SYSTEM_PROMPT)
+        app.state.context_cache = make_context_cache_from_settings(settings, TEST_SYSTEM_PROMPT)
+        app.state.single_flight = SingleFlight() if settings.SINGLE_FLIGHT_ENABLED else None
+
+        if settings.STARTUP_BACKGROUND:
+            ## 준비가 끝나기 전에는 /_internal/ready 가 503 (실패 시 error 표시)
+            app.state.startup_task = asyncio.create_task(_warm_up())
+            app.state.startup_task.add_done_callback(_on_warm_up_done)
+        else:
+            await _warm_up()
+
     ## Shutdown: 리소스 정리
     async def _shutdown() -> None:
+        startup_task = getattr(app.state, "startup_task", None)
+        if startup_task and not startup_task.done():
+            startup_task.cancel()
+        batch_jobs = getattr(app.state, "batch_jobs", None)
+        if batch_jobs:
+            await batch_jobs.shutdown()
+        for name in ("role_cache_watcher", "role_cache_listener", "cancel_listener", "batch_cancel_listener"):
+            task = getattr(app.state, name, None)
+            if task:
+                task.cancel()
+        role_search = getattr(app.state, "role_search", None)
+        if role_search:
+            await role_search.close()
+        ## 버퍼에 남은 쿼리 이력을 DB 종료 전에 모두 저장
+        history_writer = getattr(app.state, "history_writer", None)
+        if history_writer:
+            await history_writer.close()
         db: CloudSQLDatabase = getattr(app.state, "cloudsql_db", None)
         if db:
+            await db.close_async()
             db.close()
+        ## 업로드해 둔 role 접두부 캐시 삭제 (Gemini 호출 스레드 풀 종료 전)
+        context_cache = getattr(app.state, "context_cache", None)
+        if context_cache:
+            await context_cache.close()
+        shutdown_executor()
+        response_cache = getattr(app.state, "response_cache", None)
+        if response_cache:
+            await response_cache.close()
+        shared_state = getattr(app.state, "shared_state", None)
+        if shared_state:
+            await shared_state.close()
+        shutdown_logging()
 
     ## 등록
     app.add_event_handler("startup", _startup)
     app.add_event_handler("shutdown", _shutdown)
 
+    @app.get("/_internal/ready")
+    def _ready(request: Request):
+        ## DB 연결 풀과 모델 클라이언트가 준비된 뒤에만 200
+        tracker = getattr(request.app.state, "startup", None)
+        if tracker is None or not tracker.ready:
+            status = tracker.status() if tracker is not None else {"ready": False}
+            return JSONResponse(status, status_code=503)
+        return tracker.status()
+
     @app.get("/_internal/health/db")
     def _db_health(conn = Depends(get_conn)):
         try:
@@ -61,5 +256,20 @@ def create_app() -> FastAPI:
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"DB health check failed: {e}")
 
+    @app.get("/_internal/pool")
+    def _db_pool_stats(request: Request):
+        db = getattr(request.app.state, "cloudsql_db", None)
+        if db is None:
+            raise HTTPException(status_code=500, detail="Database not initialized")
+        return db.pool_stats()
+
+    @app.get("/metrics")
+    def _metrics():
+        return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+    @app.get("/_internal/models")
+    def _model_registry_stats():
+        return model_registry.stats()
+
     return app
 
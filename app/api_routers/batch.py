@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import FileResponse
+
+import os
+from typing import List, Optional
+
+# Create an APIRouter instance
+router = APIRouter(
+    tags=["batch"]
+)
+
+def _get_manager(request: Request):
+    manager = getattr(request.app.state, "batch_jobs", None)
+    if manager is None:
+        raise HTTPException(status_code=500, detail="Batch job manager not initialized")
+    return manager
+
+@router.post("/batch_jobs", summary="JSONL 배치 평가 작업 생성")
+async def create_batch_job(request: Request, concurrency: Optional[int] = None, qps: Optional[float] = None):
+    """
+    요청 본문으로 JSONL(한 줄에 GeminiTestQueryRequest 형식의 JSON 하나)을 받아 작업을 시작합니다.
+    """
+    if concurrency is not None and concurrency < 1:
+        raise HTTPException(status_code=400, detail="concurrency는 1 이상이어야 합니다.")
+    if qps is not None and qps <= 0:
+        raise HTTPException(status_code=400, detail="qps는 0보다 커야 합니다.")
+
+    body = (await request.body()).decode("utf-8")
+    try:
+        return await _get_manager(request).create_job(body, concurrency=concurrency, qps=qps)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/batch_jobs", summary="배치 작업 목록")
+async def list_batch_jobs(request: Request) -> List[dict]:
+
+    return await _get_manager(request).list_jobs()
+
+@router.get("/batch_jobs/{job_id}", summary="배치 작업 상태/진행률")
+async def get_batch_job(request: Request, job_id: str):
+
+    status = await _get_manager(request).get_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="batch job not found")
+    return status
+
+@router.get("/batch_jobs/{job_id}/results", summary="배치 작업 결과 (JSONL)")
+async def get_batch_job_results(request: Request, job_id: str):
+
+    manager = _get_manager(request)
+    if await manager.get_status(job_id) is None:
+        raise HTTPException(status_code=404, detail="batch job not found")
+    path = manager.results_path(job_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="아직 결과가 없습니다.")
+    return FileResponse(path, media_type="application/x-ndjson", filename=f"{job_id}_results.jsonl")
+
+@router.post("/batch_jobs/{job_id}/cancel", summary="배치 작업 취소")
+async def cancel_batch_job(request: Request, job_id: str):
+
+    try:
+        found = await _get_manager(request).cancel(job_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not found:
+        raise HTTPException(status_code=404, detail="batch job not found")
+    return {"ok": True, "job_id": job_id}
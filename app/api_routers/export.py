@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Request, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+import io
+import csv
+import json
+from typing import Dict, List
+
+from config.db import db_settings
+from .history import require_history_access
+
+# Create an APIRouter instance
+router = APIRouter(
+    tags=["export"]
+)
+
+## 내보낼 수 있는 테이블과 조회 쿼리 (id 순서)
+EXPORT_QUERIES = {
+    "prompt_role": "SELECT id, name, description, text FROM public.prompt_role ORDER BY id",
+}
+## 쿼리 이력은 이력 저장이 켜져 있을 때만, 이력 조회 토큰으로 인증한 요청에만 내보냄
+if db_settings.HISTORY_ENABLED:
+    EXPORT_QUERIES["query_history"] = f"SELECT * FROM public.{db_settings.HISTORY_TABLE} ORDER BY id"
+PROTECTED_TABLES = {"query_history"}
+
+def _ndjson_chunk(rows: List[Dict]) -> str:
+    return "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows)
+
+async def _ndjson_lines(batches):
+    async for rows in batches:
+        yield _ndjson_chunk(rows)
+
+async def _csv_lines(batches):
+    buffer = io.StringIO()
+    writer = None
+    async for rows in batches:
+        if not rows:
+            continue
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+        writer.writerows(rows)
+        ## 배치 단위로 내보내고 버퍼를 비움 (메모리 사용량은 배치 크기만큼)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+@router.get("/export/{table}", summary="테이블 스트리밍 내보내기 (NDJSON/CSV)")
+async def export_table(
+    request: Request,
+    table: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    batch_size: int = Query(500, ge=1, le=10000),
+):
+    """
+    서버 측 커서로 batch_size 행씩 읽어 바로 전송합니다. 테이블 크기와 관계없이 메모리 사용량이 일정합니다.
+    """
+    sql = EXPORT_QUERIES.get(table)
+    if sql is None:
+        raise HTTPException(status_code=404, detail=f"Unknown table: {table}")
+    if table in PROTECTED_TABLES:
+        require_history_access(request)
+    db = getattr(request.app.state, "cloudsql_db", None)
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not initialized")
+
+    batches = db.iter_batches_async(sql, batch_size=batch_size)
+    if format == "csv":
+        body, media_type = _csv_lines(batches), "text/csv; charset=utf-8"
+    else:
+        body, media_type = _ndjson_lines(batches), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'},
+    )
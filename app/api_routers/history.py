@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Request, HTTPException, Query, Depends
+
+import secrets
+from typing import Optional
+
+from config.db import db_settings
+
+# Create an APIRouter instance
+router = APIRouter(
+    tags=["history"]
+)
+
+def _get_writer(request: Request):
+    writer = getattr(request.app.state, "history_writer", None)
+    if writer is None:
+        raise HTTPException(status_code=503, detail="Query history is disabled")
+    return writer
+
+def require_history_access(request: Request):
+    """
+    이력 조회 권한 확인. HISTORY_ACCESS_TOKEN이 없으면 항상 거부합니다.
+    """
+    token = db_settings.HISTORY_ACCESS_TOKEN
+    if not token:
+        raise HTTPException(status_code=403, detail="Query history access is disabled")
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(credentials.encode(), token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid history access token", headers={"WWW-Authenticate": "Bearer"})
+
+@router.get(
+    "/query_history",
+    summary="쿼리 이력 조회 (최신순, keyset 페이지네이션)",
+    dependencies=[Depends(require_history_access)],
+)
+async def get_query_history(
+    request: Request,
+    before_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    model_name: Optional[str] = None,
+):
+    """
+    다음 페이지는 응답의 next_before_id를 before_id로 넘겨 조회합니다.
+    """
+    return await _get_writer(request).query(before_id=before_id, limit=limit, model_name=model_name)
+
+@router.get("/_internal/history", summary="쿼리 이력 writer 통계")
+async def get_history_stats(request: Request):
+
+    return _get_writer(request).stats()
@@ -6,17 +6,23 @@ from fastapi import Request as FastAPIRequest
 
 import time
 from typing import List
-from starlette.concurrency import run_in_threadpool
-from sqlalchemy import text
 
 # import google.generativeai as genai
-from google.generativeai.types import generation_types
 
 from model import gemini_schemas
-from model.gemini_utils import get_model, generate
+from model.gemini_utils import get_model, generate_async, is_stop_candidate_exception
+from model.static_response import StaticResponse, StaticUsageMetadata
 from config.base import settings
 from utils.cost import calculate_cost
-from utils.stream import stream_generator
+from utils.stream import ChunkSource, ResponsePump, stream_generator
+from utils.response_cache import make_cache_key
+from utils.rate_limit import RateLimitExceeded, estimate_tokens, is_overload_error, release_on_close
+from utils.preflight import PreflightRejected
+from utils.timing import StreamTimer
+from utils.cancellation import CANCEL_CHANNEL, watch_cancellation
+from utils import metrics
+from utils.log import get_logger, log_prompt, get_request_id
+from utils.http_cache import JsonPayload, etag_response, static_assets
 from metadata.script_format.main_script_format import TEST_SYSTEM_PROMPT
 
 # Create an APIRouter instance
@@ -24,8 +30,13 @@ router = APIRouter(
     tags=["llm-test"]
 )
 
+logger = get_logger("llm_test")
+
 # Configure the location of the template files
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["static_url"] = static_assets.url
+
+_models_payload = JsonPayload()
 
 @router.get("/llm_test_page", response_class=HTMLResponse, summary="API Test Page")
 async def get_llm_test_page(request: Request):
@@ -40,9 +51,115 @@ async def get_llm_test_page(request: Request):
 
 
 @router.get("/gemini_available_models", response_model=List[str], summary="설정 파일에서 Gemini 모델 목록 조회")
-async def get_available_models():
+async def get_available_models(request: Request):
+
+    ## 모델 목록은 설정에서 오므로 프로세스 동안 같은 객체 -> 직렬화/ETag 계산 1회, 이후 If-None-Match면 304
+    body, etag = _models_payload.get(settings.GEMINI_MODELS)
+    return etag_response(request, body, etag)
+
+
+@router.post("/gemini_query_estimate", summary="Pre-flight input token / worst-case cost estimate")
+async def estimate_gemini_query(fastapi_request: FastAPIRequest, request: gemini_schemas.GeminiTestQueryRequest):
+
+    preflight = getattr(fastapi_request.app.state, "preflight", None)
+    if preflight is None:
+        raise HTTPException(status_code=404, detail="Pre-flight estimation is disabled")
+    role_text = None
+    if request.role_id is not None:
+        if not hasattr(fastapi_request.app.state, "role_cache"):
+            raise HTTPException(status_code=500, detail="DB not initialized")
+        role_text = await fastapi_request.app.state.role_cache.get_role_text(request.role_id)
+    estimate = await preflight.estimate(
+        request.model_name, (request.query or "").strip(), request.max_output_tokens, request.role_id, role_text
+    )
+    try:
+        preflight.check(estimate, record=False)
+        rejected = None
+    except PreflightRejected as e:
+        rejected = str(e)
+    return {**estimate, "rejected": rejected}
+
+
+@router.post("/cancel/{request_id}", summary="진행 중인 스트리밍 요청 취소")
+async def cancel_request(fastapi_request: FastAPIRequest, request_id: str):
+    """
+    request_id는 /gemini_test_query 응답의 X-Request-ID 헤더 값입니다.
+    다른 워커에서 처리 중일 수 있으므로 shared_state가 있으면 다른 워커에도 전파합니다.
+    """
+    cancel_registry = getattr(fastapi_request.app.state, "cancel_registry", None)
+    if cancel_registry is None:
+        raise HTTPException(status_code=503, detail="Cancellation not initialized")
+    found = cancel_registry.cancel(request_id)
+    shared_state = getattr(fastapi_request.app.state, "shared_state", None)
+    broadcast = not found and shared_state is not None
+    if broadcast:
+        await shared_state.publish(CANCEL_CHANNEL, {"request_id": request_id})
+    elif not found:
+        raise HTTPException(status_code=404, detail=f"진행 중인 요청이 없습니다: {request_id}")
+    return {"ok": True, "request_id": request_id, "cancelled": found, "broadcast": broadcast}
+
+
+@router.get("/_internal/cancellation", summary="Stream cancellation statistics")
+async def get_cancellation_stats(fastapi_request: FastAPIRequest):
+
+    cancel_registry = getattr(fastapi_request.app.state, "cancel_registry", None)
+    if cancel_registry is None:
+        raise HTTPException(status_code=503, detail="Cancellation not initialized")
+    return cancel_registry.stats()
+
+
+@router.get("/_internal/preflight", summary="Pre-flight estimator statistics")
+async def get_preflight_stats(request: Request):
+
+    preflight = getattr(request.app.state, "preflight", None)
+    if preflight is None:
+        return {"enabled": False}
+    return {"enabled": True, **preflight.stats()}
+
+
+@router.get("/_internal/context_cache", summary="Role-prefix context cache statistics")
+async def get_context_cache_stats(request: Request):
+
+    context_cache = getattr(request.app.state, "context_cache", None)
+    if context_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **context_cache.stats()}
+
+
+@router.get("/_internal/rate_limits", summary="Per-model rate limit / adaptive concurrency state")
+async def get_rate_limit_stats(request: Request):
+
+    rate_limiter = getattr(request.app.state, "rate_limiter", None)
+    if rate_limiter is None:
+        return {"enabled": False}
+    return {"enabled": True, "models": rate_limiter.stats()}
+
+
+@router.get("/_internal/hedge", summary="Request hedging statistics")
+async def get_hedge_stats(request: Request):
+
+    hedger = getattr(request.app.state, "hedger", None)
+    if hedger is None:
+        return {"enabled": False}
+    return {"enabled": settings.HEDGE_ENABLED, **hedger.stats()}
+
 
-    return settings.GEMINI_MODELS
+@router.get("/_internal/single_flight", summary="Single-flight request coalescing statistics")
+async def get_single_flight_stats(request: Request):
+
+    single_flight = getattr(request.app.state, "single_flight", None)
+    if single_flight is None:
+        return {"enabled": False}
+    return {"enabled": True, **single_flight.stats()}
+
+
+@router.get("/_internal/response_cache", summary="Shared response cache statistics")
+async def get_response_cache_stats(request: Request):
+
+    response_cache = getattr(request.app.state, "response_cache", None)
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.stats()}
 
 
 # @router.post("/gemini_test_query", response_model=gemini_schemas.GeminiTestQueryResponse, summary="Gemini Test Query")
@@ -83,22 +200,17 @@ async def generate_gemini_response(fastapi_request: FastAPIRequest, request: gem
     role_id = request.role_id
 
     if role_id is not None:
-        if not hasattr(fastapi_request.app.state, "cloudsql_db"):
+        if not hasattr(fastapi_request.app.state, "role_cache"):
             raise HTTPException(status_code=500, detail="DB not initialized")
-        engine = fastapi_request.app.state.cloudsql_db.get_engine()
-
-        def _fetch_role_text(engine, rid):
-            with engine.connect() as conn:
-                r = conn.execute(
-                    text("SELECT text FROM public.prompt_role WHERE id = :id"),
-                    {"id": rid}
-                )
-                row = r.mappings().first()
-                return row["text"] if row else None
 
         try:
-            role_text = await run_in_threadpool(_fetch_role_text, engine, role_id)
+            lookup_start = time.perf_counter()
+            role_text = await fastapi_request.app.state.role_cache.get_role_text(role_id)
+            metrics.ROLE_LOOKUP_LATENCY.labels(metrics.model_label(request.model_name)).observe(
+                time.perf_counter() - lookup_start
+            )
         except Exception as e:
+            metrics.record_error(e, 500)
             raise HTTPException(status_code=500, detail=f"DB 조회 실패: {e}")
 
     ## role_text가 있으면 결합, 없으면 원래 query 사용
@@ -109,64 +221,291 @@ async def generate_gemini_response(fastapi_request: FastAPIRequest, request: gem
     # combined_query = ("Role: " + role_text.rstrip() + "\n\nUser Query: " + (request.query or "")) if role_text else (request.query or "")
     combined_query = TEST_SYSTEM_PROMPT.format(role=role_content, query=user_query)
 
-    print(' =============== combined_query ===============', "\n", combined_query)
+    log_prompt(logger, combined_query, model=request.model_name, role_id=role_id)
+
+    ## 호출 전 입력 토큰/최악의 경우 비용 추정. 한도를 넘으면 Gemini를 호출하지 않고 거절
+    ## (role 텍스트의 토큰 수는 role 버전별로 캐시되어 있으므로 요청마다 세는 것은 query 뿐)
+    preflight = getattr(fastapi_request.app.state, "preflight", None)
+    estimate = None
+    if preflight is not None:
+        estimate = await preflight.estimate(request.model_name, user_query, request.max_output_tokens, role_id, role_text)
+        try:
+            preflight.check(estimate)
+        except PreflightRejected as e:
+            status_code = 413 if e.reason == "input_tokens" else 400
+            logger.warning("Pre-flight rejected: %s", e)
+            metrics.record_error(e, status_code)
+            raise HTTPException(status_code=status_code, detail=f"요청이 한도를 초과합니다: {e}")
+    estimate_metadata = {
+        "estimated_input_tokens": estimate["input_tokens"],
+        "estimated_max_cost": estimate["max_cost"],
+    } if estimate is not None else None
+
+    ## 결정적 요청(temperature == 0)이면 공유 응답 캐시 확인
+    response_cache = getattr(fastapi_request.app.state, "response_cache", None)
+    cache_key = None
+    if response_cache is not None and response_cache.is_cacheable(request):
+        cache_key = make_cache_key(
+            request.model_name,
+            combined_query,
+            max_output_tokens=request.max_output_tokens,
+            top_k=request.top_k,
+            top_p=request.top_p,
+            temperature=request.temperature,
+        )
+
+    request_start = time.perf_counter()
+    metrics.IN_FLIGHT.inc()
+    ## 스트리밍 응답은 스트림이 끝날 때(track_stream) IN_FLIGHT를 감소시킴
+    in_flight_handed_off = False
+    rate_limiter = getattr(fastapi_request.app.state, "rate_limiter", None)
+    permit = None
+    hedger = getattr(fastapi_request.app.state, "hedger", None)
+    hedge = settings.HEDGE_ENABLED if request.hedge is None else request.hedge
+    hedge_info = None
+    single_flight = getattr(fastapi_request.app.state, "single_flight", None)
+    shared = False
+    context_cache = getattr(fastapi_request.app.state, "context_cache", None)
+    context_cached = False
 
     try:
         model_name = request.model_name
+        model_label = metrics.model_label(model_name)
         stream = request.stream
 
-        start_time = time.perf_counter()
-        model, generation_config = get_model(
-            model_name,
-            request.max_output_tokens,
-            request.top_k,
-            request.top_p,
-            request.temperature
-        )
-        end_time = time.perf_counter()
-        model_time_ms = (end_time - start_time) * 1000
-        print(f" Get Model Time: {model_time_ms:.4f} ms")
+        cached = await response_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            response = StaticResponse.from_text(
+                cached["text"],
+                cached["usage_metadata"],
+                chunk_chars=settings.RESPONSE_CACHE_REPLAY_CHUNK_CHARS if stream else None
+            )
+            start_time = time.perf_counter()
+        else:
+            start_time = time.perf_counter()
+            model, generation_config = get_model(
+                model_name,
+                request.max_output_tokens,
+                request.top_k,
+                request.top_p,
+                request.temperature
+            )
+            end_time = time.perf_counter()
+            model_time_ms = (end_time - start_time) * 1000
+            logger.debug("get_model", extra={"model": model_name, "get_model_ms": round(model_time_ms, 4)})
+            metrics.GET_MODEL_LATENCY.labels(model_label).observe(end_time - start_time)
+
+            ## 긴 role 프롬프트는 컨텍스트 캐시(모델, role 버전별)에 올려 두고 query 부분만 전송
+            query = combined_query
+            if context_cache is not None and role_text:
+                prefix, suffix = context_cache.split(role_content, user_query)
+                prefix_tokens = estimate["role_tokens"] if estimate is not None else estimate_tokens(prefix)
+                cached_model = await context_cache.get(model_name, model, role_id, role_text, prefix, prefix_tokens)
+                if cached_model is not None:
+                    model, query = cached_model, suffix
+                    context_cached = True
+
+            # generate 호출 시 query=combined_query (컨텍스트 캐시 사용 시 query 부분만) 로 전달
+            generate_call = lambda: generate_async(model, generation_config, query=query, stream=stream)
+            estimated_tokens = estimate["input_tokens"] if estimate is not None else estimate_tokens(combined_query)
+
+            ## 모델별 rpm/tpm/동시성 한도 안에서 1회 호출. 스트리밍은 스트림이 끝날 때 슬롯 반납(permit)
+            async def call():
+                if rate_limiter is None:
+                    return await generate_call(), None
+                return await rate_limiter.run(model_name, estimated_tokens, generate_call, hold=stream)
+
+            def _record_hedge_loser(result):
+                ## hedge에 진 호출도 업스트림에서 끝까지 처리되어 과금되므로, 끝난 뒤 실제 사용량으로 집계
+                (loser_response, _), _ = result
+                usage = loser_response.usage_metadata
+                loser_cached_tokens = getattr(usage, "cached_content_token_count", 0) or 0
+                loser_cost = calculate_cost(
+                    model_name, usage.prompt_token_count, usage.candidates_token_count, loser_cached_tokens
+                )
+                metrics.record_usage(
+                    model_name, usage.prompt_token_count, usage.candidates_token_count, loser_cost, loser_cached_tokens
+                )
+                metrics.HEDGE_LOSER_COST.labels(model_label).inc(loser_cost)
+                if rate_limiter is not None:
+                    asyncio.ensure_future(rate_limiter.charge(model_name, usage.candidates_token_count))
+
+            async def _generate():
+                if not stream and hedge and hedger is not None:
+                    ## 꼬리 지연 완화: 최근 p95 안에 응답이 없으면 중복 요청 후 먼저 끝난 응답 사용
+                    hedge_start = time.perf_counter()
+                    ((response, start_time), permit), hedge_info = await hedger.run(model_name, call, on_loser=_record_hedge_loser)
+                    if hedge_info["hedged"]:
+                        start_time = hedge_start
+                    return response, start_time, permit, hedge_info
+                (response, start_time), permit = await call()
+                return response, start_time, permit, None
+
+            if single_flight is None or not single_flight.is_coalescable(request):
+                response, start_time, permit, hedge_info = await _generate()
+            else:
+                ## 렌더링된 프롬프트 + 생성 설정이 같은 진행 중 요청이 있으면 업스트림 호출을 공유
+                flight_key = make_cache_key(
+                    model_name,
+                    combined_query,
+                    max_output_tokens=request.max_output_tokens,
+                    top_k=request.top_k,
+                    top_p=request.top_p,
+                    temperature=request.temperature,
+                    stream=stream,
+                )
+                join_time = time.perf_counter()
+                if stream:
+                    ## 업스트림 스트림 1개를 모든 구독자에게 전달 (rate limit 슬롯은 업스트림이 끝날 때 반납)
+                    async def _open_stream():
+                        response, start_time, permit, _ = await _generate()
+                        return response, start_time, permit
+                    response, start_time, shared = await single_flight.stream(flight_key, _open_stream)
+                else:
+                    (response, start_time, permit, hedge_info), shared = await single_flight.do(flight_key, _generate)
+                    if shared:
+                        start_time = join_time
+                if shared:
+                    metrics.COALESCED.labels(model_label, str(stream).lower()).inc()
+
+        history_writer = getattr(fastapi_request.app.state, "history_writer", None)
+        request_id = get_request_id()
+
+        ## 응답 완료 후 처리: 캐시 miss였던 결정적 요청은 캐시에 저장, 쿼리 이력 기록
+        ## (업스트림 호출을 공유한 요청은 사용량 차감/캐시 저장을 leader에게 맡김)
+        async def _on_complete(text, usage_metadata, metadata):
+            if rate_limiter is not None and cached is None and not shared:
+                await rate_limiter.charge(model_name, metadata["output_tokens"])
+            if cache_key and cached is None and not shared:
+                await response_cache.set(cache_key, text, StaticUsageMetadata.from_obj(usage_metadata).to_dict())
+            if history_writer is not None:
+                history_writer.record(
+                    request_id=request_id,
+                    model_name=model_name,
+                    role_id=role_id,
+                    stream=stream,
+                    temperature=request.temperature,
+                    top_k=request.top_k,
+                    top_p=request.top_p,
+                    max_output_tokens=request.max_output_tokens,
+                    input_tokens=metadata["input_tokens"],
+                    output_tokens=metadata["output_tokens"],
+                    cost=metadata["cost"],
+                    latency=metadata["inference_time"],
+                    cached=metadata["cached"],
+                    response_text=text,
+                )
 
-        # generate 호출 시 query=combined_query 로 전달
-        response, start_time = generate(model, generation_config, query=combined_query, stream=stream)
+        on_complete = _on_complete if (cache_key and cached is None) or history_writer is not None or rate_limiter is not None else None
 
         # --- 기존 스트리밍/비스트리밍 분기 유지 ---
         if stream:
+            in_flight_handed_off = True
+            ## /cancel/{request_id} 또는 클라이언트 연결 종료 시 업스트림 생성을 중단
+            cancel_registry = getattr(fastapi_request.app.state, "cancel_registry", None)
+            cancel_token = cancel_registry.register(request_id) if cancel_registry is not None else None
+            ## 펌프 오류(중간 429 등)를 permit 반납 시 전달할 수 있도록 업스트림 source를 직접 만듦
+            if permit is not None and not isinstance(response, ChunkSource):
+                response = ResponsePump(response)
+            body = stream_generator(
+                response, model_name, start_time, on_complete=on_complete, cached=cached is not None, coalesced=shared,
+                extra_metadata=estimate_metadata, cancel_token=cancel_token, max_output_tokens=request.max_output_tokens
+            )
+            if permit is not None:
+                body = release_on_close(body, permit, source=response)
+            if cancel_token is not None:
+                body = watch_cancellation(
+                    body,
+                    cancel_token,
+                    cancel_registry,
+                    request=fastapi_request if settings.CANCEL_ON_DISCONNECT else None,
+                    interval=settings.DISCONNECT_POLL_INTERVAL,
+                )
             return StreamingResponse(
-                stream_generator(response, model_name, start_time),
+                metrics.track_stream(body, model_name, request_start),
                 media_type="text/event-stream"
             )
         else:
             end_time = time.perf_counter()
             inference_time_s = round((end_time - start_time), 4)
-            print(f"Inference Time: {inference_time_s:.4f} s")
+            logger.info("inference", extra={"model": model_name, "stream": False, "inference_time": inference_time_s})
 
             if not response.text:
                  raise HTTPException(status_code=400, detail="AI로부터 유효한 텍스트를 받지 못했습니다.")
 
             input_tokens = response.usage_metadata.prompt_token_count
             output_tokens = response.usage_metadata.candidates_token_count
-            cost = calculate_cost(request.model_name, input_tokens, output_tokens)
+            cached_tokens = getattr(response.usage_metadata, "cached_content_token_count", 0) or 0
+            cost = 0.0 if cached is not None or shared else calculate_cost(request.model_name, input_tokens, output_tokens, cached_tokens)
+            ## hedge에 진 호출은 응답 시점에 아직 실행 중이므로 이긴 쪽 토큰 수 기준 추정치만 표시
+            ## (실제 비용은 끝난 뒤 llm_hedge_loser_cost_usd_total / llm_cost_usd_total에 집계)
+            hedge_cost_estimate = cost if hedge_info and hedge_info["hedged"] else 0.0
 
             metadata = {
                 "input_tokens": input_tokens,
+                "cached_input_tokens": cached_tokens,
+                "fresh_input_tokens": input_tokens - cached_tokens,
                 "output_tokens": output_tokens,
                 "cost": cost,
                 "inference_time": inference_time_s,
-                "role_id": role_id
+                "role_id": role_id,
+                "cached": cached is not None,
+                "coalesced": shared
             }
+            if estimate_metadata is not None:
+                metadata.update(estimate_metadata)
+            if hedge_info is not None:
+                metadata.update(
+                    hedged=hedge_info["hedged"], hedge_winner=hedge_info["winner"], hedge_cost_estimate=hedge_cost_estimate
+                )
+                if hedge_info["hedged"]:
+                    metrics.HEDGES.labels(model_label, hedge_info["winner"]).inc()
+            ## 비스트리밍은 응답 전체가 한 번에 도착하므로 TTFT == inference_time
+            timer = StreamTimer(start_time)
+            timer.mark_chunk(end_time)
+            metadata.update(timer.summary(output_tokens, end_time))
+
+            metrics.TTFT.labels(model_label, "false").observe(end_time - start_time)
+            metrics.record_usage(model_name, input_tokens, output_tokens, cost, cached_tokens)
+            metrics.REQUEST_LATENCY.labels(model_label, "false").observe(time.perf_counter() - request_start)
+
+            if on_complete is not None:
+                await on_complete(response.text, response.usage_metadata, metadata)
 
             return {
                 "response_text": response.text,
                 "usage_metadata": metadata
             }
 
-    except generation_types.StopCandidateException as e:
-        print(f"Content generation stopped unexpectedly: {e}")
-        raise HTTPException(status_code=400, detail=f"콘텐츠 생성 중단됨: {e}")
+    except RateLimitExceeded as e:
+        logger.warning("Rate limit exceeded: %s", e)
+        metrics.record_error(e, 429)
+        raise HTTPException(
+            status_code=429,
+            detail=f"요청 한도를 초과했습니다: {e}",
+            headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        ## 서버 측에서 캐시가 사라진 경우 등: 다음 요청에서 컨텍스트 캐시를 다시 만들도록 제거
+        if context_cached:
+            context_cache.discard(request.model_name, role_id)
+        if is_stop_candidate_exception(e):
+            logger.warning("Content generation stopped unexpectedly: %s", e)
+            metrics.record_error(e, 400)
+            raise HTTPException(status_code=400, detail=f"콘텐츠 생성 중단됨: {e}")
+        ## 재시도 후에도 업스트림이 429/RESOURCE_EXHAUSTED면 500 대신 429로 전달
+        if is_overload_error(e):
+            logger.warning("Upstream overloaded: %s", e)
+            metrics.record_error(e, 429)
+            raise HTTPException(status_code=429, detail=f"모델 호출 한도를 초과했습니다: {e}", headers={"Retry-After": "1"})
+        logger.error("An unexpected error occurred: %s", e, exc_info=True)
+        metrics.record_error(e, 500)
         raise HTTPException(status_code=500, detail=f"서버 내부 오류가 발생했습니다: {str(e)}")
+    finally:
+        if not in_flight_handed_off:
+            metrics.IN_FLIGHT.dec()
+            if permit is not None:
+                await permit.release()
 
 # @router.post("/gemini_test_query", summary="Gemini Test Query")
 # async def generate_gemini_response(request: gemini_schemas.GeminiTestQueryRequest):
@@ -1,13 +1,15 @@
 from sqlalchemy import text
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Request, HTTPException, Query
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import StreamingResponse
 
 import time
-from typing import List
+from typing import List, Optional
 
 from config.base import settings
+from utils.shared_state import ROLE_CACHE_CHANNEL
+from utils.http_cache import JsonPayload, etag_response
 
 # Create an APIRouter instance
 router = APIRouter(
@@ -17,21 +19,85 @@ router = APIRouter(
 # Configure the location of the template files
 templates = Jinja2Templates(directory="templates")
 
+_metadata_payload = JsonPayload()
+
 @router.get("/get_role_prompts_metadata", summary="Role prompt metadata")
-def get_role_prompts_metadata(request: Request):
-
-    engine = request.app.state.cloudsql_db.get_engine()  # sync Engine 반환
-    with engine.connect() as conn:
-        res = conn.execute(text("""
-            SELECT id, name, description
-            FROM public.prompt_role
-            ORDER BY id;
-        """))
-        # rows = [dict(r) for r in res.fetchall()]
-        rows = res.mappings().all()
+async def get_role_prompts_metadata(request: Request):
+
+    ## prompt_role 캐시를 거쳐 조회 (캐시 miss 시에만 DB 조회)
+    rows = await request.app.state.role_cache.get_metadata()
     # print('rows:', rows)
 
-    return rows
+    ## 캐시 hit이면 같은 목록 객체 -> 직렬화/ETag 재사용. 무효화 후 새 목록이면 ETag도 바뀜
+    body, etag = _metadata_payload.get(rows)
+    return etag_response(request, body, etag)
+
+
+@router.get("/list_role_prompts", summary="Role prompt metadata (id 순서, keyset 페이지네이션)")
+async def list_role_prompts(
+    request: Request,
+    after_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+):
+    """
+    다음 페이지는 응답의 next_after_id를 after_id로 넘겨 조회합니다.
+    (OFFSET 없이 id 인덱스로 바로 이어서 읽으므로 페이지가 뒤로 가도 비용이 같습니다)
+    """
+    db = getattr(request.app.state, "cloudsql_db", None)
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not initialized")
+    rows = await db.fetch_all_async(
+        "SELECT id, name, description FROM public.prompt_role WHERE id > :after_id ORDER BY id LIMIT :limit",
+        {"after_id": after_id if after_id is not None else -1, "limit": limit},
+    )
+    next_after_id = rows[-1]["id"] if len(rows) == limit else None
+    return {"items": rows, "next_after_id": next_after_id}
+
+
+@router.get("/search_role_prompts", summary="Role prompt 검색 (이름/설명/본문, 접두어/오타 허용)")
+async def search_role_prompts(
+    request: Request,
+    q: str = Query("", max_length=200),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=200),
+):
+    """
+    메모리 검색 색인에서 순위가 매겨진 결과를 offset부터 limit개 반환합니다. (DB 조회 없음)
+    다음 페이지는 응답의 next_offset을 offset으로 넘겨 조회합니다. q가 비어 있으면 id 순서입니다.
+    """
+    role_search = getattr(request.app.state, "role_search", None)
+    if role_search is None or not role_search.ready:
+        detail = "Role search index not ready"
+        if role_search is not None and role_search.last_error:
+            detail += f" (last error: {role_search.last_error})"
+        raise HTTPException(status_code=503, detail=detail)
+    return role_search.search(q, offset=offset, limit=limit)
+
+
+@router.get("/_internal/role_search", summary="Role prompt search index statistics")
+async def get_role_search_stats(request: Request):
+
+    role_search = getattr(request.app.state, "role_search", None)
+    if role_search is None:
+        raise HTTPException(status_code=503, detail="Role search index not initialized")
+    return role_search.stats()
+
+
+@router.get("/_internal/role_cache", summary="Role prompt cache statistics")
+async def get_role_cache_stats(request: Request):
+
+    return request.app.state.role_cache.stats()
+
+
+@router.post("/_internal/role_cache/invalidate", summary="Invalidate role prompt cache")
+async def invalidate_role_cache(request: Request, role_id: Optional[int] = None):
+
+    request.app.state.role_cache.invalidate(role_id)
+    ## 멀티 워커: 다른 워커의 캐시도 무효화되도록 전파
+    shared_state = getattr(request.app.state, "shared_state", None)
+    if shared_state is not None:
+        await shared_state.publish(ROLE_CACHE_CHANNEL, {"role_id": role_id})
+    return {"ok": True, "role_id": role_id}
 
 
 # @router.get("/get_role_prompt_text", summary="Role prompt text")
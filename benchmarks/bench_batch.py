@@ -0,0 +1,87 @@
+"""
+배치 평가 작업 처리량 벤치마크.
+
+고정 지연(--latency)의 스텁 모델로 --rows 개 행을 동시성 값별로 실행하여
+초당 처리 행 수를 측정하고, 중간에 중단한 작업이 중복/누락 없이 재개되는지 확인합니다.
+
+    python -m benchmarks.bench_batch --rows 200 --latency 0.05 --concurrency 1 8 32
+"""
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+from benchmarks.common import StubModel
+
+from utils import batch
+from utils.batch import BatchJobManager
+
+
+def make_jsonl(n_rows: int) -> str:
+    return "\n".join(
+        json.dumps({"query": f"q{i}", "model_name": "models/gemini-2.5-flash"}) for i in range(n_rows)
+    )
+
+
+async def wait_done(manager: BatchJobManager, job_id: str) -> dict:
+    while True:
+        status = await manager.get_status(job_id)
+        if status["status"] not in ("queued", "running"):
+            return status
+        await asyncio.sleep(0.01)
+
+
+async def run_throughput(n_rows: int, concurrency: int, qps=None) -> float:
+    with tempfile.TemporaryDirectory() as base_dir:
+        manager = BatchJobManager(base_dir)
+        start = time.perf_counter()
+        job = await manager.create_job(make_jsonl(n_rows), concurrency=concurrency, qps=qps)
+        status = await wait_done(manager, job["job_id"])
+        elapsed = time.perf_counter() - start
+        assert status["completed"] == n_rows, status
+        return n_rows / elapsed
+
+
+async def run_resume(n_rows: int, concurrency: int):
+    ## 작업 도중 매니저를 종료(서버 재시작 흉내)한 뒤 새 매니저로 재개
+    with tempfile.TemporaryDirectory() as base_dir:
+        manager = BatchJobManager(base_dir)
+        job_id = (await manager.create_job(make_jsonl(n_rows), concurrency=concurrency))["job_id"]
+        while (await manager.get_status(job_id))["completed"] < n_rows // 2:
+            await asyncio.sleep(0.01)
+        await manager.shutdown()
+        done_before = (await manager.get_status(job_id))["completed"]
+
+        manager = BatchJobManager(base_dir)
+        await manager.resume_incomplete()
+        status = await wait_done(manager, job_id)
+
+        with open(manager.results_path(job_id), "r", encoding="utf-8") as f:
+            indices = [json.loads(line)["index"] for line in f]
+        assert sorted(indices) == list(range(n_rows)), "중복 또는 누락된 행이 있습니다."
+        return done_before, status
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--qps", type=float, default=None)
+    args = parser.parse_args()
+
+    batch.get_model = lambda *a: (StubModel(args.latency), None)
+
+    print("=" * 60)
+    for concurrency in args.concurrency:
+        rps = asyncio.run(run_throughput(args.rows, concurrency, args.qps))
+        print(f" concurrency={concurrency:<4d} 처리량: {rps:8.2f} rows/s (이론 최대 {concurrency / args.latency:.2f})")
+
+    done_before, status = asyncio.run(run_resume(args.rows, max(args.concurrency)))
+    print(f" 재개 확인: 중단 시점 {done_before}행 완료 -> 재개 후 {status['completed']}/{status['total']}행, 상태={status['status']}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+/gemini_test_query 동시성 부하 테스트.
+
+실제 Gemini 대신 고정 지연(--latency)을 갖는 스텁 모델을 사용하여
+N개의 요청을 동시에 보내고, 전체 소요 시간이 요청 1개의 시간과
+비슷한지(N배가 아닌지) 확인합니다. --stream 을 주면 SSE 스트림들이
+서로의 지연을 늘리지 않고 교차 진행되는지 확인합니다.
+
+    python -m benchmarks.bench_concurrency --requests 16 --latency 0.5
+    python -m benchmarks.bench_concurrency --requests 16 --latency 0.5 --stream
+"""
+import time
+import asyncio
+import argparse
+
+from benchmarks.common import StubModel
+
+import httpx
+from fastapi import FastAPI
+
+from app.api_routers import llm_test
+
+
+async def run(n_requests: int, latency: float, stream: bool = False) -> float:
+    app = FastAPI()
+    app.include_router(llm_test.router)
+    llm_test.get_model = lambda *args: (StubModel(latency), None)
+
+    body = {"query": "ping", "model_name": "models/gemini-2.5-flash", "stream": stream}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(
+            *[client.post("/gemini_test_query", json=body) for _ in range(n_requests)]
+        )
+        elapsed = time.perf_counter() - start
+
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses]
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--stream", action="store_true")
+    args = parser.parse_args()
+
+    single = asyncio.run(run(1, args.latency, args.stream))
+    concurrent = asyncio.run(run(args.requests, args.latency, args.stream))
+
+    print("=" * 60)
+    print(f" 요청 1개: {single:.3f} s")
+    print(f" 동시 요청 {args.requests}개: {concurrent:.3f} s (직렬 실행 시 약 {single * args.requests:.3f} s)")
+    print(f" 비율 (동시/단일): {concurrent / single:.2f}x")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+비스트리밍 요청 hedging 벤치마크.
+
+지연 분포가 꼬리가 긴 스텁 모델(대부분 --latency, --tail-prob 확률로 --tail-latency)로
+/gemini_test_query 에 --requests 개 요청을 --concurrency 개씩 보내고,
+hedging 없이/있을 때의 p50/p95/p99 지연과 hedge 비율, 비용 증가분(hedge에 진 호출의 실제 비용 포함)을 비교합니다.
+
+    python -m benchmarks.bench_hedge --requests 400 --concurrency 8 --latency 0.02 --tail-latency 0.5 --tail-prob 0.05
+"""
+import time
+import random
+import asyncio
+import argparse
+import logging
+from types import SimpleNamespace
+
+from benchmarks.common import USAGE
+
+import httpx
+from fastapi import FastAPI
+
+from app.api_routers import llm_test
+from utils import metrics
+from utils.hedge import Hedger
+from utils.timing import percentile
+
+
+class TailLatencyModel:
+    def __init__(self, latency: float, tail_latency: float, tail_prob: float, rng: random.Random):
+        self.latency = latency
+        self.tail_latency = tail_latency
+        self.tail_prob = tail_prob
+        self.rng = rng
+
+    def generate_content(self, query, generation_config=None, stream=False):
+        slow = self.rng.random() < self.tail_prob
+        ## 블로킹 SDK 호출 흉내 (약간의 지터 포함)
+        time.sleep((self.tail_latency if slow else self.latency) * self.rng.uniform(0.8, 1.2))
+        return SimpleNamespace(text="ok", usage_metadata=USAGE)
+
+
+async def run(args, hedge: bool) -> dict:
+    app = FastAPI()
+    app.include_router(llm_test.router)
+    app.state.hedger = Hedger(min_samples=20, default_delay=args.tail_latency, max_ratio=args.max_ratio)
+    model = TailLatencyModel(args.latency, args.tail_latency, args.tail_prob, random.Random(args.seed))
+    llm_test.get_model = lambda *a: (model, None)
+
+    body = {"query": "ping", "model_name": "models/gemini-2.5-flash", "hedge": hedge}
+    loser_cost = metrics.HEDGE_LOSER_COST.labels(metrics.model_label(body["model_name"]))
+    loser_cost_before = loser_cost._value.get()
+    latencies, costs = [], []
+    remaining = iter(range(args.requests))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def _client():
+            for _ in remaining:
+                start = time.perf_counter()
+                r = await client.post("/gemini_test_query", json=body)
+                latencies.append(time.perf_counter() - start)
+                assert r.status_code == 200, r.text
+                costs.append(r.json()["usage_metadata"]["cost"])
+
+        await asyncio.gather(*(_client() for _ in range(args.concurrency)))
+    ## hedge에 진 호출은 응답 뒤에도 끝까지 실행되어 비용이 집계되므로 끝날 때까지 대기
+    await asyncio.sleep(args.tail_latency * 1.5)
+
+    stats = app.state.hedger.stats()
+    return {
+        "p50": percentile(latencies, 50) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "hedge_ratio": stats["hedge_ratio"] if hedge else 0.0,
+        "cost": sum(costs) + loser_cost._value.get() - loser_cost_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--tail-latency", type=float, default=0.5)
+    parser.add_argument("--tail-prob", type=float, default=0.05)
+    parser.add_argument("--max-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.getLogger("llm").setLevel(logging.ERROR)
+
+    base = asyncio.run(run(args, hedge=False))
+    hedged = asyncio.run(run(args, hedge=True))
+
+    print("=" * 60)
+    for name, r in (("hedging 없음", base), ("hedging", hedged)):
+        print(
+            f" {name:<12s} p50 {r['p50']:7.1f} ms  p95 {r['p95']:7.1f} ms  p99 {r['p99']:7.1f} ms"
+            f"  hedge 비율 {r['hedge_ratio']:.3f}  비용 ${r['cost']:.6f}"
+        )
+    print(f" p99 개선: {base['p99'] / hedged['p99']:.2f}x, 비용 증가: {(hedged['cost'] / base['cost'] - 1) * 100:.1f}%")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+로컬 부하 테스트 / 성능 회귀 게이트.
+
+실제 Gemini·Cloud SQL 대신 fake 생성 백엔드(model/fake_backend.py)와 SQLite prompt_role을 사용해
+create_app()으로 만든 서버 전체(미들웨어, 캐시, 이력 저장 포함)에 /gemini_test_query 요청을
+동시성 단계별로 보내고 다음을 측정합니다.
+
+- req/s, 요청 지연 p50/p95/p99 (클라이언트 기준)
+- TTFT p50/p95 (서버가 응답 메타데이터로 보고한 값)
+- 이벤트 루프 지연(loop lag) p99/max: 루프를 막는 동기 코드가 있으면 커집니다
+
+--out 으로 결과를 저장하고, 다음 실행에서 --baseline 으로 비교하면
+처리량 감소 / p99 증가가 --tolerance 를 넘거나 loop lag p99가 --max-loop-lag-ms 를 넘을 때 종료 코드 1을 반환합니다.
+
+    python -m benchmarks.bench_load --concurrency 1 8 32 64 --requests 200 --out bench_load.json
+    python -m benchmarks.bench_load --concurrency 1 8 32 64 --requests 200 --baseline bench_load.json --stream
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from typing import Dict, List
+
+import benchmarks.common  # noqa: F401  (sys.path / 필수 환경 변수 설정)
+
+import httpx
+
+MODEL = "models/gemini-2.5-flash"
+METADATA_DELIMITER = "\n<--METADATA-->\n"
+
+
+def configure_env(args, workdir: str):
+    ## 설정 모듈을 import 하기 전에 호출해야 합니다.
+    db_path = os.path.join(workdir, "bench.db")
+    os.environ.update({
+        "GEMINI_BACKEND": "fake",
+        "FAKE_LATENCY_DIST": args.latency_dist,
+        "FAKE_FIRST_TOKEN_MS": str(args.first_token_ms),
+        "FAKE_LATENCY_SPREAD": str(args.latency_spread),
+        "FAKE_OUTPUT_TOKENS": str(args.output_tokens),
+        "FAKE_TOKENS_PER_SEC": str(args.tokens_per_sec),
+        "FAKE_CHUNK_TOKENS": str(args.chunk_tokens),
+        "FAKE_SEED": str(args.seed),
+        "DB_LOCAL_URL": f"sqlite:///{db_path}",
+        "DB_LOCAL_ASYNC_URL": f"sqlite+aiosqlite:///{db_path}",
+        "BATCH_JOBS_DIR": os.path.join(workdir, "batch_jobs"),
+        "LOG_LEVEL": "WARNING",
+        "RATE_LIMIT_ENABLED": str(args.rate_limit).lower(),
+    })
+    return db_path
+
+
+def make_roles(n_roles: int, text_chars: int) -> List[Dict]:
+    return [
+        {
+            "id": i,
+            "name": f"role-{i}",
+            "description": f"benchmark role {i}",
+            "text": (f"You are benchmark role {i}. " * (text_chars // 24 + 1))[:text_chars],
+        }
+        for i in range(1, n_roles + 1)
+    ]
+
+
+class LoopLagMonitor:
+    """
+    interval 마다 sleep 후 실제로 깨어난 시각과의 차이(지연)를 기록합니다.
+    """
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, args, rng: random.Random) -> Dict:
+    from utils.timing import percentile
+
+    latencies, ttfts = [], []
+    errors = 0
+    remaining = iter(range(args.requests))
+
+    async def _client():
+        nonlocal errors
+        for i in remaining:
+            body = {
+                ## 요청마다 다른 질의 (single-flight 병합으로 처리량이 부풀려지지 않도록)
+                "query": f"benchmark query {concurrency}-{i}",
+                "model_name": MODEL,
+                "stream": args.stream,
+                "role_id": rng.randint(1, args.roles) if args.roles else None,
+            }
+            start = time.perf_counter()
+            r = await client.post("/gemini_test_query", json=body)
+            elapsed = time.perf_counter() - start
+            if r.status_code != 200:
+                errors += 1
+                continue
+            latencies.append(elapsed)
+            if args.stream:
+                metadata = json.loads(r.text.rsplit(METADATA_DELIMITER, 1)[1])
+            else:
+                metadata = r.json()["usage_metadata"]
+            if metadata.get("ttft") is not None:
+                ttfts.append(metadata["ttft"])
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(_client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await monitor.stop()
+
+    return {
+        "concurrency": concurrency,
+        "requests": args.requests,
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": {q: round(percentile(latencies, q) * 1000, 2) for q in (50, 95, 99)},
+        "ttft_ms": {q: round(percentile(ttfts, q) * 1000, 2) for q in (50, 95)},
+        "loop_lag_ms": {
+            "p99": round(percentile(monitor.samples, 99) * 1000, 2),
+            "max": round(max(monitor.samples, default=0.0) * 1000, 2),
+        },
+    }
+
+
+async def run(args, db_path: str) -> List[Dict]:
+    from app import create_app
+    from db.local_database import LocalDatabase
+
+    seed_db = LocalDatabase(f"sqlite:///{db_path}", attach_public_schema=True)
+    seed_db.create_prompt_roles(make_roles(args.roles, args.role_chars))
+    seed_db.close()
+
+    app = create_app()
+    await app.router.startup()
+    rng = random.Random(args.seed)
+    results = []
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            ## DB 연결 풀/모델 준비는 백그라운드에서 진행되므로 ready까지 대기
+            while (await client.get("/_internal/ready")).status_code != 200:
+                if app.state.startup.error:
+                    raise RuntimeError(f"서버 시작 실패: {app.state.startup.error}")
+                await asyncio.sleep(0.01)
+            for concurrency in args.concurrency:
+                results.append(await run_level(client, concurrency, args, rng))
+    finally:
+        await app.router.shutdown()
+    return results
+
+
+def check_regression(results: List[Dict], baseline: List[Dict], tolerance: float, max_loop_lag_ms: float) -> List[str]:
+    """
+    기준(baseline) 대비 회귀 항목 목록. 비어 있으면 통과.
+    """
+    failures = []
+    by_level = {r["concurrency"]: r for r in baseline}
+    for r in results:
+        c = r["concurrency"]
+        if r["errors"]:
+            failures.append(f"concurrency={c}: 오류 {r['errors']}건")
+        if r["loop_lag_ms"]["p99"] > max_loop_lag_ms:
+            failures.append(f"concurrency={c}: loop lag p99 {r['loop_lag_ms']['p99']} ms > {max_loop_lag_ms} ms")
+        base = by_level.get(c)
+        if base is None:
+            continue
+        if r["rps"] < base["rps"] * (1 - tolerance):
+            failures.append(f"concurrency={c}: req/s {r['rps']} < 기준 {base['rps']} (-{tolerance:.0%} 초과)")
+        if r["latency_ms"][99] > base["latency_ms"][99] * (1 + tolerance):
+            failures.append(
+                f"concurrency={c}: p99 {r['latency_ms'][99]} ms > 기준 {base['latency_ms'][99]} ms (+{tolerance:.0%} 초과)"
+            )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=200, help="동시성 단계별 요청 수")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--roles", type=int, default=20, help="SQLite prompt_role 행 수 (0이면 role 없이 요청)")
+    parser.add_argument("--role-chars", type=int, default=2000)
+    parser.add_argument("--latency-dist", default="lognormal", choices=["fixed", "uniform", "lognormal", "pareto"])
+    parser.add_argument("--first-token-ms", type=float, default=50.0)
+    parser.add_argument("--latency-spread", type=float, default=0.5)
+    parser.add_argument("--output-tokens", type=int, default=100)
+    parser.add_argument("--tokens-per-sec", type=float, default=1000.0)
+    parser.add_argument("--chunk-tokens", type=int, default=20)
+    parser.add_argument("--rate-limit", action="store_true", help="모델별 rpm/tpm 제한기 사용 (기본: 끔)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="결과 JSON 저장 경로")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="허용 회귀 비율 (0.2 = 20%%)")
+    parser.add_argument("--max-loop-lag-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = configure_env(args, workdir)
+        results = asyncio.run(run(args, db_path))
+
+    print("=" * 96)
+    print(f" {'conc':>5s} {'req/s':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}"
+          f" {'TTFT p50':>9s} {'TTFT p95':>9s} {'lag p99':>9s} {'lag max':>9s} {'err':>5s}")
+    for r in results:
+        print(
+            f" {r['concurrency']:5d} {r['rps']:9.2f} {r['latency_ms'][50]:9.1f} {r['latency_ms'][95]:9.1f}"
+            f" {r['latency_ms'][99]:9.1f} {r['ttft_ms'][50]:9.1f} {r['ttft_ms'][95]:9.1f}"
+            f" {r['loop_lag_ms']['p99']:9.2f} {r['loop_lag_ms']['max']:9.2f} {r['errors']:5d}"
+        )
+    print("=" * 96)
+
+    ## JSON 저장 시 키가 문자열이 되므로 비교 전에 같은 형태로 맞춤
+    results = json.loads(json.dumps(results))
+    for r in results:
+        r["latency_ms"] = {int(k): v for k, v in r["latency_ms"].items()}
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        for r in baseline:
+            r["latency_ms"] = {int(k): v for k, v in r["latency_ms"].items()}
+        failures = check_regression(results, baseline, args.tolerance, args.max_loop_lag_ms)
+    else:
+        failures = check_regression(results, [], args.tolerance, args.max_loop_lag_ms)
+
+    if failures:
+        print(" 성능 회귀:")
+        for failure in failures:
+            print(f"   - {failure}")
+        sys.exit(1)
+    print(" 회귀 없음")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+모델별 호출 한도(AIMD 적응형 동시성) 벤치마크.
+
+업스트림은 동시 호출이 --capacity 를 넘으면 ResourceExhausted(429)를 던지는 스텁입니다.
+--clients 개의 클라이언트가 --requests 개 요청을 보낼 때, 제한기 없이/있을 때의
+업스트림 429 수, 클라이언트에게 전달된 실패 수, 처리량, 수렴한 동시성 상한을 비교합니다.
+
+    python -m benchmarks.bench_rate_limit --requests 500 --clients 64 --capacity 12 --latency 0.02 --initial 8
+"""
+import time
+import asyncio
+import logging
+import argparse
+
+import benchmarks.common  # noqa: F401  (sys.path / 환경 변수 설정)
+
+from utils.rate_limit import ModelRateLimiter, RateLimitExceeded, is_overload_error
+
+MODEL = "models/gemini-2.5-flash"
+
+
+class ResourceExhausted(Exception):
+    ## google.api_core.exceptions.ResourceExhausted 흉내
+    code = 429
+
+
+class OverloadedUpstream:
+    def __init__(self, capacity: int, latency: float):
+        self.capacity = capacity
+        self.latency = latency
+        self.in_flight = 0
+        self.rejected = 0
+        self.served = 0
+
+    async def generate(self):
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            await asyncio.sleep(self.latency / 10)  ## 429는 빠르게 반환
+            raise ResourceExhausted("429 RESOURCE_EXHAUSTED: quota exceeded")
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.latency)
+            self.served += 1
+            return "ok"
+        finally:
+            self.in_flight -= 1
+
+
+async def run(n_requests: int, n_clients: int, capacity: int, latency: float, initial: int, limited: bool):
+    upstream = OverloadedUpstream(capacity, latency)
+    limiter = ModelRateLimiter(
+        {"default": {"max_concurrency": n_clients, "initial_concurrency": initial}},
+        queue_timeout=30.0,
+        max_retries=3,
+    ) if limited else None
+    ## 일정 구간마다 한 번만 줄이도록 cooldown을 지연 시간 규모에 맞춤
+    if limiter is not None:
+        limiter._limits(MODEL).concurrency.backoff_cooldown = latency * 2
+
+    remaining = iter(range(n_requests))
+    failures = 0
+    limit_trace = []
+
+    async def _client():
+        nonlocal failures
+        for _ in remaining:
+            try:
+                if limiter is None:
+                    await upstream.generate()
+                else:
+                    await limiter.run(MODEL, 0, upstream.generate)
+                    limit_trace.append(limiter._limits(MODEL).concurrency.limit)
+            except RateLimitExceeded:
+                failures += 1
+            except Exception as e:
+                if not is_overload_error(e):
+                    raise
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_client() for _ in range(n_clients)))
+    elapsed = time.perf_counter() - start
+
+    tail = limit_trace[-max(1, len(limit_trace) // 5):]
+    return {
+        "ok_rps": upstream.served / elapsed,
+        "served": upstream.served,
+        "upstream_429": upstream.rejected,
+        "client_failures": failures,
+        "settled_limit": sum(tail) / len(tail) if tail else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--capacity", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--initial", type=int, default=8)
+    args = parser.parse_args()
+
+    ## 재시도 경고 로그는 결과 출력만 가리므로 숨김
+    logging.getLogger("llm").setLevel(logging.ERROR)
+
+    print("=" * 60)
+    for limited in (False, True):
+        r = asyncio.run(run(args.requests, args.clients, args.capacity, args.latency, args.initial, limited))
+        name = "AIMD limiter" if limited else "no limiter  "
+        settled = f"{r['settled_limit']:.1f}" if r["settled_limit"] is not None else "-"
+        print(
+            f" {name} 성공 {r['served']:4d}/{args.requests}  업스트림 429 {r['upstream_429']:5d}"
+            f"  클라이언트 실패 {r['client_failures']:4d}  {r['ok_rps']:7.1f} ok/s  수렴 상한 {settled}"
+            f" (업스트림 용량 {args.capacity})"
+        )
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
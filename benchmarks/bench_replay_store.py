@@ -0,0 +1,106 @@
+"""
+녹화/재생 저장소(model/replay_store.py) 벤치마크.
+
+--records 개의 응답(각 --chunks 개 청크)을 녹화한 뒤, 저장소를 다시 열어
+무작위 키 조회 지연(p50/p99)과 인덱스 열기 시간을 측정합니다.
+마지막으로 fake 백엔드 응답을 RecordingModel로 녹화하고 ReplayModel로 재생하여
+녹화 속도 / 즉시(speed=0) 재생 시간과 내용 일치를 확인합니다.
+
+    python -m benchmarks.bench_replay_store --records 200000 --lookups 20000
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+import benchmarks.common  # noqa: F401  (sys.path / 환경 변수 설정)
+
+from model.fake_backend import FakeGenerativeModel, LatencyDistribution
+from model.replay_store import RecordingModel, ReplayModel, ReplayStore, make_replay_key
+from model.static_response import StaticUsageMetadata
+from utils.timing import percentile
+
+MODEL = "models/gemini-2.5-flash"
+
+
+def bench_store(directory: str, n_records: int, n_chunks: int, n_lookups: int):
+    store = ReplayStore(directory)
+    usage = StaticUsageMetadata(100, 50)
+    chunks = [(f"chunk {i} " * 10, 0.02) for i in range(n_chunks)]
+    keys = [make_replay_key(MODEL, f"query {i}") for i in range(n_records)]
+
+    start = time.perf_counter()
+    for key in keys:
+        store.put(key, chunks, usage)
+    write_s = time.perf_counter() - start
+    store.close()
+
+    start = time.perf_counter()
+    store = ReplayStore(directory, writable=False)
+    open_ms = (time.perf_counter() - start) * 1000
+
+    rng = random.Random(0)
+    latencies = []
+    for key in rng.sample(keys, min(n_lookups, len(keys))):
+        t = time.perf_counter()
+        record = store.get(key)
+        latencies.append(time.perf_counter() - t)
+        assert record is not None
+    miss = store.get(make_replay_key(MODEL, "never recorded"))
+    assert miss is None
+    store.close()
+
+    return {
+        "write_per_s": n_records / write_s,
+        "open_ms": open_ms,
+        "lookup_p50_us": percentile(latencies, 50) * 1e6,
+        "lookup_p99_us": percentile(latencies, 99) * 1e6,
+        "data_mb": os.path.getsize(os.path.join(directory, "data.bin")) / 1e6,
+        "index_mb": os.path.getsize(os.path.join(directory, "index.bin")) / 1e6,
+    }
+
+
+def bench_replay(directory: str):
+    fake = FakeGenerativeModel(MODEL, LatencyDistribution("fixed", 0.1), output_tokens=100, tokens_per_sec=500)
+    store = ReplayStore(directory)
+    recorder = RecordingModel(fake, MODEL, store)
+
+    start = time.perf_counter()
+    recorded = "".join(chunk.text for chunk in recorder.generate_content("hello", stream=True))
+    record_s = time.perf_counter() - start
+
+    results = {"record_s": record_s}
+    for speed in (1.0, 0):
+        replayer = ReplayModel(MODEL, store, speed=speed)
+        start = time.perf_counter()
+        response = replayer.generate_content("hello", stream=True)
+        replayed = "".join(chunk.text for chunk in response)
+        results[f"replay_s_speed_{speed:g}"] = time.perf_counter() - start
+        assert replayed == recorded and response.usage_metadata.candidates_token_count == 100
+    store.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=200000)
+    parser.add_argument("--chunks", type=int, default=5)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        r = bench_store(os.path.join(directory, "store"), args.records, args.chunks, args.lookups)
+        replay = bench_replay(os.path.join(directory, "replay"))
+
+    print("=" * 60)
+    print(f" 녹화: {args.records}건, {r['write_per_s']:.0f} 건/s  (data {r['data_mb']:.1f} MB, index {r['index_mb']:.1f} MB)")
+    print(f" 인덱스 열기: {r['open_ms']:.2f} ms")
+    print(f" 조회 지연: p50 {r['lookup_p50_us']:.1f} us, p99 {r['lookup_p99_us']:.1f} us")
+    print(f" fake 응답 녹화 {replay['record_s']:.3f} s -> 재생(1x) {replay['replay_s_speed_1']:.3f} s,"
+          f" 재생(즉시) {replay['replay_s_speed_0'] * 1000:.2f} ms")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+서버 시작 시간 벤치마크.
+
+새 프로세스에서 `import server`(모듈 import + create_app) 시간과
+startup 이후 /_internal/ready 가 200이 될 때까지의 시간을 --runs 회 측정합니다.
+fake 생성 백엔드와 SQLite DB를 사용하므로 Gemini·Cloud SQL 없이 동작합니다.
+--max-import-s / --max-ready-s 를 넘으면 종료 코드 1을 반환합니다.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def _child():
+    ## 측정 대상 프로세스: import 시간과 ready까지의 시간을 JSON 한 줄로 출력
+    start = time.perf_counter()
+    import server
+    import_s = time.perf_counter() - start
+
+    import httpx
+
+    app = server.app
+    start = time.perf_counter()
+    await app.router.startup()
+    startup_s = time.perf_counter() - start
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        while (await client.get("/_internal/ready")).status_code != 200:
+            await asyncio.sleep(0.005)
+        ready = (await client.get("/_internal/ready")).json()
+    ready_s = time.perf_counter() - start
+    await app.router.shutdown()
+
+    print(json.dumps({
+        "import_s": import_s,
+        "startup_s": startup_s,
+        "ready_s": ready_s,
+        "steps": ready["steps"],
+        "genai_imported": "google.generativeai" in sys.modules,
+    }))
+
+
+def run_once(workdir: str) -> dict:
+    db_path = os.path.join(workdir, "bench.db")
+    if not os.path.exists(db_path):
+        sys.path.insert(0, ROOT)
+        import benchmarks.common  # noqa: F401
+        from db.local_database import LocalDatabase
+        seed_db = LocalDatabase(f"sqlite:///{db_path}", attach_public_schema=True)
+        seed_db.create_prompt_roles([{"id": 1, "name": "role", "description": "", "text": "role text"}])
+        seed_db.close()
+
+    env = dict(
+        os.environ,
+        GEMINI_BACKEND="fake",
+        DB_LOCAL_URL=f"sqlite:///{db_path}",
+        BATCH_JOBS_DIR=os.path.join(workdir, "batch_jobs"),
+        LOG_LEVEL="WARNING",
+        PYTHONWARNINGS="ignore",
+    )
+    for key in ("GOOGLE_APPLICATION_CREDENTIALS", "CLOUD_SQL_INSTANCE", "DB_USER", "DB_PASSWORD",
+                "DB_NAME", "DB_API_DRIVER", "DB_DRIVER", "DB_PROMPT_TABLE"):
+        env.setdefault(key, "bench")
+
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-s", type=float, default=None)
+    parser.add_argument("--max-ready-s", type=float, default=None)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(_child())
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        runs = [run_once(workdir) for _ in range(args.runs)]
+
+    def median(key):
+        values = sorted(r[key] for r in runs)
+        return values[len(values) // 2]
+
+    import_s, startup_s, ready_s = median("import_s"), median("startup_s"), median("ready_s")
+    print("=" * 60)
+    print(f" import server (create_app 포함): {import_s:.3f} s (median of {args.runs})")
+    print(f" startup 반환: {startup_s * 1000:.1f} ms, ready: {ready_s:.3f} s")
+    print(f" 단계별: {json.dumps(runs[-1]['steps'], ensure_ascii=False)}")
+    print(f" google.generativeai import 여부: {runs[-1]['genai_imported']}")
+    print("=" * 60)
+
+    failures = []
+    if args.max_import_s is not None and import_s > args.max_import_s:
+        failures.append(f"import {import_s:.3f} s > {args.max_import_s} s")
+    if args.max_ready_s is not None and ready_s > args.max_ready_s:
+        failures.append(f"ready {ready_s:.3f} s > {args.max_ready_s} s")
+    if failures:
+        print(" 시작 시간 회귀: " + ", ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+벤치마크 공통 설정과 스텁 Gemini 모델.
+"""
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+## 벤치마크는 실제 GCP/Cloud SQL에 접속하지 않으므로 설정값만 채워 둡니다.
+for _key in ("GOOGLE_APPLICATION_CREDENTIALS", "CLOUD_SQL_INSTANCE", "DB_USER", "DB_PASSWORD",
+             "DB_NAME", "DB_API_DRIVER", "DB_DRIVER", "DB_PROMPT_TABLE"):
+    os.environ.setdefault(_key, "bench")
+
+
+USAGE = SimpleNamespace(prompt_token_count=10, candidates_token_count=5)
+N_CHUNKS = 5
+
+
+class StubStream:
+    ## latency를 N_CHUNKS개의 청크에 나누어 블로킹 next()로 흘려보냄
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.usage_metadata = USAGE
+
+    def __iter__(self):
+        for i in range(N_CHUNKS):
+            time.sleep(self.latency / N_CHUNKS)
+            yield SimpleNamespace(text=f"chunk-{i} ")
+
+
+class StubModel:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def generate_content(self, query, generation_config=None, stream=False):
+        if stream:
+            return StubStream(self.latency)
+        time.sleep(self.latency)  ## 블로킹 SDK 호출을 흉내냄
+        return SimpleNamespace(text="ok", usage_metadata=USAGE)
@@ -1,10 +1,10 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from pydantic import Field
-from typing import List, Dict
+from typing import List, Dict, Literal, Optional
 from pathlib import Path
 
-from .utils import load_models_from_file, load_pricing_from_file
+from .utils import load_models_from_file, load_pricing_from_file, load_rate_limits_from_file
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
@@ -17,5 +17,120 @@ class Settings(BaseSettings):
     GOOGLE_APPLICATION_CREDENTIALS: str
     GEMINI_MODELS: List[str] = Field(default_factory=load_models_from_file)
     MODEL_PRICING: Dict[str, Dict[str, float]] = Field(default_factory=load_pricing_from_file)
+    MODEL_RATE_LIMITS: Dict[str, Dict[str, float]] = Field(default_factory=load_rate_limits_from_file)
+
+    ## 생성 백엔드: "gemini" (실제 API), "fake" (부하 테스트용 시뮬레이션, model/fake_backend.py),
+    ## "record" (실제 API 응답을 REPLAY_STORE_DIR에 녹화), "replay" (녹화된 응답 재생, model/replay_store.py)
+    GEMINI_BACKEND: Literal["gemini", "fake", "record", "replay"] = "gemini"
+    REPLAY_STORE_DIR: str = "replay_store"
+    ## 재생 속도 배율 (1.0: 녹화 당시 청크 간격 그대로, 0: 대기 없이 즉시)
+    REPLAY_SPEED: float = Field(1.0, ge=0)
+    ## fake 백엔드: 첫 토큰 지연 분포(fixed / uniform / lognormal / pareto)와 중앙값(ms), 분산 정도
+    FAKE_LATENCY_DIST: Literal["fixed", "uniform", "lognormal", "pareto"] = "lognormal"
+    FAKE_FIRST_TOKEN_MS: float = Field(300.0, ge=0)
+    FAKE_LATENCY_SPREAD: float = Field(0.5, gt=0)
+    ## fake 백엔드: 출력 토큰 수, 초당 생성 토큰 수, 청크당 토큰 수
+    FAKE_OUTPUT_TOKENS: int = Field(200, ge=1)
+    FAKE_TOKENS_PER_SEC: float = Field(100.0, gt=0)
+    FAKE_CHUNK_TOKENS: int = Field(20, ge=1)
+    FAKE_SEED: Optional[int] = None
+    ## fake 백엔드: 모델별 동시 호출 한도. 넘는 호출은 429(RESOURCE_EXHAUSTED)로 거절 (None이면 제한 없음)
+    FAKE_MAX_CONCURRENCY: Optional[int] = Field(None, ge=1)
+
+    ## True면 DB 연결 풀/모델 클라이언트 준비를 백그라운드에서 진행하고 바로 요청을 받기 시작
+    ## (준비 완료 여부는 /_internal/ready, 그 전의 일반 요청은 503). False(기본)면 준비가 끝날 때까지 서버 시작을 지연
+    STARTUP_BACKGROUND: bool = False
+    ## 백그라운드 준비가 실패하면 프로세스를 종료(SIGTERM)하여 프로세스 관리자가 다시 시작하도록 함
+    ## (블로킹 시작에서 startup 예외로 서버가 종료되는 것과 같은 동작)
+    STARTUP_EXIT_ON_FAILURE: bool = True
+
+    ## 프로세스(워커)당 동시에 Gemini를 호출할 수 있는 최대 요청 수
+    GEMINI_MAX_CONCURRENCY: int = Field(32, ge=1)
+    ## 스트리밍 응답 1건당 버퍼링할 최대 청크 수 (초과 시 업스트림 읽기를 멈춤)
+    STREAM_QUEUE_MAXSIZE: int = Field(64, ge=1)
+    ## 스트림 펌프(업스트림 스트림을 끝까지 읽는 스레드) 전용 풀 크기. Gemini 호출 풀과 별도
+    STREAM_PUMP_WORKERS: int = Field(128, ge=1)
+    ## 버퍼가 가득 찬 채 클라이언트가 이 시간(초) 동안 읽지 않으면 업스트림을 끊고 스레드를 반납
+    STREAM_STALL_TIMEOUT: float = Field(30.0, gt=0)
+
+    ## 모델별 호출 한도(rpm/tpm)와 적응형 동시성(AIMD). 한도 초과 시 최대 RATE_LIMIT_QUEUE_TIMEOUT 초 대기
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_QUEUE_TIMEOUT: float = Field(10.0, ge=0)
+    ## Gemini가 429/RESOURCE_EXHAUSTED를 반환했을 때 다시 대기열에 넣어 재시도하는 횟수
+    RATE_LIMIT_MAX_RETRIES: int = Field(2, ge=0)
+    ## 재시도 전 대기: RATE_LIMIT_RETRY_BASE_DELAY * 2^시도 (최대 RATE_LIMIT_RETRY_MAX_DELAY, full jitter).
+    ## 오류에 retry-after가 있으면 그 값을 우선합니다.
+    RATE_LIMIT_RETRY_BASE_DELAY: float = Field(0.5, ge=0)
+    RATE_LIMIT_RETRY_MAX_DELAY: float = Field(8.0, ge=0)
+
+    ## 동시에 들어온 동일한 결정적 요청(프롬프트 + 생성 설정, temperature == 0)은 업스트림 호출 1회를 공유
+    SINGLE_FLIGHT_ENABLED: bool = True
+
+    ## 비스트리밍 요청 hedging: 모델별 최근 지연의 HEDGE_QUANTILE 백분위만큼 응답이 없으면 중복 요청
+    HEDGE_ENABLED: bool = False
+    HEDGE_QUANTILE: float = Field(95.0, gt=0, lt=100)
+    HEDGE_WINDOW: int = Field(200, ge=1)
+    ## 표본이 HEDGE_MIN_SAMPLES 개 미만이면 HEDGE_DEFAULT_DELAY 초 사용
+    HEDGE_MIN_SAMPLES: int = Field(20, ge=1)
+    HEDGE_DEFAULT_DELAY: float = Field(2.0, gt=0)
+    HEDGE_MIN_DELAY: float = Field(0.05, ge=0)
+    ## 전체 요청 대비 hedge 비율 상한 (0.1 = 최대 10%)
+    HEDGE_MAX_RATIO: float = Field(0.1, ge=0, le=1)
+
+    ## Redis 공유 응답 캐시 (temperature == 0 요청에만 적용, 기본 비활성)
+    REDIS_URL: str = "redis://localhost:6379/0"
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_TTL: int = Field(86400, ge=1)
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: int = Field(256 * 1024, ge=1)
+    RESPONSE_CACHE_MAX_ENTRIES: int = Field(10000, ge=1)
+    ## 캐시된 응답을 스트리밍으로 재생할 때 청크 1개의 글자 수
+    RESPONSE_CACHE_REPLAY_CHUNK_CHARS: int = Field(64, ge=1)
+
+    ## 호출 전(pre-flight) 입력 토큰/최악의 경우 비용 추정과 한도 검사
+    PREFLIGHT_ENABLED: bool = True
+    ## role 텍스트는 모델의 count_tokens로 정확히 셈 (role 버전당 API 1회, 나머지는 로컬 근사)
+    PREFLIGHT_EXACT_TOKENS: bool = False
+    ## None이면 검사하지 않음. 입력 토큰 상한 기본값은 Gemini 2.5 컨텍스트 크기
+    PREFLIGHT_MAX_INPUT_TOKENS: Optional[int] = Field(1_048_576, ge=1)
+    ## 요청 1건의 최악의 경우(출력이 max_output_tokens까지) 비용 상한 (USD)
+    PREFLIGHT_MAX_COST_USD: Optional[float] = Field(None, gt=0)
+    PREFLIGHT_ROLE_CACHE_SIZE: int = Field(1024, ge=1)
+
+    ## 긴 role 프롬프트의 컨텍스트 캐시 (Gemini CachedContent, fake 백엔드는 로컬 stand-in)
+    CONTEXT_CACHE_ENABLED: bool = False
+    CONTEXT_CACHE_TTL: int = Field(3600, ge=60)
+    ## 남은 TTL이 CONTEXT_CACHE_TTL * 이 비율 이하가 되면 사용 시 TTL 연장
+    CONTEXT_CACHE_REFRESH_RATIO: float = Field(0.5, gt=0, lt=1)
+    CONTEXT_CACHE_MAX_ENTRIES: int = Field(64, ge=1)
+    ## role 접두부가 이보다 짧으면 캐시하지 않음 (Gemini 최소 캐시 크기)
+    CONTEXT_CACHE_MIN_TOKENS: int = Field(1024, ge=0)
+    ## 캐시 생성에 실패한 role 버전은 이 시간(초) 동안 전체 프롬프트로 호출
+    CONTEXT_CACHE_RETRY_AFTER: float = Field(300.0, ge=0)
+
+    ## 응답 압축 (brotli 패키지가 있으면 br 우선, 없으면 gzip). SSE 스트리밍 응답은 압축하지 않음
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = Field(500, ge=0)
+    COMPRESSION_GZIP_LEVEL: int = Field(6, ge=1, le=9)
+    COMPRESSION_BROTLI_QUALITY: int = Field(4, ge=0, le=11)
+
+    ## 스트리밍 중 클라이언트 연결이 끊기면 업스트림 생성을 중단 (Request.is_disconnected 확인 주기, 초)
+    CANCEL_ON_DISCONNECT: bool = True
+    DISCONNECT_POLL_INTERVAL: float = Field(0.5, gt=0)
+
+    ## 워커 간 공유 상태 (rpm/tpm 버킷, role 캐시 무효화 전파)
+    ## none: 워커별 상태, redis: REDIS_URL 공유, memory: 프로세스 내부 (단일 워커/테스트용)
+    SHARED_STATE_BACKEND: Literal["none", "memory", "redis"] = "none"
+
+    ## 구조화 로깅 (프롬프트 본문 로깅은 LOG_PROMPTS=false 로 끌 수 있음)
+    LOG_LEVEL: str = "INFO"
+    LOG_QUEUE_SIZE: int = Field(10000, ge=1)
+    LOG_PROMPTS: bool = True
+    LOG_PROMPT_SAMPLE_RATE: float = Field(1.0, ge=0.0, le=1.0)
+    LOG_PROMPT_MAX_CHARS: int = Field(500, ge=0)
+
+    ## 오프라인 배치 평가 작업
+    BATCH_JOBS_DIR: str = "batch_jobs"
+    BATCH_DEFAULT_CONCURRENCY: int = Field(8, ge=1)
+    BATCH_DEFAULT_QPS: Optional[float] = Field(None, gt=0)
 
 settings = Settings()
\ No newline at end of file
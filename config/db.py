@@ -1,7 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from pydantic import Field
-from typing import List, Dict
+from typing import List, Dict, Optional
 from pathlib import Path
 
 from .utils import load_models_from_file, load_pricing_from_file
@@ -24,4 +24,47 @@ class DBSettings(BaseSettings):
 
     DB_PROMPT_TABLE: str
 
+    ## Cloud SQL 대신 로컬 DB 사용 (e.g., "sqlite:///bench.db"). 지정하면 CLOUD_SQL_* 설정은 사용하지 않음
+    DB_LOCAL_URL: Optional[str] = None
+    DB_LOCAL_ASYNC_URL: Optional[str] = None
+
+    ## async 엔진 (asyncpg 등) 사용 여부와 드라이버
+    DB_ASYNC_ENABLED: bool = False
+    DB_ASYNC_DRIVER: str = "postgresql+asyncpg"
+    DB_ASYNC_API_DRIVER: str = "asyncpg"
+
+    ## 연결 풀 설정 (Cloud SQL 커넥터 핸드셰이크가 느리므로 시작 시 DB_POOL_WARMUP 개를 미리 연결)
+    DB_POOL_SIZE: int = Field(5, ge=1)
+    DB_MAX_OVERFLOW: int = Field(10, ge=0)
+    DB_POOL_TIMEOUT: float = Field(30.0, gt=0)
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_WARMUP: int = Field(2, ge=0)
+
+    ## 쿼리 이력 저장 (버퍼링 후 일괄 INSERT). 프롬프트 응답 원문을 저장하므로 기본은 꺼짐
+    HISTORY_ENABLED: bool = False
+    ## 이력 조회(/query_history, /export/query_history)에 필요한 토큰 (Authorization: Bearer <토큰>).
+    ## 지정하지 않으면 API로는 이력을 조회할 수 없음
+    HISTORY_ACCESS_TOKEN: Optional[str] = None
+    HISTORY_TABLE: str = "query_history"
+    HISTORY_BATCH_SIZE: int = Field(100, ge=1)
+    HISTORY_FLUSH_INTERVAL: float = Field(2.0, gt=0)
+    HISTORY_MAX_BUFFER: int = Field(10000, ge=1)
+    HISTORY_RESPONSE_MAX_CHARS: int = Field(2000, ge=0)
+
+    ## prompt_role 캐시 설정
+    ROLE_CACHE_TTL: float = Field(300.0, gt=0)
+    ROLE_CACHE_MAX_SIZE: int = Field(1024, ge=1)
+    ## 결과가 바뀌면 캐시 전체를 무효화하는 버전 쿼리 (결과 행 전체의 해시를 비교).
+    ## None(기본)이면 DB 종류별 기본 쿼리(id/name/description/text 해시, db.role_cache 참고), 빈 문자열이면 검사하지 않음
+    ROLE_CACHE_VERSION_SQL: Optional[str] = None
+    ROLE_CACHE_VERSION_CHECK_INTERVAL: float = Field(30.0, gt=0)
+
+    ## prompt_role 메모리 검색 색인 (/search_role_prompts). role 캐시 무효화 시 함께 갱신
+    ROLE_SEARCH_ENABLED: bool = True
+    ## 검색어 토큰 하나당 접두어/오타 허용으로 확장할 최대 토큰 수
+    ROLE_SEARCH_MAX_EXPANSIONS: int = Field(32, ge=1)
+    ## 오타 허용 일치로 인정할 최소 trigram 유사도 (dice 계수)
+    ROLE_SEARCH_FUZZY_THRESHOLD: float = Field(0.45, gt=0, le=1)
+
 db_settings = DBSettings()
\ No newline at end of file
@@ -16,5 +16,13 @@ def load_pricing_from_file(file_path: Path = Path("metadata/gemini_pricing.json"
     if not file_path.exists():
         print(f"경고: 요금 정보 파일 '{file_path}'를 찾을 수 없습니다. 기본값으로 빈 사전을 사용합니다.")
         return {}
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_rate_limits_from_file(file_path: Path = Path("metadata/gemini_rate_limits.json")) -> dict:
+
+    if not file_path.exists():
+        print(f"경고: 호출 한도 파일 '{file_path}'를 찾을 수 없습니다. 호출 한도 없이 동작합니다.")
+        return {}
     with open(file_path, "r", encoding="utf-8") as f:
         return json.load(f)
\ No newline at end of file
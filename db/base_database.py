@@ -0,0 +1,189 @@
+import time
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from starlette.concurrency import run_in_threadpool
+
+class WaitStats:
+    """
+    연결 풀에서 연결을 얻기까지 걸린 시간(대기 시간) 통계.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total_s += seconds
+            self.max_s = max(self.max_s, seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_s / self.count * 1000, 4) if self.count else 0.0,
+            "max_ms": round(self.max_s * 1000, 4),
+            "total_ms": round(self.total_s * 1000, 4),
+        }
+
+def _pool_counts(pool) -> Dict[str, Any]:
+    ## QueuePool 계열만 size/overflow 정보를 제공
+    counts = {"pool_class": type(pool).__name__}
+    for name, key in (("size", "size"), ("checkedout", "checked_out"), ("checkedin", "idle"), ("overflow", "overflow")):
+        method = getattr(pool, name, None)
+        if callable(method):
+            counts[key] = method()
+    ## SQLAlchemy의 overflow()는 풀이 덜 찼을 때 음수이므로, 사용 중인 초과 연결 수로 변환
+    if "overflow" in counts:
+        counts["overflow"] = max(0, counts["overflow"])
+    return counts
+
+class SQLAlchemyDatabase:
+    """
+    sync 엔진과 (선택) async 엔진을 보관하고 공통 조회 메서드를 제공하는 기반 클래스.
+    CloudSQLDatabase와 로컬 대체 DB(LocalDatabase)가 이 인터페이스를 공유합니다.
+    """
+
+    def __init__(self):
+        self.engine: Optional[Engine] = None
+        self.async_engine = None
+        self.wait_stats = WaitStats()
+        self.async_wait_stats = WaitStats()
+
+    def get_engine(self) -> Engine:
+        """
+        생성된 SQLAlchemy 엔진(연결 풀)을 반환합니다.
+        """
+        return self.engine
+
+    def get_async_engine(self):
+        """
+        async 엔진(AsyncEngine)을 반환합니다. 초기화하지 않았다면 None.
+        """
+        return self.async_engine
+
+    def connect(self) -> Connection:
+        """
+        풀에서 연결을 얻습니다. 대기 시간은 pool_stats()에 집계됩니다.
+        """
+        start = time.perf_counter()
+        conn = self.engine.connect()
+        self.wait_stats.record(time.perf_counter() - start)
+        return conn
+
+    @asynccontextmanager
+    async def connect_async(self):
+        start = time.perf_counter()
+        async with self.async_engine.connect() as conn:
+            self.async_wait_stats.record(time.perf_counter() - start)
+            yield conn
+
+    def fetch_all(self, sql: str, params: dict = None) -> List[Dict]:
+        # sync 엔진용 편의 메서드
+        with self.connect() as conn:
+            res = conn.execute(text(sql), params or {})
+            return [dict(r) for r in res.mappings().all()]
+
+    async def fetch_all_async(self, sql: str, params: dict = None) -> List[Dict]:
+        # async 엔진용 편의 메서드 (async 엔진이 없으면 스레드 풀에서 sync 엔진 사용)
+        if self.async_engine is None:
+            return await run_in_threadpool(self.fetch_all, sql, params)
+        async with self.connect_async() as conn:
+            res = await conn.execute(text(sql), params or {})
+            return [dict(r) for r in res.mappings().all()]
+
+    def iter_batches(self, sql: str, params: dict = None, batch_size: int = 500) -> Iterator[List[Dict]]:
+        """
+        서버 측 커서(stream_results + yield_per)로 결과를 batch_size 행씩 읽습니다.
+        전체 결과를 메모리에 올리지 않으므로 테이블 크기와 관계없이 메모리 사용량이 일정합니다.
+        """
+        with self.connect() as conn:
+            res = conn.execution_options(stream_results=True, yield_per=batch_size).execute(text(sql), params or {})
+            for part in res.mappings().partitions():
+                yield [dict(r) for r in part]
+
+    async def iter_batches_async(self, sql: str, params: dict = None, batch_size: int = 500) -> AsyncIterator[List[Dict]]:
+        """
+        iter_batches()의 async 버전. async 엔진이 없으면 스레드 풀에서 sync 커서를 한 배치씩 읽습니다.
+        중간에 중단(클라이언트 연결 종료 등)되면 커서와 연결을 바로 반납합니다.
+        """
+        if self.async_engine is None:
+            batches = self.iter_batches(sql, params, batch_size)
+            try:
+                while True:
+                    batch = await run_in_threadpool(next, batches, None)
+                    if batch is None:
+                        return
+                    yield batch
+            finally:
+                await run_in_threadpool(batches.close)
+
+        async with self.connect_async() as conn:
+            res = await conn.stream(text(sql), params or {}, execution_options={"yield_per": batch_size})
+            try:
+                ## async 결과에는 yield_per가 파티션 크기로 전달되지 않으므로 크기를 직접 지정
+                async for part in res.mappings().partitions(batch_size):
+                    yield [dict(r) for r in part]
+            finally:
+                await res.close()
+
+    def warm_up(self, n: int) -> float:
+        """
+        n개의 연결을 병렬로 열었다가 풀에 반납하여, 첫 요청들이 느린 연결 생성(핸드셰이크)을 기다리지 않게 합니다.
+        소요 시간(초)을 반환합니다. 연결 실패 시 예외를 그대로 전달합니다.
+        """
+        start = time.perf_counter()
+        n = max(1, n)
+        with ThreadPoolExecutor(max_workers=n, thread_name_prefix="db-warmup") as executor:
+            futures = [executor.submit(self.engine.connect) for _ in range(n)]
+            conns, error = [], None
+            for future in futures:
+                try:
+                    conns.append(future.result())
+                except Exception as e:
+                    error = error or e
+        for conn in conns:
+            conn.close()
+        if error is not None:
+            raise error
+        return time.perf_counter() - start
+
+    async def warm_up_async(self, n: int) -> float:
+        """
+        async 엔진 풀을 n개의 연결로 미리 채웁니다. 연결 실패 시 열린 연결을 모두 반납한 뒤 예외를 전달합니다.
+        """
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *[self.async_engine.connect().start() for _ in range(max(1, n))], return_exceptions=True
+        )
+        conns = [r for r in results if not isinstance(r, BaseException)]
+        await asyncio.gather(*[conn.close() for conn in conns])
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return time.perf_counter() - start
+
+    def pool_stats(self) -> Dict[str, Any]:
+        stats = {"sync": {**_pool_counts(self.engine.pool), "wait": self.wait_stats.to_dict()}}
+        if self.async_engine is not None:
+            stats["async"] = {
+                **_pool_counts(self.async_engine.sync_engine.pool),
+                "wait": self.async_wait_stats.to_dict(),
+            }
+        return stats
+
+    def close(self):
+        if self.engine is not None:
+            self.engine.dispose()
+
+    async def close_async(self):
+        if self.async_engine is not None:
+            await self.async_engine.dispose()
+            self.async_engine = None
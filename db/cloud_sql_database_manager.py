@@ -2,14 +2,19 @@ import sqlalchemy
 from sqlalchemy import text
 from sqlalchemy.engine import Engine, Row
 from sqlalchemy.exc import SQLAlchemyError
-from google.cloud.sql.connector import Connector, IPTypes
-from google.auth import load_credentials_from_file
 import os
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
 
 from config.base import settings
+from db.base_database import SQLAlchemyDatabase
+from utils.log import get_logger
 
-class CloudSQLDatabase:
+logger = get_logger("cloud_sql")
+
+if TYPE_CHECKING:
+    from google.cloud.sql.connector import IPTypes
+
+class CloudSQLDatabase(SQLAlchemyDatabase):
     """
     Google Cloud SQL 데이터베이스 연결 및 CRUD 작업을 관리하는 클래스.
     SQLAlchemy 엔진을 생성하고 사용자 데이터 관리를 위한 메서드를 제공합니다.
@@ -24,7 +29,8 @@ class CloudSQLDatabase:
         db_api_driver: str,
         cred_path: str, 
         db_driver: str = "postgresql+psycopg2",
-        ip_type: IPTypes = IPTypes.PUBLIC
+        ip_type: Optional["IPTypes"] = None,
+        pool_options: Optional[dict] = None
     ):
         """
         CloudSQLDatabase 인스턴스를 초기화합니다.
@@ -36,23 +42,34 @@ class CloudSQLDatabase:
             db_name (str): 데이터베이스 이름.
             db_api_driver (str): Cloud SQL Connector용 순수 DBAPI 드라이버 (e.g., "psycopg2").
             db_driver (str, optional): SQLAlchemy용 전체 드라이버 문자열 (e.g., "postgresql+psycopg2"). Defaults to "postgresql+psycopg2".
-            ip_type (IPTypes, optional): 연결할 IP 유형. Defaults to IPTypes.PUBLIC.
+            ip_type (IPTypes, optional): 연결할 IP 유형. Defaults to IPTypes.PUBLIC (None).
+            pool_options (dict, optional): create_engine에 전달할 연결 풀 설정
+                (pool_size, max_overflow, pool_timeout, pool_recycle, pool_pre_ping). Defaults to SQLAlchemy 기본값.
         """
+        ## 커넥터/google.auth import는 시작 시간을 줄이기 위해 실제 생성 시점까지 미룸
+        from google.cloud.sql.connector import Connector, IPTypes
+        from google.auth import load_credentials_from_file
+
+        super().__init__()
         self.instance_connection_name = instance_connection_name
         self.db_user = db_user
         self.db_pass = db_pass
         self.db_name = db_name
         self.db_driver = db_driver
         self.db_api_driver = db_api_driver
-        self.ip_type = ip_type
+        self.ip_type = ip_type or IPTypes.PUBLIC
+        self.pool_options = pool_options or {}
 
         credentials, _ = load_credentials_from_file(
             cred_path, scopes=["https://www.googleapis.com/auth/cloud-platform"]
         )
+        self.credentials = credentials
         self.connector = Connector(credentials=credentials)
         self.engine = self._create_engine()
+        self.async_connector = None
+        self.async_db_api_driver = None
 
-        print('✅ Complete to Build Cloud SQL!')
+        logger.info('✅ Complete to Build Cloud SQL!')
 
     def _getconn(self) -> sqlalchemy.engine.base.Connection:
         """
@@ -77,13 +94,43 @@ class CloudSQLDatabase:
         return sqlalchemy.create_engine(
             sqlalchemy.engine.url.URL.create(drivername=self.db_driver, query={}),
             creator=self._getconn,
+            **self.pool_options,
         )
 
-    def get_engine(self) -> Engine:
+    async def _getconn_async(self):
         """
-        생성된 SQLAlchemy 엔진(연결 풀)을 반환합니다.
+        async Cloud SQL 커넥터를 통해 새 DB 연결 객체(asyncpg 등)를 가져오는 내부 함수.
+        """
+        return await self.async_connector.connect_async(
+            self.instance_connection_name,
+            self.async_db_api_driver,
+            user=self.db_user,
+            password=self.db_pass,
+            db=self.db_name,
+            ip_type=self.ip_type
+        )
+
+    async def init_async_engine(self, db_driver: str = "postgresql+asyncpg", db_api_driver: str = "asyncpg"):
         """
-        return self.engine
+        sync 엔진과 별도로 async 엔진(AsyncEngine)을 생성합니다.
+        async 커넥터는 실행 중인 이벤트 루프에 묶이므로 앱 startup 안에서 호출해야 합니다.
+
+        Args:
+            db_driver (str): SQLAlchemy async 드라이버 문자열 (e.g., "postgresql+asyncpg").
+            db_api_driver (str): Cloud SQL Connector용 async DBAPI 드라이버 (e.g., "asyncpg").
+        """
+        from google.cloud.sql.connector import create_async_connector
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        self.async_db_api_driver = db_api_driver
+        self.async_connector = await create_async_connector(credentials=self.credentials)
+        self.async_engine = create_async_engine(
+            sqlalchemy.engine.url.URL.create(drivername=db_driver, query={}),
+            async_creator=self._getconn_async,
+            **self.pool_options,
+        )
+        logger.info('✅ Complete to Build Cloud SQL async engine!')
+        return self.async_engine
 
     def close(self):
         """
@@ -92,20 +139,36 @@ class CloudSQLDatabase:
         if self.engine:
             self.engine.dispose()
         if self.connector:
-            print("Cloud SQL 커넥터 리소스를 정리합니다...")
+            logger.info("Cloud SQL 커넥터 리소스를 정리합니다...")
             self.connector.close()
 
+    async def close_async(self):
+        """
+        async 엔진과 async 커넥터를 정리합니다.
+        """
+        await super().close_async()
+        if self.async_connector:
+            await self.async_connector.close_async()
+            self.async_connector = None
+
     def get_data(self, table_name) -> List[Row]:
+        ## 큰 테이블은 iter_data()로 나누어 읽으세요 (전체 결과를 리스트로 반환)
         
         select_stmt = sqlalchemy.text(f"SELECT * FROM {table_name} ORDER BY id;")
         try:
-            with self.engine.connect() as conn:
+            with self.connect() as conn:
                 result = conn.execute(select_stmt)
                 return result.fetchall()
         except SQLAlchemyError as e:
-            print(f"모든 사용자 조회 실패: {e}")
+            logger.warning("모든 사용자 조회 실패: %s", e)
             return []
     
+    def iter_data(self, table_name, batch_size: int = 500) -> Iterator[List[Dict]]:
+        """
+        get_data()의 스트리밍 버전: 서버 측 커서로 batch_size 행씩 반환합니다.
+        """
+        return self.iter_batches(f"SELECT * FROM {table_name} ORDER BY id", batch_size=batch_size)
+
     def get_table_columns(self, table_name: str):
         """
         주어진 테이블의 컬럼 정보를 조회합니다.
@@ -123,27 +186,20 @@ class CloudSQLDatabase:
         """)
 
         try:
-            with self.engine.connect() as conn:
+            with self.connect() as conn:
                 result = conn.execute(query, {"table_name": table_name})
                 columns = result.fetchall()
-                print(f"[{table_name}] 테이블의 컬럼 정보:")
-                for col in columns:
-                    print(f" - {col.column_name} ({col.data_type}) "
+                logger.info(
+                    "[%s] 테이블의 컬럼 정보:\n%s",
+                    table_name,
+                    "\n".join(
+                        f" - {col.column_name} ({col.data_type}) "
                         f"{'NULL' if col.is_nullable == 'YES' else 'NOT NULL'} "
-                        f"default={col.column_default}")
+                        f"default={col.column_default}"
+                        for col in columns
+                    ),
+                )
                 return columns
         except SQLAlchemyError as e:
-            print(f"컬럼 정보 조회 실패: {e}")
+            logger.warning("컬럼 정보 조회 실패: %s", e)
             return []
-
-    def fetch_all(self, sql: str, params: dict = None):
-        # sync 엔진용 편의 메서드
-        with self.engine.connect() as conn:
-            res = conn.execute(text(sql), params or {})
-            return [dict(r) for r in res.fetchall()]
-
-    async def fetch_all_async(self, sql: str, params: dict = None):
-        # async 엔진용 편의 메서드
-        async with self.engine.connect() as conn:
-            res = await conn.execute(text(sql), params or {})
-            return [dict(r) for r in res.fetchall()]
\ No newline at end of file
@@ -0,0 +1,161 @@
+import asyncio
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import (
+    BigInteger, Boolean, Column, DateTime, Float, Integer, MetaData, Table, Text, func, select
+)
+from starlette.concurrency import run_in_threadpool
+
+from utils.log import get_logger
+
+logger = get_logger("history")
+
+def make_history_table(table_name: str = "query_history", schema: Optional[str] = "public") -> Table:
+    return Table(
+        table_name,
+        MetaData(schema=schema),
+        Column("id", BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True),
+        Column("created_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+        Column("request_id", Text),
+        Column("model_name", Text, nullable=False),
+        Column("role_id", Integer),
+        Column("stream", Boolean),
+        Column("temperature", Float),
+        Column("top_k", Integer),
+        Column("top_p", Float),
+        Column("max_output_tokens", Integer),
+        Column("input_tokens", Integer),
+        Column("output_tokens", Integer),
+        Column("cost", Float),
+        Column("latency", Float),
+        Column("cached", Boolean),
+        Column("response_text", Text),
+    )
+
+class HistoryWriter:
+    """
+    쿼리 이력을 메모리에 모았다가 한 번에 multi-row INSERT로 저장하는 writer.
+
+    - record(): 요청 경로에서는 버퍼에 추가만 합니다 (DB 접근 없음).
+    - 버퍼가 batch_size 이상이 되거나 flush_interval 초가 지나면 백그라운드 태스크가 저장합니다.
+    - 버퍼가 max_buffer를 넘으면 가장 오래된 레코드부터 버립니다 (dropped 카운트).
+    - close(): 남은 레코드를 모두 저장합니다 (앱 shutdown 시 호출).
+    """
+
+    def __init__(
+        self,
+        db,
+        table: Table,
+        batch_size: int = 100,
+        flush_interval: float = 2.0,
+        max_buffer: int = 10000,
+        response_max_chars: int = 2000,
+    ):
+        self.db = db
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.response_max_chars = response_max_chars
+
+        self._buffer: deque = deque(maxlen=max_buffer)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failures = 0
+
+    def create_table(self):
+        """
+        이력 테이블이 없으면 생성합니다. (동기 함수, startup에서 스레드 풀로 실행)
+        """
+        self.table.metadata.create_all(self.db.get_engine(), tables=[self.table])
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def record(self, **fields):
+        response_text = fields.get("response_text")
+        if response_text and len(response_text) > self.response_max_chars:
+            fields["response_text"] = response_text[:self.response_max_chars]
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(fields)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _insert(self, rows: List[Dict[str, Any]]):
+        ## executemany -> SQLAlchemy insertmanyvalues로 multi-row INSERT 배치 실행
+        with self.db.connect() as conn:
+            conn.execute(self.table.insert(), rows)
+            conn.commit()
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            written = 0
+            while self._buffer:
+                rows = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                try:
+                    await run_in_threadpool(self._insert, rows)
+                except Exception as e:
+                    ## 실패한 배치는 버퍼 앞쪽에 되돌려 다음 flush에서 재시도
+                    self.failures += 1
+                    logger.warning("쿼리 이력 저장 실패 (%d건, 다음 주기에 재시도): %s", len(rows), e)
+                    for row in reversed(rows):
+                        if len(self._buffer) == self._buffer.maxlen:
+                            self.dropped += 1
+                            break
+                        self._buffer.appendleft(row)
+                    break
+                written += len(rows)
+            if written:
+                self.written += written
+                self.flushes += 1
+            return written
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def _query(self, before_id: Optional[int], limit: int, model_name: Optional[str]) -> List[Dict]:
+        stmt = select(self.table).order_by(self.table.c.id.desc()).limit(limit)
+        if before_id is not None:
+            stmt = stmt.where(self.table.c.id < before_id)
+        if model_name:
+            stmt = stmt.where(self.table.c.model_name == model_name)
+        with self.db.connect() as conn:
+            return [dict(r) for r in conn.execute(stmt).mappings().all()]
+
+    async def query(self, before_id: Optional[int] = None, limit: int = 50, model_name: Optional[str] = None) -> Dict:
+        """
+        최신순 keyset 페이지네이션 (id < before_id). 다음 페이지는 next_before_id로 조회합니다.
+        """
+        rows = await run_in_threadpool(self._query, before_id, limit, model_name)
+        next_before_id = rows[-1]["id"] if len(rows) == limit else None
+        return {"items": rows, "next_before_id": next_before_id}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+        }
@@ -0,0 +1,78 @@
+from typing import Dict, List
+
+import sqlalchemy
+from sqlalchemy import event
+
+from db.base_database import SQLAlchemyDatabase
+
+class LocalDatabase(SQLAlchemyDatabase):
+    """
+    Cloud SQL 없이 로컬 DB(SQLite, 로컬 Postgres 등)로 동작하는 대체 구현.
+    테스트/벤치마크에서 CloudSQLDatabase 대신 app.state.cloudsql_db로 사용합니다.
+
+    예) LocalDatabase("sqlite:///roles.db", async_url="sqlite+aiosqlite:///roles.db", attach_public_schema=True)
+    """
+
+    def __init__(
+        self,
+        url: str,
+        async_url: str = None,
+        attach_public_schema: bool = False,
+        pool_options: dict = None,
+        **engine_kwargs,
+    ):
+        """
+        Args:
+            url (str): sync 엔진 URL.
+            async_url (str, optional): async 엔진 URL (e.g., "sqlite+aiosqlite://", "postgresql+asyncpg://...").
+            attach_public_schema (bool): SQLite에서 `public.` 스키마 접두어를 쓰는 쿼리가 동작하도록
+                같은 파일을 `public` 이름으로 ATTACH 합니다.
+            pool_options (dict, optional): sync/async 엔진 모두에 전달할 연결 풀 설정
+                (pool_size, max_overflow, pool_timeout, pool_recycle, pool_pre_ping).
+            **engine_kwargs: sync 엔진 create_engine에만 전달할 추가 인자.
+        """
+        super().__init__()
+        self.url = url
+        self.pool_options = pool_options or {}
+        self.engine = sqlalchemy.create_engine(url, **self.pool_options, **engine_kwargs)
+        if attach_public_schema:
+            self._attach_public_schema(self.engine)
+
+        if async_url:
+            from sqlalchemy.ext.asyncio import create_async_engine
+
+            self.async_engine = create_async_engine(async_url, **self.pool_options)
+            if attach_public_schema:
+                self._attach_public_schema(self.async_engine.sync_engine)
+
+    @staticmethod
+    def _attach_public_schema(engine):
+        database = engine.url.database or ":memory:"
+
+        @event.listens_for(engine, "connect")
+        def _attach(dbapi_conn, _):
+            cursor = dbapi_conn.cursor()
+            cursor.execute(f"ATTACH DATABASE '{database}' AS public")
+            cursor.close()
+
+    def create_prompt_roles(self, roles: List[Dict]):
+        """
+        prompt_role 테이블(id, name, description, text)을 만들고 roles를 채웁니다. 기존 행은 지웁니다.
+
+        Args:
+            roles (List[Dict]): {"id", "name", "description", "text"} 목록.
+        """
+        with self.engine.begin() as conn:
+            conn.execute(sqlalchemy.text(
+                "CREATE TABLE IF NOT EXISTS public.prompt_role ("
+                "id INTEGER PRIMARY KEY, name TEXT, description TEXT, text TEXT)"
+            ))
+            conn.execute(sqlalchemy.text("DELETE FROM public.prompt_role"))
+            if roles:
+                conn.execute(
+                    sqlalchemy.text(
+                        "INSERT INTO public.prompt_role (id, name, description, text) "
+                        "VALUES (:id, :name, :description, :text)"
+                    ),
+                    roles,
+                )
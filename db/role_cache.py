@@ -0,0 +1,244 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utils.log import get_logger
+
+logger = get_logger("role_cache")
+
+ROLE_TEXT_SQL = "SELECT text FROM public.prompt_role WHERE id = :id"
+ROLE_METADATA_SQL = """
+    SELECT id, name, description
+    FROM public.prompt_role
+    ORDER BY id;
+"""
+## 버전 쿼리: 모든 role의 (id, name, description, text)에 대한 해시. 길이가 같은 수정, 이름/설명 변경도 감지합니다.
+## Postgres는 DB에서 해시 1개로 줄여 반환하고, 그 외(SQLite, MySQL 등)는 행을 읽어 파이썬에서 해시합니다.
+ROLE_VERSION_SQL_POSTGRES = """
+    SELECT md5(string_agg(
+        id::text || ':' || md5(coalesce(name, '')) || md5(coalesce(description, '')) || md5(coalesce(text, '')),
+        ',' ORDER BY id
+    ))
+    FROM public.prompt_role
+"""
+ROLE_VERSION_SQL_ROWS = "SELECT id, name, description, text FROM public.prompt_role ORDER BY id"
+
+def default_version_sql(db) -> str:
+    """
+    db 엔진 종류에 맞는 기본 버전 쿼리.
+    """
+    engine = getattr(db, "engine", None)
+    if engine is not None and engine.dialect.name == "postgresql":
+        return ROLE_VERSION_SQL_POSTGRES
+    return ROLE_VERSION_SQL_ROWS
+
+class RolePromptCache:
+    """
+    prompt_role 조회 결과(role 텍스트, role 메타데이터 목록)를 프로세스 메모리에 보관하는 캐시.
+
+    - 항목별 TTL과 최대 항목 수(LRU 방식 제거)로 크기를 제한합니다.
+    - 주기적으로 버전 쿼리(version_sql)를 실행하여 결과가 바뀌면 캐시 전체를 무효화합니다.
+    - 같은 키의 동시 miss는 DB 조회 1회를 공유합니다.
+    - 무효화 세대(generation): 조회 도중 invalidate()가 일어나면 그 조회 결과는 캐시에 저장하지 않습니다.
+    - hit/miss 등 카운터를 stats()로 제공합니다.
+    """
+
+    METADATA_KEY = "__metadata__"
+
+    def __init__(
+        self,
+        db,
+        ttl: float = 300.0,
+        max_size: int = 1024,
+        version_sql: Optional[str] = None,
+        version_check_interval: float = 30.0,
+    ):
+        """
+        Args:
+            db: fetch_all_async()를 제공하는 SQLAlchemyDatabase (CloudSQLDatabase, LocalDatabase 등).
+            ttl (float): 항목 유효 시간(초).
+            max_size (int): 최대 항목 수. 초과 시 가장 오래 사용되지 않은 항목부터 제거합니다.
+            version_sql (str, optional): 테이블 버전을 나타내는 값을 돌려주는 쿼리 (결과 행 전체를 해시하여 비교).
+                None이면 버전 검사를 하지 않습니다.
+            version_check_interval (float): 버전 검사 주기(초).
+        """
+        self.db = db
+        self.ttl = ttl
+        self.max_size = max_size
+        self.version_sql = version_sql
+        self.version_check_interval = version_check_interval
+
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        ## invalidate()마다 증가. 조회 시작 시점과 다르면 결과를 저장하지 않음
+        self._generation = 0
+        ## 키 -> 진행 중인 DB 조회 (이벤트 루프 스레드에서만 사용)
+        self._inflight: Dict[Any, asyncio.Future] = {}
+        self._listeners: List[Callable[[Optional[int]], Any]] = []
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.coalesced = 0
+        self.stale_discards = 0
+
+    ## --- 내부 저장소 ---
+
+    def _get(self, key) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def _set(self, key, value, generation: int) -> bool:
+        with self._lock:
+            if generation != self._generation:
+                ## 조회하는 동안 무효화됨: 이전 내용일 수 있으므로 저장하지 않음
+                self.stale_discards += 1
+                return False
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    ## --- DB 조회 (async 엔진이 있으면 직접 await, 없으면 스레드 풀에서 sync 엔진 사용) ---
+
+    async def _fetch_role_text(self, role_id: int) -> Optional[str]:
+        rows = await self.db.fetch_all_async(ROLE_TEXT_SQL, {"id": role_id})
+        return rows[0]["text"] if rows else None
+
+    async def _fetch_metadata(self) -> List[Dict]:
+        return await self.db.fetch_all_async(ROLE_METADATA_SQL)
+
+    async def _fetch_version(self) -> str:
+        rows = await self.db.fetch_all_async(self.version_sql)
+        digest = hashlib.sha256()
+        for row in rows:
+            digest.update(repr(tuple(row.values())).encode("utf-8"))
+            digest.update(b"\n")
+        return digest.hexdigest()
+
+    async def _fetch_and_store(self, key, fetch: Callable[[], Awaitable[Any]], generation: int):
+        value = await fetch()
+        ## 존재하지 않는 role은 캐시하지 않습니다 (이후 추가될 수 있으므로).
+        if value is not None:
+            self._set(key, value, generation)
+        return value
+
+    async def _load(self, key, fetch: Callable[[], Awaitable[Any]]):
+        hit, value = self._get(key)
+        if hit:
+            return value
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            ## 세대는 조회 태스크가 실행되기 전에(지금) 기록해야 그 사이의 무효화를 놓치지 않음
+            task = asyncio.ensure_future(self._fetch_and_store(key, fetch, self._generation))
+            self._inflight[key] = task
+
+            def _done(done_task):
+                if self._inflight.get(key) is done_task:
+                    del self._inflight[key]
+                ## 기다리던 요청이 모두 취소된 경우에도 예외가 "never retrieved"로 남지 않도록 소비
+                if not done_task.cancelled():
+                    done_task.exception()
+            task.add_done_callback(_done)
+        ## 한 요청이 취소돼도 같은 조회를 기다리는 다른 요청에는 영향이 없도록 shield
+        return await asyncio.shield(task)
+
+    ## --- 공개 API ---
+
+    async def get_role_text(self, role_id: int) -> Optional[str]:
+        return await self._load(role_id, lambda: self._fetch_role_text(role_id))
+
+    async def get_metadata(self) -> List[Dict]:
+        return await self._load(self.METADATA_KEY, self._fetch_metadata)
+
+    def add_listener(self, callback: Callable[[Optional[int]], Any]):
+        """
+        invalidate(role_id) 때마다 callback(role_id)를 호출합니다. (e.g., role 검색 색인 갱신)
+        """
+        self._listeners.append(callback)
+
+    def invalidate(self, role_id: Optional[int] = None):
+        """
+        role_id가 주어지면 해당 role과 메타데이터 목록만, 아니면 캐시 전체를 비웁니다.
+        """
+        with self._lock:
+            if role_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(role_id, None)
+                self._entries.pop(self.METADATA_KEY, None)
+            self._generation += 1
+            self.invalidations += 1
+        ## 무효화 이전에 시작된 조회에는 이후 요청이 합류하지 않도록 분리 (결과는 기존 대기자에게만 전달)
+        if role_id is None:
+            self._inflight.clear()
+        else:
+            self._inflight.pop(role_id, None)
+            self._inflight.pop(self.METADATA_KEY, None)
+        for callback in self._listeners:
+            try:
+                callback(role_id)
+            except Exception:
+                logger.exception("Role prompt 캐시 무효화 리스너 실패")
+
+    async def check_version(self) -> bool:
+        """
+        버전 쿼리 결과가 이전과 다르면 캐시를 비우고 True를 반환합니다.
+        """
+        if not self.version_sql:
+            return False
+        version = await self._fetch_version()
+        changed = self._version is not None and version != self._version
+        self._version = version
+        if changed:
+            logger.info("Role prompt 버전 변경 감지 (%s), 캐시를 무효화합니다.", version)
+            self.invalidate()
+        return changed
+
+    async def run_version_watcher(self):
+        """
+        version_check_interval 마다 check_version()을 실행하는 백그라운드 루프.
+        """
+        if not self.version_sql:
+            return
+        while True:
+            try:
+                await self.check_version()
+            except Exception as e:
+                logger.warning("Role prompt 버전 확인 실패: %s", e)
+            await asyncio.sleep(self.version_check_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "coalesced": self.coalesced,
+            "stale_discards": self.stale_discards,
+            "in_flight": len(self._inflight),
+            "version": self._version,
+        }
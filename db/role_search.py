@@ -0,0 +1,340 @@
+import re
+import time
+import heapq
+import asyncio
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from utils.log import get_logger
+
+logger = get_logger("role_search")
+
+ROLE_SEARCH_SQL = "SELECT id, name, description, text FROM public.prompt_role ORDER BY id"
+ROLE_SEARCH_ONE_SQL = "SELECT id, name, description, text FROM public.prompt_role WHERE id = :id"
+
+## 필드별 가중치: 이름 > 설명 > 본문
+FIELD_WEIGHTS = (("name", 3.0), ("description", 2.0), ("text", 1.0))
+## 검색어 전체가 이름의 앞부분과 일치하면 추가 점수
+NAME_PREFIX_BONUS = 2.0
+## 검색어 토큰 최대 개수 (그 이상은 무시)
+MAX_QUERY_TERMS = 8
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    소문자로 바꾼 단어(영문/숫자/한글) 목록.
+    """
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+def trigrams(token: str) -> Set[str]:
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class _Doc:
+    __slots__ = ("id", "name", "description", "name_lower", "tokens", "title_tokens")
+
+    def __init__(self, row: Dict):
+        self.id = row["id"]
+        self.name = row.get("name") or ""
+        self.description = row.get("description") or ""
+        self.name_lower = self.name.lower()
+        ## 토큰 -> 가장 높은 필드 가중치
+        self.tokens: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS:
+            for token in tokenize(row.get(field)):
+                if self.tokens.get(token, 0.0) < weight:
+                    self.tokens[token] = weight
+        ## 접두어/오타 허용 검색 대상은 이름/설명의 토큰만 (본문은 단어 단위 일치만)
+        self.title_tokens = {t for t in self.tokens if self.tokens[t] > 1.0}
+
+class _InvertedIndex:
+    """
+    토큰 역색인 + 이름/설명 토큰의 정렬된 목록(접두어 검색)과 trigram 색인(오타 허용 검색).
+    본문은 길어서 접두어/오타 허용으로 확장하면 일치하는 role이 너무 많아지므로 단어 단위로만 찾습니다.
+    """
+    def __init__(self):
+        self.docs: Dict[int, _Doc] = {}
+        ## 토큰 -> {role_id: 가중치}
+        self.postings: Dict[str, Dict[int, float]] = {}
+        ## 접두어 검색용 정렬된 이름/설명 토큰 목록
+        self.vocab: List[str] = []
+        ## trigram -> 이름/설명 토큰 집합, 토큰 -> 그 토큰을 이름/설명에 가진 role 수
+        self.trigrams: Dict[str, Set[str]] = {}
+        self.title_refs: Dict[str, int] = {}
+        ## id 순서 목록 (빈 검색어용). 추가/삭제 시 다시 만듦
+        self._sorted_ids: Optional[List[int]] = None
+
+    def add(self, row: Dict, keep_sorted: bool = True):
+        """
+        keep_sorted=False면 어휘를 끝에 추가만 합니다 (전체 재구성 시 마지막에 sort_vocab() 1회).
+        """
+        self.remove(row["id"])
+        self._sorted_ids = None
+        doc = _Doc(row)
+        self.docs[doc.id] = doc
+        for token, weight in doc.tokens.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+            posting[doc.id] = weight
+        for token in doc.title_tokens:
+            refs = self.title_refs.get(token, 0)
+            if refs == 0:
+                if keep_sorted:
+                    insort(self.vocab, token)
+                else:
+                    self.vocab.append(token)
+                for tri in trigrams(token):
+                    self.trigrams.setdefault(tri, set()).add(token)
+            self.title_refs[token] = refs + 1
+
+    def sorted_ids(self) -> List[int]:
+        if self._sorted_ids is None:
+            self._sorted_ids = sorted(self.docs)
+        return self._sorted_ids
+
+    def sort_vocab(self):
+        self.vocab.sort()
+
+    def remove(self, role_id: int):
+        doc = self.docs.pop(role_id, None)
+        if doc is None:
+            return
+        self._sorted_ids = None
+        for token in doc.tokens:
+            posting = self.postings[token]
+            del posting[role_id]
+            if not posting:
+                del self.postings[token]
+        for token in doc.title_tokens:
+            refs = self.title_refs[token] - 1
+            if refs:
+                self.title_refs[token] = refs
+                continue
+            del self.title_refs[token]
+            del self.vocab[bisect_left(self.vocab, token)]
+            for tri in trigrams(token):
+                tokens = self.trigrams[tri]
+                tokens.discard(token)
+                if not tokens:
+                    del self.trigrams[tri]
+
+    def expand(self, term: str, max_expansions: int, fuzzy_threshold: float) -> Iterator[Tuple[str, float]]:
+        """
+        검색어 토큰 -> (색인 토큰, 유사도). 정확히 일치 1.0, 접두어 0.5~0.8, 오타 허용 0.6 * dice 계수.
+        """
+        if term in self.postings:
+            yield term, 1.0
+        seen = {term}
+
+        start = bisect_left(self.vocab, term)
+        count = 0
+        for token in self.vocab[start:start + max_expansions + 1]:
+            if not token.startswith(term):
+                break
+            if token in seen:
+                continue
+            seen.add(token)
+            count += 1
+            yield token, 0.5 + 0.3 * len(term) / len(token)
+            if count >= max_expansions:
+                break
+
+        if len(term) < 3:
+            return
+        term_tris = trigrams(term)
+        counts: Dict[str, int] = {}
+        for tri in term_tris:
+            for token in self.trigrams.get(tri, ()):
+                counts[token] = counts.get(token, 0) + 1
+        candidates = []
+        for token, common in counts.items():
+            if token in seen:
+                continue
+            ## 토큰의 trigram 수는 (중복이 없으면) 토큰 길이와 같음
+            dice = 2.0 * common / (len(term_tris) + len(token))
+            if dice >= fuzzy_threshold:
+                candidates.append((dice, token))
+        candidates.sort(reverse=True)
+        for dice, token in candidates[:max_expansions]:
+            yield token, 0.6 * dice
+
+class RoleSearchIndex:
+    """
+    prompt_role의 이름/설명/본문에 대한 메모리 검색 색인.
+
+    - 시작 시 rebuild()로 전체를 읽어 만들고, RolePromptCache 무효화(on_invalidate)가 오면
+      해당 role만(role_id가 없으면 전체를) 백그라운드에서 다시 읽어 반영합니다.
+    - search()는 DB를 거치지 않고 메모리 색인만 사용합니다 (await 없음).
+    - 재구성/갱신이 실패하면 이전 색인으로 계속 검색하고, 실패 내용은 stats()의 last_error로 확인합니다.
+    """
+    def __init__(self, db, max_expansions: int = 32, fuzzy_threshold: float = 0.45, batch_size: int = 500):
+        """
+        Args:
+            db: iter_batches_async()/fetch_all_async()를 제공하는 SQLAlchemyDatabase.
+            max_expansions (int): 검색어 토큰 하나당 접두어/오타 허용으로 확장할 최대 토큰 수.
+            fuzzy_threshold (float): 오타 허용 일치로 인정할 최소 trigram dice 계수 (0~1).
+            batch_size (int): 전체 재구성 시 DB에서 한 번에 읽는 행 수.
+        """
+        self.db = db
+        self.max_expansions = max_expansions
+        self.fuzzy_threshold = fuzzy_threshold
+        self.batch_size = batch_size
+
+        self._index = _InvertedIndex()
+        self._ready = False
+        self._pending_ids: Set[int] = set()
+        self._pending_full = False
+        self._task: Optional[asyncio.Task] = None
+
+        self.built_at: Optional[float] = None
+        self.build_ms = 0.0
+        self.rebuilds = 0
+        self.updates = 0
+        self.searches = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    async def rebuild(self):
+        """
+        전체 role을 읽어 새 색인을 만든 뒤 교체합니다. (만드는 동안에는 이전 색인으로 검색)
+        """
+        started = time.perf_counter()
+        index = _InvertedIndex()
+        try:
+            async for rows in self.db.iter_batches_async(ROLE_SEARCH_SQL, batch_size=self.batch_size):
+                for row in rows:
+                    index.add(row, keep_sorted=False)
+        except Exception as e:
+            self._record_error("rebuild", e)
+            raise
+        index.sort_vocab()
+        self._index = index
+        self._ready = True
+        self.built_at = time.time()
+        self.build_ms = round((time.perf_counter() - started) * 1000, 3)
+        self.rebuilds += 1
+        logger.info("Role 검색 색인 생성 완료: %d개, 토큰 %d개, %s ms", len(index.docs), len(index.postings), self.build_ms)
+
+    def _record_error(self, action: str, e: Exception):
+        self.failures += 1
+        self.last_error = f"{action}: {type(e).__name__}: {e}"
+        self.last_error_at = time.time()
+
+    async def refresh_role(self, role_id: int):
+        """
+        role 하나를 다시 읽어 반영합니다. 삭제된 role이면 색인에서 제거합니다.
+        """
+        try:
+            rows = await self.db.fetch_all_async(ROLE_SEARCH_ONE_SQL, {"id": role_id})
+        except Exception as e:
+            self._record_error(f"refresh role {role_id}", e)
+            raise
+        if rows:
+            self._index.add(rows[0])
+        else:
+            self._index.remove(role_id)
+        self.updates += 1
+
+    async def _drain(self):
+        while self._pending_full or self._pending_ids:
+            try:
+                if self._pending_full:
+                    self._pending_full = False
+                    self._pending_ids.clear()
+                    await self.rebuild()
+                else:
+                    await self.refresh_role(self._pending_ids.pop())
+            except Exception as e:
+                logger.warning("Role 검색 색인 갱신 실패: %s", e)
+
+    def on_invalidate(self, role_id: Optional[int] = None):
+        """
+        RolePromptCache 무효화 리스너. 같은 role에 대한 연속 무효화는 한 번의 갱신으로 합쳐집니다.
+        """
+        if role_id is None or not self._ready:
+            self._pending_full = True
+        else:
+            self._pending_ids.add(role_id)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._drain())
+
+    def search(self, query: str, offset: int = 0, limit: int = 20) -> Dict[str, Any]:
+        """
+        순위가 매겨진 검색 결과의 offset부터 limit개. 검색어가 비어 있으면 id 순서로 반환합니다.
+        일치한 검색어 토큰 수가 많은 role이 먼저, 그다음 점수(필드 가중치 x 유사도 합) 순입니다.
+        """
+        started = time.perf_counter()
+        index = self._index
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+        if not terms:
+            ids = index.sorted_ids()
+            ranked = [(doc_id, 0.0) for doc_id in ids[:offset + limit]]
+            total = len(ids)
+        else:
+            scores: Dict[int, float] = {}
+            matched: Dict[int, int] = {}
+            for term in terms:
+                best: Dict[int, float] = {}
+                for token, similarity in index.expand(term, self.max_expansions, self.fuzzy_threshold):
+                    for doc_id, weight in index.postings[token].items():
+                        score = weight * similarity
+                        if score > best.get(doc_id, 0.0):
+                            best[doc_id] = score
+                for doc_id, score in best.items():
+                    scores[doc_id] = scores.get(doc_id, 0.0) + score
+                    matched[doc_id] = matched.get(doc_id, 0) + 1
+
+            phrase = query.strip().lower()
+            for doc_id in scores:
+                if index.docs[doc_id].name_lower.startswith(phrase):
+                    scores[doc_id] += NAME_PREFIX_BONUS
+            ## 요청한 페이지까지만 정렬 (전체 정렬 대신 부분 힙)
+            ranked = heapq.nsmallest(
+                offset + limit, scores.items(), key=lambda item: (-matched[item[0]], -item[1], item[0])
+            )
+            total = len(scores)
+
+        page = ranked[offset:offset + limit]
+        items = []
+        for doc_id, score in page:
+            doc = index.docs[doc_id]
+            items.append({"id": doc.id, "name": doc.name, "description": doc.description, "score": round(score, 4)})
+        self.searches += 1
+        next_offset = offset + limit if offset + limit < total else None
+        return {
+            "items": items,
+            "total": total,
+            "next_offset": next_offset,
+            "took_ms": round((time.perf_counter() - started) * 1000, 4),
+        }
+
+    async def close(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        index = self._index
+        return {
+            "ready": self._ready,
+            "roles": len(index.docs),
+            "tokens": len(index.postings),
+            "title_tokens": len(index.vocab),
+            "trigrams": len(index.trigrams),
+            "built_at": self.built_at,
+            "build_ms": self.build_ms,
+            "rebuilds": self.rebuilds,
+            "updates": self.updates,
+            "pending": len(self._pending_ids) + int(self._pending_full),
+            "searches": self.searches,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at,
+        }
@@ -4,11 +4,14 @@ from fastapi import FastAPI, HTTPException, Depends
 import sqlalchemy
 from sqlalchemy.engine import Engine, Row
 from sqlalchemy.exc import SQLAlchemyError
-from google.cloud.sql.connector import Connector, IPTypes
 import os
 from typing import List, Optional, Generator
 
 from db.cloud_sql_database_manager import CloudSQLDatabase
+from db.local_database import LocalDatabase
+from db.role_cache import RolePromptCache, default_version_sql
+from db.role_search import RoleSearchIndex
+from db.history_writer import HistoryWriter, make_history_table
 from config.db import db_settings
 from config.base import settings
 
@@ -21,8 +24,7 @@ def get_conn(request: Request) -> Generator:
     db: CloudSQLDatabase = request.app.state.cloudsql_db
     if db is None:
         raise HTTPException(status_code=500, detail="Database not initialized")
-    engine = db.get_engine()
-    conn = engine.connect()
+    conn = db.connect()
     try:
         yield conn
     finally:
@@ -31,6 +33,18 @@ def get_conn(request: Request) -> Generator:
         except Exception:
             pass
 
+def pool_options_from_settings() -> dict:
+    """
+    DBSettings의 DB_POOL_* 설정을 create_engine / create_async_engine 인자로 변환합니다.
+    """
+    return {
+        "pool_size": db_settings.DB_POOL_SIZE,
+        "max_overflow": db_settings.DB_MAX_OVERFLOW,
+        "pool_timeout": db_settings.DB_POOL_TIMEOUT,
+        "pool_recycle": db_settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": db_settings.DB_POOL_PRE_PING,
+    }
+
 def make_db_from_env() -> CloudSQLDatabase:
     """
     환경변수에서 Cloud SQL 설정을 읽어 CloudSQLDatabase 인스턴스를 생성합니다.
@@ -42,7 +56,18 @@ def make_db_from_env() -> CloudSQLDatabase:
       - (선택) DB_API_DRIVER (기본 "psycopg2")
       - (선택) DB_DRIVER (기본 "postgresql+psycopg2")
       - (선택) DB_IP_TYPE ("public" 또는 "private", 기본 "public")
+    DB_LOCAL_URL이 지정되어 있으면 Cloud SQL 대신 LocalDatabase를 반환합니다. (부하 테스트/로컬 개발용)
+    연결 풀 설정(DB_POOL_*)은 sync/async 엔진 모두에 적용됩니다. (SQLite는 SQLAlchemy 기본 풀 사용)
     """
+    if db_settings.DB_LOCAL_URL:
+        is_sqlite = db_settings.DB_LOCAL_URL.startswith("sqlite")
+        return LocalDatabase(
+            db_settings.DB_LOCAL_URL,
+            async_url=db_settings.DB_LOCAL_ASYNC_URL,
+            attach_public_schema=is_sqlite,
+            pool_options=None if is_sqlite else pool_options_from_settings(),
+        )
+
     try:
         instance = db_settings.CLOUD_SQL_INSTANCE #os.environ["CLOUD_SQL_INSTANCE"]
         user = db_settings.DB_USER #os.environ["DB_USER"]
@@ -51,6 +76,8 @@ def make_db_from_env() -> CloudSQLDatabase:
     except KeyError as e:
         raise RuntimeError(f"필수 DB 환경변수가 설정되어 있지 않습니다: {e}")
 
+    from google.cloud.sql.connector import IPTypes
+
     db_api_driver = db_settings.DB_API_DRIVER #os.environ.get("DB_API_DRIVER", "psycopg2")
     db_driver = db_settings.DB_DRIVER #os.environ.get("DB_DRIVER", "postgresql+psycopg2")
     ip_type = IPTypes.PUBLIC if os.environ.get("DB_IP_TYPE", "public") == "public" else IPTypes.PRIVATE
@@ -64,5 +91,43 @@ def make_db_from_env() -> CloudSQLDatabase:
         cred_path=settings.GOOGLE_APPLICATION_CREDENTIALS,
         db_driver=db_driver,
         ip_type=ip_type,
-    )  
+        pool_options=pool_options_from_settings(),
+    )
 
+def make_role_cache(db: CloudSQLDatabase) -> RolePromptCache:
+    """
+    DBSettings의 ROLE_CACHE_* 설정으로 prompt_role 캐시를 생성합니다.
+    """
+    version_sql = db_settings.ROLE_CACHE_VERSION_SQL
+    if version_sql is None:
+        version_sql = default_version_sql(db)
+    return RolePromptCache(
+        db,
+        ttl=db_settings.ROLE_CACHE_TTL,
+        max_size=db_settings.ROLE_CACHE_MAX_SIZE,
+        version_sql=version_sql or None,
+        version_check_interval=db_settings.ROLE_CACHE_VERSION_CHECK_INTERVAL,
+    )
+
+def make_role_search_index(db: CloudSQLDatabase) -> RoleSearchIndex:
+    """
+    DBSettings의 ROLE_SEARCH_* 설정으로 prompt_role 검색 색인을 생성합니다. (rebuild() 전에는 비어 있음)
+    """
+    return RoleSearchIndex(
+        db,
+        max_expansions=db_settings.ROLE_SEARCH_MAX_EXPANSIONS,
+        fuzzy_threshold=db_settings.ROLE_SEARCH_FUZZY_THRESHOLD,
+    )
+
+def make_history_writer(db: CloudSQLDatabase) -> HistoryWriter:
+    """
+    DBSettings의 HISTORY_* 설정으로 쿼리 이력 writer를 생성합니다.
+    """
+    return HistoryWriter(
+        db,
+        make_history_table(db_settings.HISTORY_TABLE),
+        batch_size=db_settings.HISTORY_BATCH_SIZE,
+        flush_interval=db_settings.HISTORY_FLUSH_INTERVAL,
+        max_buffer=db_settings.HISTORY_MAX_BUFFER,
+        response_max_chars=db_settings.HISTORY_RESPONSE_MAX_CHARS,
+    )
@@ -0,0 +1,295 @@
+"""
+긴 role 프롬프트용 컨텍스트 캐시 (Gemini CachedContent).
+
+TEST_SYSTEM_PROMPT를 "{query}" 앞(role 부분, 접두부)과 뒤로 나누어, 접두부는 (모델, role 버전)별로
+한 번만 업로드해 두고 요청마다 query 부분만 보냅니다. 캐시된 입력 토큰은 더 싼 단가로 과금되고
+prefill 시간도 줄어듭니다. (usage_metadata.cached_content_token_count로 보고됨)
+
+- GeminiContextBackend: google.generativeai.caching.CachedContent 사용 (GEMINI_BACKEND=gemini)
+- LocalContextBackend: 테스트/fake 백엔드용 stand-in. 접두부를 메모리에 두고 생성 시 원래 모델에
+  접두부 + query를 보내되, 접두부 토큰을 cached_content_token_count로 보고합니다.
+
+캐시 항목은 TTL이 refresh_ratio 이하로 남으면 사용 시 백그라운드에서 TTL을 연장하고,
+max_entries를 넘거나 role 텍스트가 바뀌면(새 버전) 가장 오래 사용되지 않은 항목부터 삭제합니다.
+워커마다 별도의 캐시를 만듭니다 (워커 수 만큼 저장 비용 발생).
+"""
+import time
+import asyncio
+import datetime
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from model.static_response import StaticUsageMetadata
+from model.gemini_utils import _genai, get_executor
+from utils.log import get_logger
+
+logger = get_logger("context_cache")
+
+class CachedPrefixModel:
+    """
+    LocalContextBackend의 모델: 캐시된 접두부 + query로 원래 모델을 호출하고
+    usage_metadata에 캐시된 토큰 수를 기록합니다.
+    """
+    def __init__(self, model, prefix: str, cached_tokens: int):
+        self._model = model
+        self._prefix = prefix
+        self._cached_tokens = cached_tokens
+
+    def generate_content(self, query, generation_config=None, stream=False):
+        response = self._model.generate_content(self._prefix + query, generation_config=generation_config, stream=stream)
+        usage_metadata = response.usage_metadata
+        if isinstance(usage_metadata, StaticUsageMetadata):
+            usage_metadata.cached_content_token_count = min(self._cached_tokens, usage_metadata.prompt_token_count)
+        return response
+
+class LocalContextBackend:
+    """
+    프로세스 메모리에 접두부를 보관하는 stand-in (API 호출 없음).
+    """
+    name = "local"
+
+    def __init__(self):
+        self._next_id = 0
+
+    def create(self, model_name: str, model, prefix: str, ttl: float) -> Tuple[Any, Any, int]:
+        self._next_id += 1
+        cached_tokens = max(1, len(prefix) // 4)
+        return f"local/{self._next_id}", CachedPrefixModel(model, prefix, cached_tokens), cached_tokens
+
+    def refresh(self, handle, ttl: float):
+        pass
+
+    def delete(self, handle):
+        pass
+
+class GeminiContextBackend:
+    """
+    Gemini CachedContent. create/refresh/delete는 API 호출(블로킹)이므로 스레드에서 실행됩니다.
+    """
+    name = "gemini"
+
+    def create(self, model_name: str, model, prefix: str, ttl: float) -> Tuple[Any, Any, int]:
+        genai = _genai()
+        handle = genai.caching.CachedContent.create(
+            model=model_name,
+            display_name="llm-test-role-prefix",
+            contents=[prefix],
+            ttl=datetime.timedelta(seconds=ttl),
+        )
+        return handle, genai.GenerativeModel.from_cached_content(cached_content=handle), handle.usage_metadata.total_token_count
+
+    def refresh(self, handle, ttl: float):
+        handle.update(ttl=datetime.timedelta(seconds=ttl))
+
+    def delete(self, handle):
+        handle.delete()
+
+class _Entry:
+    def __init__(self, role_text: str, handle, model, cached_tokens: int, expires_at: float):
+        self.role_text = role_text
+        self.handle = handle
+        self.model = model
+        self.cached_tokens = cached_tokens
+        self.expires_at = expires_at
+        self.refreshing = False
+
+class ContextCache:
+    """
+    (모델 이름, role_id) -> 캐시된 접두부. 같은 role_id라도 role 텍스트가 바뀌면 새로 만들고 이전 것은 삭제합니다.
+    """
+    def __init__(
+        self,
+        backend,
+        template: str,
+        ttl: float = 3600.0,
+        refresh_ratio: float = 0.5,
+        max_entries: int = 64,
+        min_tokens: int = 1024,
+        retry_after: float = 300.0,
+    ):
+        """
+        Args:
+            backend: GeminiContextBackend 또는 LocalContextBackend.
+            template (str): "{role}", "{query}" 자리를 가진 프롬프트 틀 (TEST_SYSTEM_PROMPT).
+            ttl (float): 캐시 TTL(초).
+            refresh_ratio (float): 남은 TTL이 ttl * refresh_ratio 이하가 되면 사용 시 TTL 연장.
+            max_entries (int): 최대 캐시 수. 초과 시 가장 오래 사용되지 않은 것부터 삭제합니다.
+            min_tokens (int): 접두부가 이보다 짧으면 캐시하지 않습니다 (Gemini 최소 캐시 크기).
+            retry_after (float): 캐시 생성에 실패한 (모델, role 버전)은 이 시간(초) 동안 다시 시도하지 않습니다.
+        """
+        self.backend = backend
+        self.prefix_template, self.suffix_template = template.split("{query}", 1)
+        self.ttl = ttl
+        self.refresh_ratio = refresh_ratio
+        self.max_entries = max_entries
+        self.min_tokens = min_tokens
+        self.retry_after = retry_after
+
+        self._entries: "OrderedDict[Tuple[str, int], _Entry]" = OrderedDict()
+        self._pending: Dict[Tuple[str, int], asyncio.Future] = {}
+        ## (모델 이름, role_id) -> (실패한 role 텍스트, 재시도 가능 시각)
+        self._failed: Dict[Tuple[str, int], Tuple[str, float]] = {}
+        self._tasks = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.failures = 0
+        self.refreshes = 0
+        self.evictions = 0
+
+    def split(self, role: str, query: str) -> Tuple[str, str]:
+        """
+        TEST_SYSTEM_PROMPT.format(role=role, query=query)를 (접두부, 나머지)로 나눕니다. 이어 붙이면 원래 프롬프트와 같습니다.
+        """
+        return self.prefix_template.format(role=role), query + self.suffix_template.format()
+
+    async def _in_thread(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), fn, *args)
+
+    def _background(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _delete(self, entry: _Entry):
+        try:
+            await self._in_thread(self.backend.delete, entry.handle)
+        except Exception as e:
+            logger.warning("컨텍스트 캐시 삭제 실패: %s", e)
+
+    async def _refresh(self, entry: _Entry):
+        try:
+            await self._in_thread(self.backend.refresh, entry.handle, self.ttl)
+            entry.expires_at = time.monotonic() + self.ttl
+            self.refreshes += 1
+        except Exception as e:
+            logger.warning("컨텍스트 캐시 TTL 연장 실패: %s", e)
+        finally:
+            entry.refreshing = False
+
+    def _evict(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.evictions += 1
+            self._background(self._delete(entry))
+
+    async def _create(self, key, base_model, role_text: str, prefix: str) -> Optional[_Entry]:
+        model_name, _ = key
+        try:
+            handle, model, cached_tokens = await self._in_thread(
+                self.backend.create, model_name, base_model, prefix, self.ttl
+            )
+        except Exception as e:
+            self.failures += 1
+            self._failed[key] = (role_text, time.monotonic() + self.retry_after)
+            logger.warning("컨텍스트 캐시 생성 실패 (%s), 전체 프롬프트로 호출합니다: %s", key, e)
+            return None
+
+        self._failed.pop(key, None)
+        ## 이전 role 버전의 캐시는 삭제
+        self._evict(key)
+        entry = _Entry(role_text, handle, model, cached_tokens, time.monotonic() + self.ttl)
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+        return entry
+
+    async def get(self, model_name: str, base_model, role_id: int, role_text: str, prefix: str, prefix_tokens: int):
+        """
+        캐시된 접두부를 가진 모델을 반환합니다. 캐시할 수 없으면(짧은 접두부, 생성 실패) None.
+        """
+        if prefix_tokens < self.min_tokens:
+            self.skipped += 1
+            return None
+        key = (model_name, role_id)
+        now = time.monotonic()
+
+        entry = self._entries.get(key)
+        ## RolePromptCache hit이면 같은 str 객체이므로 비교는 대부분 `is`로 끝남
+        if entry is not None and (entry.role_text is role_text or entry.role_text == role_text) and entry.expires_at > now:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if not entry.refreshing and entry.expires_at - now <= self.ttl * self.refresh_ratio:
+                entry.refreshing = True
+                self._background(self._refresh(entry))
+            return entry.model
+
+        failed = self._failed.get(key)
+        if failed is not None and failed[1] > now and (failed[0] is role_text or failed[0] == role_text):
+            self.skipped += 1
+            return None
+
+        self.misses += 1
+        ## 같은 (모델, role)에 대한 동시 요청은 생성 1회를 기다림
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._create(key, base_model, role_text, prefix))
+            self._pending[key] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+        entry = await asyncio.shield(pending)
+        if entry is None or not (entry.role_text is role_text or entry.role_text == role_text):
+            return None
+        return entry.model
+
+    def discard(self, model_name: str, role_id: int):
+        """
+        캐시를 사용한 호출이 실패했을 때(서버 측 만료 등) 다음 요청에서 다시 만들도록 제거합니다.
+        """
+        self._evict((model_name, role_id))
+
+    async def close(self):
+        ## 남은 TTL 동안 저장 비용이 발생하지 않도록 종료 시 모두 삭제
+        entries = list(self._entries.values())
+        self._entries.clear()
+        await asyncio.gather(*(self._delete(entry) for entry in entries), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        now = time.monotonic()
+        return {
+            "backend": self.backend.name,
+            "entries": [
+                {
+                    "model": model_name,
+                    "role_id": role_id,
+                    "cached_tokens": entry.cached_tokens,
+                    "expires_in": round(entry.expires_at - now, 1),
+                }
+                for (model_name, role_id), entry in self._entries.items()
+            ],
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "min_tokens": self.min_tokens,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "refreshes": self.refreshes,
+            "evictions": self.evictions,
+        }
+
+def make_context_cache_from_settings(settings, template: str) -> Optional[ContextCache]:
+    """
+    CONTEXT_CACHE_ENABLED가 켜져 있으면 백엔드에 맞는 ContextCache를, 아니면 None을 반환합니다.
+    record/replay 백엔드는 녹화 키가 전체 프롬프트 기준이므로 사용하지 않습니다.
+    """
+    if not settings.CONTEXT_CACHE_ENABLED:
+        return None
+    if settings.GEMINI_BACKEND == "gemini":
+        backend = GeminiContextBackend()
+    elif settings.GEMINI_BACKEND == "fake":
+        backend = LocalContextBackend()
+    else:
+        return None
+    return ContextCache(
+        backend,
+        template,
+        ttl=settings.CONTEXT_CACHE_TTL,
+        refresh_ratio=settings.CONTEXT_CACHE_REFRESH_RATIO,
+        max_entries=settings.CONTEXT_CACHE_MAX_ENTRIES,
+        min_tokens=settings.CONTEXT_CACHE_MIN_TOKENS,
+        retry_after=settings.CONTEXT_CACHE_RETRY_AFTER,
+    )
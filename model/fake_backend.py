@@ -0,0 +1,176 @@
+"""
+부하 테스트용 Gemini 시뮬레이션 백엔드.
+
+GenerativeModel.generate_content()와 같은 인터페이스(스트리밍/비스트리밍, usage_metadata)를 제공하며,
+실제 API처럼 호출 스레드를 블로킹(time.sleep)합니다. settings.GEMINI_BACKEND = "fake" 이면
+ModelRegistry가 genai.GenerativeModel 대신 이 모델을 생성합니다.
+
+- 첫 토큰 지연: LatencyDistribution (fixed / uniform / lognormal / pareto)
+- 이후 생성 속도: tokens_per_sec, 청크 크기: chunk_tokens
+- 업스트림 한도: max_concurrency를 넘는 동시 호출은 429(FakeResourceExhausted)로 거절
+"""
+import math
+import time
+import random
+import threading
+from typing import Callable, Iterator, List, Optional
+
+from model.static_response import StaticChunk, StaticResponse, StaticUsageMetadata
+
+## 토큰 1개 ≈ 단어 1개로 보고 생성할 텍스트
+_WORDS = ("lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit")
+
+class FakeResourceExhausted(Exception):
+    """
+    google.api_core.exceptions.ResourceExhausted처럼 429를 나타내는 오류.
+    """
+    code = 429
+
+class LatencyDistribution:
+    """
+    median(초)을 중앙값으로 하는 지연 분포.
+    spread: uniform은 ±비율, lognormal은 sigma, pareto는 1/alpha (클수록 꼬리가 김).
+    """
+    def __init__(self, kind: str, median: float, spread: float = 0.5, rng: Optional[random.Random] = None):
+        if kind not in ("fixed", "uniform", "lognormal", "pareto"):
+            raise ValueError(f"지원하지 않는 지연 분포: {kind}")
+        self.kind = kind
+        self.median = median
+        self.spread = spread
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "fixed":
+                return self.median
+            if self.kind == "uniform":
+                return self.median * self.rng.uniform(1 - self.spread, 1 + self.spread)
+            if self.kind == "lognormal":
+                return self.rng.lognormvariate(math.log(self.median), self.spread) if self.median > 0 else 0.0
+            ## pareto: 최소값 x_m을 중앙값이 median이 되도록 설정 (median = x_m * 2^(1/alpha))
+            alpha = 1 / self.spread
+            return self.median / 2 ** (1 / alpha) * self.rng.paretovariate(alpha)
+
+class FakeStreamResponse:
+    """
+    스트리밍 응답. 순회하면서 실제 생성 속도대로 청크를 내보내고, 순회 후 usage_metadata를 제공합니다.
+    """
+    def __init__(
+        self,
+        chunks: List[str],
+        usage_metadata: StaticUsageMetadata,
+        first_token_delay: float,
+        chunk_delay: float,
+        on_close: Optional[Callable[[], None]] = None,
+    ):
+        self.chunks = chunks
+        self.usage_metadata = usage_metadata
+        self.first_token_delay = first_token_delay
+        self.chunk_delay = chunk_delay
+        self._cancelled = threading.Event()
+        ## 스트림이 끝나거나 취소되면 한 번 호출 (동시 호출 수 반납)
+        self._on_close = on_close
+
+    def _close(self):
+        on_close, self._on_close = self._on_close, None
+        if on_close is not None:
+            on_close()
+
+    def cancel(self):
+        ## 실제 스트림 취소처럼 대기 중인 순회를 바로 끝냄
+        self._cancelled.set()
+        self._close()
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def __iter__(self) -> Iterator[StaticChunk]:
+        try:
+            if self._cancelled.wait(self.first_token_delay):
+                return
+            for i, chunk in enumerate(self.chunks):
+                if i and self._cancelled.wait(self.chunk_delay):
+                    return
+                yield StaticChunk(chunk)
+        finally:
+            self._close()
+
+class FakeGenerativeModel:
+    """
+    genai.GenerativeModel 대체 구현.
+    """
+    def __init__(
+        self,
+        model_name: str,
+        first_token: LatencyDistribution,
+        output_tokens: int = 200,
+        tokens_per_sec: float = 100.0,
+        chunk_tokens: int = 20,
+        max_concurrency: Optional[int] = None,
+    ):
+        """
+        Args:
+            max_concurrency (int, optional): 동시에 처리할 수 있는 호출 수. 넘으면 429로 거절 (None이면 제한 없음).
+        """
+        self.model_name = model_name
+        self.first_token = first_token
+        self.output_tokens = output_tokens
+        self.tokens_per_sec = tokens_per_sec
+        self.chunk_tokens = chunk_tokens
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def _admit(self):
+        with self._lock:
+            if self.max_concurrency is not None and self.in_flight >= self.max_concurrency:
+                self.rejected += 1
+                raise FakeResourceExhausted("429 RESOURCE_EXHAUSTED: fake backend concurrency limit")
+            self.in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _chunks(self, n_tokens: int) -> List[str]:
+        words = [_WORDS[i % len(_WORDS)] + " " for i in range(n_tokens)]
+        return ["".join(words[i:i + self.chunk_tokens]) for i in range(0, n_tokens, self.chunk_tokens)]
+
+    def generate_content(self, query, generation_config=None, stream=False):
+        max_output_tokens = getattr(generation_config, "max_output_tokens", None) or self.output_tokens
+        n_tokens = min(self.output_tokens, max_output_tokens)
+        chunks = self._chunks(n_tokens)
+        usage_metadata = StaticUsageMetadata(
+            prompt_token_count=max(1, len(query) // 4),
+            candidates_token_count=n_tokens,
+        )
+        first_token_delay = self.first_token.sample()
+        chunk_delay = self.chunk_tokens / self.tokens_per_sec
+
+        self._admit()
+        if stream:
+            return FakeStreamResponse(chunks, usage_metadata, first_token_delay, chunk_delay, on_close=self._release)
+        try:
+            time.sleep(first_token_delay + chunk_delay * (len(chunks) - 1))
+        finally:
+            self._release()
+        return StaticResponse(chunks, usage_metadata)
+
+def make_fake_model_from_settings(model_name: str, settings) -> FakeGenerativeModel:
+    rng = random.Random(settings.FAKE_SEED)
+    return FakeGenerativeModel(
+        model_name,
+        LatencyDistribution(
+            settings.FAKE_LATENCY_DIST,
+            settings.FAKE_FIRST_TOKEN_MS / 1000,
+            settings.FAKE_LATENCY_SPREAD,
+            rng,
+        ),
+        output_tokens=settings.FAKE_OUTPUT_TOKENS,
+        tokens_per_sec=settings.FAKE_TOKENS_PER_SEC,
+        chunk_tokens=settings.FAKE_CHUNK_TOKENS,
+        max_concurrency=settings.FAKE_MAX_CONCURRENCY,
+    )
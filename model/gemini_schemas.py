@@ -10,6 +10,7 @@ class GeminiTestQueryRequest(BaseModel):
     top_p: float = Field(1.0, description="Top-P 샘플링")
     stream: bool = False
     role_id: Optional[int] = None
+    hedge: Optional[bool] = Field(None, description="비스트리밍 요청 hedging 사용 여부 (None: 서버 설정 HEDGE_ENABLED)")
 
 class GeminiTestQueryResponse(BaseModel):
     response_text: str
@@ -1,15 +1,30 @@
+import sys
 import time
-
-import google.generativeai as genai
-from google.oauth2 import service_account
-import google.generativeai as genai
-from google.generativeai.types import generation_types
+import asyncio
+import threading
+from types import SimpleNamespace
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
 from config.base import settings
 
+def _genai():
+    ## google.generativeai import는 1초 가까이 걸리므로 실제로 필요할 때(인증, 모델 생성)까지 미룸
+    import google.generativeai as genai
+    return genai
+
+def is_stop_candidate_exception(e: BaseException) -> bool:
+    """
+    generation_types.StopCandidateException 여부. genai가 아직 import되지 않았다면 발생할 수 없는 예외입니다.
+    """
+    generation_types = sys.modules.get("google.generativeai.types.generation_types")
+    return generation_types is not None and isinstance(e, generation_types.StopCandidateException)
+
 def gemini_api_certification():
     # --- Gemini API 인증 및 초기화 ---
     try:
+        from google.oauth2 import service_account
+        genai = _genai()
         credentials = service_account.Credentials.from_service_account_file(
             settings.GOOGLE_APPLICATION_CREDENTIALS
         )
@@ -18,15 +33,114 @@ def gemini_api_certification():
     except Exception as e:
         print(f"🔥 Failed to initialize Gemini API: {e}")
 
-def get_model(model_name, max_output_tokens, top_k, top_p, temperature):
+class ModelRegistry:
+    """
+    GenerativeModel / GenerationConfig 객체를 재사용하기 위한 레지스트리.
+
+    - GenerativeModel: settings.GEMINI_MODELS에 있는 모델은 시작 시(warm) 한 번만 생성하여 재사용합니다.
+      목록에 없는 모델은 캐시하지 않고 요청마다 생성합니다.
+    - GenerationConfig: 동일한 파라미터 조합은 LRU 캐시로 하나의 객체를 공유합니다.
+    - stats(): 재사용으로 절약한 생성 시간(추정치)을 제공합니다.
+    """
+
+    def __init__(self, allowed_models=None, config_cache_size: int = 256):
+        self.allowed_models = set(allowed_models or [])
+        self._models = {}
+        self._lock = threading.Lock()
+        self._get_generation_config = lru_cache(maxsize=config_cache_size)(self._build_generation_config)
+
+        self.model_hits = 0
+        self.model_misses = 0
+        self._model_build_time = 0.0
+        self._model_builds = 0
+        self._config_build_time = 0.0
+
+    def _build_model(self, model_name):
+        start = time.perf_counter()
+        if settings.GEMINI_BACKEND == "fake":
+            from model.fake_backend import make_fake_model_from_settings
+            model = make_fake_model_from_settings(model_name, settings)
+        elif settings.GEMINI_BACKEND == "replay":
+            from model.replay_store import ReplayModel, get_replay_store
+            model = ReplayModel(
+                model_name, get_replay_store(settings.REPLAY_STORE_DIR, writable=False), settings.REPLAY_SPEED
+            )
+        elif settings.GEMINI_BACKEND == "record":
+            from model.replay_store import RecordingModel, get_replay_store
+            model = RecordingModel(
+                _genai().GenerativeModel(model_name), model_name, get_replay_store(settings.REPLAY_STORE_DIR, writable=True)
+            )
+        else:
+            model = _genai().GenerativeModel(model_name)
+        with self._lock:
+            self._model_build_time += time.perf_counter() - start
+            self._model_builds += 1
+        return model
+
+    def _build_generation_config(self, max_output_tokens, top_k, top_p, temperature):
+        start = time.perf_counter()
+        ## fake/replay 백엔드는 속성만 읽으므로 genai를 import 하지 않음
+        config_class = SimpleNamespace if settings.GEMINI_BACKEND in ("fake", "replay") else _genai().types.GenerationConfig
+        generation_config = config_class(
+            max_output_tokens=max_output_tokens,
+            top_k=top_k,
+            top_p=top_p,
+            temperature=temperature,
+        )
+        self._config_build_time += time.perf_counter() - start
+        return generation_config
+
+    def warm(self, model_names=None):
+        """
+        모델 클라이언트를 미리 생성합니다. (서버 시작 시 호출)
+        """
+        for model_name in (model_names or self.allowed_models):
+            self.allowed_models.add(model_name)
+            if model_name not in self._models:
+                self._models[model_name] = self._build_model(model_name)
+
+    def get_model(self, model_name):
+        model = self._models.get(model_name)
+        if model is not None:
+            self.model_hits += 1
+            return model
+
+        self.model_misses += 1
+        model = self._build_model(model_name)
+        if model_name in self.allowed_models:
+            with self._lock:
+                model = self._models.setdefault(model_name, model)
+        return model
+
+    def get_generation_config(self, max_output_tokens, top_k, top_p, temperature):
+        return self._get_generation_config(max_output_tokens, top_k, top_p, temperature)
 
-    model = genai.GenerativeModel(model_name)
+    def stats(self):
+        config_info = self._get_generation_config.cache_info()
+        avg_model_build = self._model_build_time / self._model_builds if self._model_builds else 0.0
+        avg_config_build = self._config_build_time / config_info.misses if config_info.misses else 0.0
+        return {
+            "models": sorted(self._models),
+            "model_hits": self.model_hits,
+            "model_misses": self.model_misses,
+            "avg_model_build_ms": round(avg_model_build * 1000, 4),
+            "config_hits": config_info.hits,
+            "config_misses": config_info.misses,
+            "config_cache_size": config_info.currsize,
+            "avg_config_build_ms": round(avg_config_build * 1000, 4),
+            ## 재사용 횟수 x 평균 생성 시간
+            "saved_ms": round(
+                (self.model_hits * avg_model_build + config_info.hits * avg_config_build) * 1000, 4
+            ),
+        }
 
-    generation_config = genai.types.GenerationConfig(
-        max_output_tokens=max_output_tokens,
-        top_k=top_k,
-        top_p=top_p,
-        temperature=temperature,
+model_registry = ModelRegistry(settings.GEMINI_MODELS)
+
+def get_model(model_name, max_output_tokens, top_k, top_p, temperature):
+
+    model = model_registry.get_model(model_name)
+    generation_config = model_registry.get_generation_config(
+        max_output_tokens, top_k, top_p, temperature
     )
 
     return model, generation_config
@@ -40,4 +154,63 @@ def generate(model, generation_config, query, stream):
         stream=stream
     )
 
-    return response, start_time
\ No newline at end of file
+    return response, start_time
+
+## Gemini 호출 전용 스레드 풀 (프로세스당 GEMINI_MAX_CONCURRENCY 개로 제한)
+_executor = None
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.GEMINI_MAX_CONCURRENCY,
+            thread_name_prefix="gemini"
+        )
+    return _executor
+
+## 스트리밍 응답을 끝까지 읽는 펌프 전용 스레드 풀. 느린 클라이언트의 스트림이
+## Gemini 호출 풀(GEMINI_MAX_CONCURRENCY)을 차지해 비스트리밍/배치/hedge 호출이 밀리지 않도록 분리
+_stream_executor = None
+
+def get_stream_executor() -> ThreadPoolExecutor:
+    global _stream_executor
+    if _stream_executor is None:
+        _stream_executor = ThreadPoolExecutor(
+            max_workers=settings.STREAM_PUMP_WORKERS,
+            thread_name_prefix="gemini-stream"
+        )
+    return _stream_executor
+
+def shutdown_executor():
+    global _executor, _stream_executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    if _stream_executor is not None:
+        _stream_executor.shutdown(wait=False, cancel_futures=True)
+        _stream_executor = None
+    if settings.GEMINI_BACKEND in ("record", "replay"):
+        from model.replay_store import close_replay_store
+        close_replay_store()
+
+async def generate_async(model, generation_config, query, stream):
+    """
+    generate()를 전용 스레드 풀에서 실행하여 이벤트 루프를 막지 않습니다.
+    풀이 가득 차면 빈 워커가 생길 때까지 대기합니다.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), generate, model, generation_config, query, stream
+    )
+
+def _count_tokens(model, text):
+    return model.count_tokens(text).total_tokens
+
+async def count_tokens_async(model, text):
+    """
+    모델의 count_tokens(API 호출)로 정확한 토큰 수를 셉니다. 지원하지 않는 백엔드(fake, replay)는 None.
+    """
+    if not hasattr(model, "count_tokens"):
+        return None
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), _count_tokens, model, text)
@@ -0,0 +1,321 @@
+"""
+Gemini 응답 녹화(record) / 재생(replay) 저장소.
+
+디렉터리 구조:
+  - data.bin  : append-only 레코드 로그. [4바이트 길이][JSON: 청크(텍스트, 직전 청크와의 간격), usage_metadata]
+  - index.bin : mmap으로 읽는 open-addressing 해시 테이블.
+                슬롯 = [키 해시 16바이트][data.bin 오프셋 8바이트][길이 4바이트][예약 4바이트]
+                로드율이 0.5를 넘으면 2배 크기로 다시 만들고 교체(rename)합니다.
+
+키는 요청(모델 이름 + 최종 프롬프트 + 생성 설정)의 SHA-256 앞 16바이트이며,
+같은 키를 다시 녹화하면 최신 레코드를 가리키도록 갱신됩니다.
+
+record 모드는 여러 워커 프로세스가 같은 디렉터리에 쓸 수 있으므로, 레코드 추가와 인덱스 갱신을
+lock 파일의 fcntl.flock(배타 잠금) 안에서 수행합니다.
+"""
+import os
+import json
+import fcntl
+import mmap
+import time
+import struct
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from model.static_response import StaticChunk, StaticResponse, StaticUsageMetadata
+from utils.response_cache import make_cache_key
+
+_MAGIC = b"LLMRPIX1"
+_HEADER = struct.Struct("<8sQQ8x")      # magic, slot 수, 항목 수
+_SLOT = struct.Struct("<16sQI4x")       # 키, 오프셋, 길이
+_LENGTH = struct.Struct("<I")
+_EMPTY_KEY = bytes(16)
+
+def make_replay_key(model_name: str, query: str, generation_config=None) -> bytes:
+    """
+    generate()에 전달되는 값으로 만든 16바이트 키. 스트리밍 여부와 무관합니다.
+    """
+    params = {
+        name: getattr(generation_config, name, None)
+        for name in ("max_output_tokens", "top_k", "top_p", "temperature")
+    }
+    return bytes.fromhex(make_cache_key(model_name, query, **params))[:16]
+
+class ReplayMiss(LookupError):
+    """
+    replay 모드에서 녹화된 응답이 없는 요청.
+    """
+
+class ReplayStore:
+    """
+    녹화된 응답의 append-only 저장소와 mmap 해시 인덱스.
+    쓰기는 프로세스 내 락(스레드)과 lock 파일의 flock(프로세스)으로 직렬화합니다.
+    """
+    def __init__(self, directory: str, initial_slots: int = 1024, writable: bool = True):
+        self.directory = directory
+        self.writable = writable
+        self.data_path = os.path.join(directory, "data.bin")
+        self.index_path = os.path.join(directory, "index.bin")
+        self.lock_path = os.path.join(directory, "lock")
+        self._lock = threading.Lock()
+        self._closed = False
+
+        if writable:
+            os.makedirs(directory, exist_ok=True)
+            self._lock_file = open(self.lock_path, "a+b")
+            with self._file_lock():
+                if not os.path.exists(self.index_path):
+                    self._write_empty_index(self.index_path, initial_slots)
+            self._data = open(self.data_path, "ab")
+        else:
+            self._lock_file = None
+            self._data = None
+        self._reader = open(self.data_path, "rb") if os.path.exists(self.data_path) else None
+        self._open_index()
+
+    ## --- 프로세스 간 잠금 ---
+
+    @contextmanager
+    def _file_lock(self):
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _sync_index(self):
+        ## 다른 프로세스가 인덱스를 키워 교체(rename)했으면 새 파일을 다시 열고, 헤더(슬롯/항목 수)를 다시 읽음
+        if os.stat(self.index_path).st_ino != os.fstat(self._index_file.fileno()).st_ino:
+            self._close_index()
+            self._open_index()
+        else:
+            _, self.slots, self.entries = _HEADER.unpack_from(self._index, 0)
+
+    ## --- 인덱스 ---
+
+    @staticmethod
+    def _write_empty_index(path: str, slots: int):
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, slots, 0))
+            f.truncate(_HEADER.size + slots * _SLOT.size)
+
+    def _open_index(self):
+        self._index_file = open(self.index_path, "r+b" if self.writable else "rb")
+        access = mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ
+        self._index = mmap.mmap(self._index_file.fileno(), 0, access=access)
+        magic, self.slots, self.entries = _HEADER.unpack_from(self._index, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"replay 인덱스 파일 형식이 아닙니다: {self.index_path}")
+
+    def _close_index(self):
+        self._index.close()
+        self._index_file.close()
+
+    def _find_slot(self, index: mmap.mmap, slots: int, key: bytes) -> Tuple[int, bool]:
+        ## 선형 탐사. (슬롯 위치, 같은 키가 이미 있는지)
+        slot = int.from_bytes(key[:8], "little") & (slots - 1)
+        while True:
+            position = _HEADER.size + slot * _SLOT.size
+            found = index[position:position + 16]
+            if found == key:
+                return position, True
+            if found == _EMPTY_KEY:
+                return position, False
+            slot = (slot + 1) & (slots - 1)
+
+    def _grow(self):
+        ## 2배 크기의 새 인덱스에 모든 항목을 다시 넣고 원자적으로 교체
+        new_slots = self.slots * 2
+        tmp_path = self.index_path + ".tmp"
+        self._write_empty_index(tmp_path, new_slots)
+        with open(tmp_path, "r+b") as f:
+            new_index = mmap.mmap(f.fileno(), 0)
+            for key, offset, length in self._iter_slots():
+                position, _ = self._find_slot(new_index, new_slots, key)
+                _SLOT.pack_into(new_index, position, key, offset, length)
+            _HEADER.pack_into(new_index, 0, _MAGIC, new_slots, self.entries)
+            new_index.flush()
+            new_index.close()
+        self._close_index()
+        os.replace(tmp_path, self.index_path)
+        self._open_index()
+
+    def _iter_slots(self) -> Iterator[Tuple[bytes, int, int]]:
+        for slot in range(self.slots):
+            key, offset, length = _SLOT.unpack_from(self._index, _HEADER.size + slot * _SLOT.size)
+            if key != _EMPTY_KEY:
+                yield key, offset, length
+
+    ## --- 기록 / 조회 ---
+
+    def put(self, key: bytes, chunks: List[Tuple[str, float]], usage_metadata):
+        """
+        chunks: [(텍스트, 직전 청크(첫 청크는 요청 시작)와의 간격 초)]
+        """
+        payload = json.dumps(
+            {"chunks": chunks, "usage_metadata": StaticUsageMetadata.from_obj(usage_metadata).to_dict()},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        with self._lock:
+            if self._closed:
+                return
+            with self._file_lock():
+                self._sync_index()
+                ## 데이터를 먼저 기록한 뒤 인덱스를 갱신 (중간에 죽어도 인덱스는 온전한 레코드만 가리킴)
+                ## 다른 프로세스도 추가하므로 오프셋은 현재 파일 끝 기준
+                offset = self._data.seek(0, os.SEEK_END) + _LENGTH.size
+                self._data.write(_LENGTH.pack(len(payload)) + payload)
+                self._data.flush()
+
+                if (self.entries + 1) * 2 > self.slots:
+                    self._grow()
+                position, exists = self._find_slot(self._index, self.slots, key)
+                _SLOT.pack_into(self._index, position, key, offset, len(payload))
+                if not exists:
+                    self.entries += 1
+                    _HEADER.pack_into(self._index, 0, _MAGIC, self.slots, self.entries)
+
+    def get(self, key: bytes) -> Optional[Dict]:
+        with self._lock:
+            ## 쓰기 가능한 저장소는 다른 프로세스가 키운 인덱스를 반영 (읽기 전용 replay 모드는 쓰는 프로세스가 없음)
+            if self.writable:
+                with self._file_lock():
+                    self._sync_index()
+            position, exists = self._find_slot(self._index, self.slots, key)
+            if not exists:
+                return None
+            _, offset, length = _SLOT.unpack_from(self._index, position)
+            if self._reader is None:
+                self._reader = open(self.data_path, "rb")
+            payload = os.pread(self._reader.fileno(), length, offset)
+        return json.loads(payload)
+
+    def __len__(self) -> int:
+        return self.entries
+
+    def flush(self):
+        with self._lock:
+            if self.writable:
+                self._index.flush()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self.writable:
+                self._index.flush()
+            self._close_index()
+            if self._data is not None:
+                self._data.close()
+            if self._reader is not None:
+                self._reader.close()
+            if self._lock_file is not None:
+                self._lock_file.close()
+
+class RecordingStreamResponse:
+    """
+    스트리밍 응답을 그대로 전달하면서 청크와 도착 간격을 기록하고, 끝까지 순회하면 저장합니다.
+    """
+    def __init__(self, response, store: ReplayStore, key: bytes, start_time: float):
+        self._response = response
+        self._store = store
+        self._key = key
+        self._start_time = start_time
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def __iter__(self):
+        chunks = []
+        last = self._start_time
+        for chunk in self._response:
+            now = time.perf_counter()
+            try:
+                text = chunk.text
+            except ValueError:
+                text = ""
+            chunks.append((text, round(now - last, 6)))
+            last = now
+            yield chunk
+        self._store.put(self._key, chunks, self._response.usage_metadata)
+
+class RecordingModel:
+    """
+    실제 GenerativeModel을 감싸 응답을 ReplayStore에 녹화합니다.
+    """
+    def __init__(self, model, model_name: str, store: ReplayStore):
+        self._model = model
+        self.model_name = model_name
+        self._store = store
+
+    def generate_content(self, query, generation_config=None, stream=False):
+        key = make_replay_key(self.model_name, query, generation_config)
+        start_time = time.perf_counter()
+        response = self._model.generate_content(query, generation_config=generation_config, stream=stream)
+        if stream:
+            return RecordingStreamResponse(response, self._store, key, start_time)
+        self._store.put(key, [(response.text, round(time.perf_counter() - start_time, 6))], response.usage_metadata)
+        return response
+
+class ReplayStreamResponse:
+    """
+    녹화된 청크를 녹화 당시 간격(/ speed)대로 내보냅니다.
+    """
+    def __init__(self, chunks: List[Tuple[str, float]], usage_metadata: StaticUsageMetadata, speed: float):
+        self.chunks = chunks
+        self.usage_metadata = usage_metadata
+        self.speed = speed
+
+    @property
+    def text(self) -> str:
+        return "".join(text for text, _ in self.chunks)
+
+    def __iter__(self) -> Iterator[StaticChunk]:
+        for text, delay in self.chunks:
+            if self.speed:
+                time.sleep(delay / self.speed)
+            yield StaticChunk(text)
+
+class ReplayModel:
+    """
+    GenerativeModel 대체 구현: 녹화된 응답을 재생합니다.
+    speed: 1.0 = 녹화 속도, 2.0 = 2배속, 0 = 대기 없이 즉시.
+    """
+    def __init__(self, model_name: str, store: ReplayStore, speed: float = 1.0):
+        self.model_name = model_name
+        self._store = store
+        self.speed = speed
+
+    def generate_content(self, query, generation_config=None, stream=False):
+        record = self._store.get(make_replay_key(self.model_name, query, generation_config))
+        if record is None:
+            raise ReplayMiss(f"녹화된 응답이 없습니다: {self.model_name}")
+        chunks = [(text, delay) for text, delay in record["chunks"]]
+        usage_metadata = StaticUsageMetadata.from_obj(record["usage_metadata"])
+        if stream:
+            return ReplayStreamResponse(chunks, usage_metadata, self.speed)
+        if self.speed:
+            time.sleep(sum(delay for _, delay in chunks) / self.speed)
+        return StaticResponse([text for text, _ in chunks], usage_metadata)
+
+## 프로세스당 하나의 저장소
+_store: Optional[ReplayStore] = None
+_store_lock = threading.Lock()
+
+def get_replay_store(directory: str, writable: bool) -> ReplayStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ReplayStore(directory, writable=writable)
+        return _store
+
+def close_replay_store():
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
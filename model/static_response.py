@@ -0,0 +1,64 @@
+from typing import Iterator, List, Optional
+
+class StaticUsageMetadata:
+    """
+    Gemini usage_metadata와 같은 속성을 갖는 단순 객체.
+    """
+    def __init__(self, prompt_token_count: int = 0, candidates_token_count: int = 0, cached_content_token_count: int = 0):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        ## prompt_token_count 중 컨텍스트 캐시에서 읽은 토큰 수
+        self.cached_content_token_count = cached_content_token_count
+
+    def to_dict(self) -> dict:
+        return {
+            "prompt_token_count": self.prompt_token_count,
+            "candidates_token_count": self.candidates_token_count,
+            "cached_content_token_count": self.cached_content_token_count,
+        }
+
+    @classmethod
+    def from_obj(cls, usage_metadata) -> "StaticUsageMetadata":
+        ## Gemini usage_metadata(proto) 또는 dict 모두 허용
+        if isinstance(usage_metadata, dict):
+            return cls(**usage_metadata)
+        return cls(
+            prompt_token_count=usage_metadata.prompt_token_count,
+            candidates_token_count=usage_metadata.candidates_token_count,
+            cached_content_token_count=getattr(usage_metadata, "cached_content_token_count", 0) or 0,
+        )
+
+class StaticChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+class StaticResponse:
+    """
+    generate_content()의 응답(비스트리밍/스트리밍)을 흉내내는 메모리 내 응답.
+    캐시된 응답 등을 실제 Gemini 응답과 같은 코드 경로로 흘려보낼 때 사용합니다.
+
+    - 비스트리밍: .text, .usage_metadata
+    - 스트리밍: for chunk in response -> chunk.text, 순회 후 .usage_metadata
+    """
+    def __init__(self, chunks: List[str], usage_metadata: StaticUsageMetadata):
+        self.chunks = chunks
+        self.usage_metadata = usage_metadata
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def __iter__(self) -> Iterator[StaticChunk]:
+        for chunk in self.chunks:
+            yield StaticChunk(chunk)
+
+    @classmethod
+    def from_text(cls, text: str, usage_metadata, chunk_chars: Optional[int] = None) -> "StaticResponse":
+        """
+        전체 텍스트를 chunk_chars 글자 단위 청크로 나누어 응답을 만듭니다. (None이면 청크 1개)
+        """
+        if chunk_chars:
+            chunks = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+        else:
+            chunks = [text]
+        return cls(chunks, StaticUsageMetadata.from_obj(usage_metadata))
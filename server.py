@@ -1,37 +1,137 @@
 from pydantic import BaseModel, Field
 import uvicorn
 import socket
+import asyncio
 import argparse
 from typing import Dict
 import os
-
-from app import create_app
-from model.gemini_utils import gemini_api_certification
+import shutil
+import tempfile
+import threading
 
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", 8000))
 PUBLIC_IP = os.getenv('PUBLIC_IP', None)
 
-try:
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.connect(("8.8.8.8", 80))
-    ip_address = s.getsockname()[0]
-    s.close()
-except Exception:
-    ip_address = "127.0.0.1"
-    print("외부 IP 주소를 찾을 수 없습니다. 로컬 주소로 서버를 시작합니다.")
-
-print("=" * 60)
-print("FastAPI 서버를 시작합니다. 다른 기기에서 접속하여 테스트하세요.")
-print(f"   - 로컬 접속: http://127.0.0.1:{PORT}")
-print(f"   - 외부 접속 (Docker IP): http://{ip_address}:{PORT}")
-if PUBLIC_IP is not None:
-    print(f"   - 외부 접속 (Public IP): http://{PUBLIC_IP}:{PORT}")
-print(f"   - API 문서 (Swagger UI): http://{ip_address}:{PORT}/docs")
-print("=" * 60)
-print("서버를 중지하려면 CTRL+C를 누르세요.")
-
-gemini_api_certification()
-
-# FastAPI 앱 인스턴스 생성
-app = create_app()
\ No newline at end of file
+def print_banner():
+    ## 외부 IP 확인(UDP connect)은 시작을 늦추지 않도록 서버 시작 후 별도 스레드에서 실행
+    try:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.connect(("8.8.8.8", 80))
+        ip_address = s.getsockname()[0]
+        s.close()
+    except Exception:
+        ip_address = "127.0.0.1"
+        print("외부 IP 주소를 찾을 수 없습니다. 로컬 주소로 서버를 시작합니다.")
+
+    print("=" * 60)
+    print("FastAPI 서버를 시작합니다. 다른 기기에서 접속하여 테스트하세요.")
+    print(f"   - 로컬 접속: http://127.0.0.1:{PORT}")
+    print(f"   - 외부 접속 (Docker IP): http://{ip_address}:{PORT}")
+    if PUBLIC_IP is not None:
+        print(f"   - 외부 접속 (Public IP): http://{PUBLIC_IP}:{PORT}")
+    print(f"   - API 문서 (Swagger UI): http://{ip_address}:{PORT}/docs")
+    print(f"   - 준비 상태: http://{ip_address}:{PORT}/_internal/ready")
+    print("=" * 60)
+    print("서버를 중지하려면 CTRL+C를 누르세요.")
+
+async def _print_banner_in_background():
+    ## 런처(main)로 실행하면 배너는 마스터에서 한 번만 출력
+    if os.getenv("SERVER_BANNER", "1") == "1":
+        asyncio.get_running_loop().run_in_executor(None, print_banner)
+
+def _prepare_multiprocess_metrics(workers: int):
+    ## 워커별 Prometheus 값을 mmap 파일로 기록하고 /metrics에서 합산 (prometheus_client import 전에 설정)
+    if workers <= 1 or os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return None
+    metrics_dir = os.path.join(tempfile.gettempdir(), f"llm-prometheus-{os.getpid()}")
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+    return metrics_dir
+
+def _run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    def _child_exit(server, worker):
+        ## 종료된 워커의 livesum 게이지(in-flight 등) 값 제거
+        if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+            from prometheus_client import multiprocess
+            multiprocess.mark_process_dead(worker.pid)
+
+    class _Launcher(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{args.host}:{args.port}")
+            self.cfg.set("workers", args.workers)
+            self.cfg.set("worker_class", "uvicorn.workers.UvicornWorker")
+            self.cfg.set("preload_app", args.preload)
+            self.cfg.set("timeout", args.timeout)
+            self.cfg.set("graceful_timeout", args.timeout)
+            self.cfg.set("child_exit", _child_exit)
+
+        def load(self):
+            from server import app
+            return app
+
+    _Launcher().run()
+
+def main():
+    """
+    멀티 워커 런처.
+
+    python server.py --workers 4 --preload
+
+    - 워커가 1개(기본)면 uvicorn.run으로 실행합니다.
+    - 워커가 2개 이상이거나 --gunicorn을 지정하면 gunicorn + UvicornWorker로 실행합니다.
+      --preload: 마스터에서 앱을 한 번 import한 뒤 fork (워커 시작이 빠르고 코드 페이지를 공유).
+      Gemini 클라이언트/DB 연결 풀은 각 워커의 startup에서 만들므로 fork 이후에 생성됩니다.
+      gunicorn이 설치되어 있지 않으면 uvicorn --workers로 실행합니다 (preload 미지원).
+    - 워커가 2개 이상이면 PROMETHEUS_MULTIPROC_DIR을 자동 설정합니다.
+      rpm/tpm 한도와 role 캐시 무효화를 워커 간에 공유하려면 SHARED_STATE_BACKEND=redis 를 함께 설정하세요.
+    """
+    global PORT
+    parser = argparse.ArgumentParser(description="LLM test API server")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", 1)))
+    parser.add_argument("--preload", action="store_true", help="마스터에서 앱을 미리 import (gunicorn)")
+    parser.add_argument("--timeout", type=int, default=120, help="워커 응답 없음/종료 대기 시간(초, gunicorn)")
+    parser.add_argument("--gunicorn", action="store_true", help="워커 수와 관계없이 gunicorn으로 실행")
+    args = parser.parse_args()
+
+    use_gunicorn = args.gunicorn or args.workers > 1
+    if use_gunicorn:
+        try:
+            import gunicorn  # noqa: F401
+        except ImportError:
+            if args.gunicorn:
+                parser.error("--gunicorn: gunicorn이 설치되어 있지 않습니다.")
+            use_gunicorn = False
+            if args.preload:
+                print("gunicorn이 설치되어 있지 않아 --preload 없이 uvicorn 워커로 실행합니다.")
+
+    os.environ["PORT"] = str(args.port)
+    os.environ["SERVER_BANNER"] = "0"
+    metrics_dir = _prepare_multiprocess_metrics(args.workers)
+
+    PORT = args.port
+    threading.Thread(target=print_banner, daemon=True).start()
+
+    try:
+        if use_gunicorn:
+            _run_gunicorn(args)
+        else:
+            uvicorn.run("server:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        if metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
+else:
+    # FastAPI 앱 인스턴스 생성
+    ## Gemini 인증, DB 연결 풀 준비는 앱 시작(startup) 단계에서 동시에 진행됩니다.
+    from app import create_app
+
+    app = create_app()
+    app.add_event_handler("startup", _print_banner_in_background)
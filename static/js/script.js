@@ -28,10 +28,32 @@ const inputTokens = document.getElementById('input-tokens');
 const outputTokens = document.getElementById('output-tokens');
 const estimatedCost = document.getElementById('estimated-cost');
 const inferenceTime = document.getElementById('inference-time');
+const ttftTime = document.getElementById('ttft-time');
+const tokensPerSec = document.getElementById('tokens-per-sec');
+const chunkGapP95 = document.getElementById('chunk-gap-p95');
 
 // New elements for role prompts
 const roleSelect = document.getElementById('role-select');
 const roleDesc = document.getElementById('role-desc');
+const roleSearch = document.getElementById('role-search');
+const roleSearchInfo = document.getElementById('role-search-info');
+const roleMore = document.getElementById('role-more');
+const cancelButton = document.getElementById('cancel-button');
+
+// 진행 중인 스트리밍 요청의 X-Request-ID (생성 중지 / 페이지 이탈 시 /cancel 호출)
+let currentRequestId = null;
+
+function cancelCurrentRequest(useBeacon = false) {
+  if (!currentRequestId) return;
+  const url = `/cancel/${encodeURIComponent(currentRequestId)}`;
+  currentRequestId = null;
+  if (useBeacon && navigator.sendBeacon) navigator.sendBeacon(url);
+  else fetch(url, { method: 'POST' }).catch(err => console.error('[LLM Test] cancel failed', err));
+}
+
+if (cancelButton) cancelButton.addEventListener('click', () => cancelCurrentRequest());
+// 탭을 닫거나 페이지를 떠나면 서버에서 생성을 중단
+window.addEventListener('pagehide', () => cancelCurrentRequest(true));
 
 window.onload = async () => {
   console.log('[LLM Test] window.onload start');
@@ -53,44 +75,9 @@ window.onload = async () => {
     modelSelect.innerHTML = '<option>모델 로딩 실패</option>';
   }
 
-  // New: role prompts 로드 (디버깅 로깅 추가)
+  // New: role prompts 로드 (검색 색인 사용, 준비 전이면 전체 목록)
   try {
-    console.log('[LLM Test] fetching role prompts /get_role_prompts_metadata');
-    const r = await fetch('/get_role_prompts_metadata');
-    console.log('[LLM Test] /get_role_prompts_metadata response status', r.status);
-    if (!r.ok) {
-      const txt = await r.text().catch(()=>'<no body>');
-      throw new Error(`role prompts fetch failed: status ${r.status} body: ${txt}`);
-    }
-    const roles = await r.json();
-    console.log('[LLM Test] role prompts json', roles);
-
-    // 항상 첫 옵션으로 "프롬프트 사용 안함"
-    roleSelect.innerHTML = '';
-    const noOpt = document.createElement('option');
-    noOpt.value = '';
-    noOpt.textContent = '(프롬프트 사용 안함)';
-    noOpt.dataset.description = '선택 시 role 프롬프트 없이 사용자 입력만 LLM에 전달됩니다.';
-    roleSelect.appendChild(noOpt);
-
-    if (Array.isArray(roles) && roles.length > 0) {
-      roles.forEach(rp => {
-        const opt = document.createElement('option');
-        opt.value = rp.id;
-        opt.textContent = rp.name;
-        opt.dataset.description = rp.description || '';
-        // opt.dataset.text = rp.text || '';
-        roleSelect.appendChild(opt);
-      });
-    } else {
-      const emptyOpt = document.createElement('option');
-      emptyOpt.value = '';
-      emptyOpt.textContent = '(등록된 role 프롬프트가 없습니다)';
-      roleSelect.appendChild(emptyOpt);
-    }
-
-    roleSelect.selectedIndex = 0;
-    roleDesc.textContent = roleSelect.options[0].dataset.description || '';
+    await loadRoles('');
     console.log('[LLM Test] roleSelect populated');
   } catch (e) {
     console.error('[LLM Test] role prompts load failed', e);
@@ -99,6 +86,108 @@ window.onload = async () => {
   }
 };
 
+// Role 검색: /search_role_prompts 결과를 ROLE_PAGE_SIZE 개씩 표시
+const ROLE_PAGE_SIZE = 50;
+let roleQuery = '';
+let roleNextOffset = null;
+let roleRequestSeq = 0;
+
+function resetRoleOptions() {
+  // 항상 첫 옵션으로 "프롬프트 사용 안함"
+  roleSelect.innerHTML = '';
+  const noOpt = document.createElement('option');
+  noOpt.value = '';
+  noOpt.textContent = '(프롬프트 사용 안함)';
+  noOpt.dataset.description = '선택 시 role 프롬프트 없이 사용자 입력만 LLM에 전달됩니다.';
+  roleSelect.appendChild(noOpt);
+}
+
+function appendRoleOptions(roles) {
+  roles.forEach(rp => {
+    const opt = document.createElement('option');
+    opt.value = rp.id;
+    opt.textContent = rp.name;
+    opt.dataset.description = rp.description || '';
+    roleSelect.appendChild(opt);
+  });
+}
+
+async function fetchRolePage(query, offset) {
+  const params = new URLSearchParams({ q: query, offset: offset, limit: ROLE_PAGE_SIZE });
+  const r = await fetch(`/search_role_prompts?${params}`);
+  if (r.status === 503) return null;  // 색인 준비 전 또는 비활성화
+  if (!r.ok) {
+    const txt = await r.text().catch(()=>'<no body>');
+    throw new Error(`role search failed: status ${r.status} body: ${txt}`);
+  }
+  return r.json();
+}
+
+async function loadRoles(query) {
+  const seq = ++roleRequestSeq;
+  const selected = roleSelect.value;
+  let page = await fetchRolePage(query, 0);
+  if (seq !== roleRequestSeq) return;  // 더 최근 검색이 있으면 무시
+
+  if (page === null) {
+    // 검색 색인을 쓸 수 없으면 전체 목록 (검색 불가)
+    const r = await fetch('/get_role_prompts_metadata');
+    if (!r.ok) throw new Error(`role prompts fetch failed: status ${r.status}`);
+    const roles = await r.json();
+    page = { items: roles, total: roles.length, next_offset: null };
+    roleSearch.disabled = true;
+  }
+
+  roleQuery = query;
+  roleNextOffset = page.next_offset;
+  resetRoleOptions();
+  if (page.items.length > 0) {
+    appendRoleOptions(page.items);
+  } else {
+    const emptyOpt = document.createElement('option');
+    emptyOpt.value = '';
+    emptyOpt.textContent = query ? '(검색 결과가 없습니다)' : '(등록된 role 프롬프트가 없습니다)';
+    roleSelect.appendChild(emptyOpt);
+  }
+
+  // 이전에 선택한 role이 결과에 있으면 선택 유지
+  roleSelect.value = selected;
+  if (roleSelect.selectedIndex < 0) roleSelect.selectedIndex = 0;
+  roleDesc.textContent = roleSelect.selectedOptions[0].dataset.description || '';
+  updateRoleSearchInfo(page.total);
+}
+
+async function loadMoreRoles() {
+  if (roleNextOffset === null) return;
+  const seq = roleRequestSeq;
+  const page = await fetchRolePage(roleQuery, roleNextOffset);
+  if (page === null || seq !== roleRequestSeq) return;
+  roleNextOffset = page.next_offset;
+  appendRoleOptions(page.items);
+  updateRoleSearchInfo(page.total);
+}
+
+function updateRoleSearchInfo(total) {
+  const shown = roleSelect.querySelectorAll('option[value]:not([value=""])').length;
+  roleSearchInfo.textContent = roleQuery || total > shown ? `${total}개 중 ${shown}개 표시` : '';
+  roleMore.classList.toggle('hidden', roleNextOffset === null);
+}
+
+if (roleSearch) {
+  let debounceTimer = null;
+  roleSearch.addEventListener('input', e => {
+    clearTimeout(debounceTimer);
+    debounceTimer = setTimeout(() => {
+      loadRoles(e.target.value.trim()).catch(err => console.error('[LLM Test] role search failed', err));
+    }, 150);
+  });
+}
+if (roleMore) {
+  roleMore.addEventListener('click', () => {
+    loadMoreRoles().catch(err => console.error('[LLM Test] role load more failed', err));
+  });
+}
+
 temperatureSlider.addEventListener('input', e => temperatureValue.textContent = e.target.value);
 topPSlider.addEventListener('input', e => topPValue.textContent = e.target.value);
 
@@ -137,11 +226,17 @@ submitButton.addEventListener('click', async () => {
       body: JSON.stringify(requestBody)
     });
 
-    if (streamCheckbox.checked) await handleStreamResponse(response);
+    if (streamCheckbox.checked) {
+      currentRequestId = response.headers.get('X-Request-ID');
+      cancelButton.classList.remove('hidden');
+      await handleStreamResponse(response);
+    }
     else await handleNormalResponse(response);
   } catch (e) {
     responseArea.innerHTML = `<p class='text-red-600'>오류 발생: ${e.message}</p>`;
   } finally {
+    currentRequestId = null;
+    cancelButton.classList.add('hidden');
     setLoading(false);
   }
 });
@@ -159,6 +254,9 @@ function resetUsageInfo() {
   outputTokens.textContent = '0';
   estimatedCost.textContent = '$0.000000';
   inferenceTime.textContent = '0ms';
+  ttftTime.textContent = '-';
+  tokensPerSec.textContent = '-';
+  chunkGapP95.textContent = '-';
 }
 
 function updateUsageInfo(metadata) {
@@ -167,6 +265,9 @@ function updateUsageInfo(metadata) {
   outputTokens.textContent = metadata.output_tokens || 'N/A';
   estimatedCost.textContent = metadata.cost ? `$${metadata.cost.toFixed(6)}` : 'N/A';
   inferenceTime.textContent = metadata.inference_time || 'N/A';
+  ttftTime.textContent = metadata.ttft != null ? metadata.ttft : 'N/A';
+  tokensPerSec.textContent = metadata.tokens_per_sec != null ? metadata.tokens_per_sec : 'N/A';
+  chunkGapP95.textContent = metadata.inter_chunk_gap_ms ? metadata.inter_chunk_gap_ms.p95 : 'N/A';
   usageInfo.classList.remove('hidden');
 }
 
@@ -199,6 +300,15 @@ async function handleStreamResponse(response) {
     try {
       const metadata = JSON.parse(meta);
       responseArea.innerHTML = renderMarkdown(textPart); 
+      if (metadata.error) {
+        const errorLine = document.createElement('p');
+        errorLine.className = 'text-sm text-red-600';
+        errorLine.textContent = `(스트림 오류: ${metadata.error})`;
+        responseArea.appendChild(errorLine);
+      }
+      if (metadata.cancelled) {
+        responseArea.insertAdjacentHTML('beforeend', '<p class="text-sm text-gray-500">(생성이 중지되었습니다)</p>');
+      }
       updateUsageInfo(metadata);
     } catch (e) { console.error('메타데이터 파싱 실패', e); }
   }
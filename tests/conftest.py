@@ -0,0 +1,14 @@
+"""
+테스트 공통 설정.
+
+테스트는 실제 GCP/Cloud SQL/Gemini에 접속하지 않으므로 필수 설정값만 채우고 fake 백엔드를 사용합니다.
+(config 모듈이 import 시점에 설정을 읽으므로 다른 모듈보다 먼저 적용)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for _key in ("GOOGLE_APPLICATION_CREDENTIALS", "CLOUD_SQL_INSTANCE", "DB_USER", "DB_PASSWORD",
+             "DB_NAME", "DB_API_DRIVER", "DB_DRIVER", "DB_PROMPT_TABLE"):
+    os.environ.setdefault(_key, "test")
+os.environ.setdefault("GEMINI_BACKEND", "fake")
@@ -0,0 +1,93 @@
+import asyncio
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+
+from db.local_database import LocalDatabase
+
+pytest.importorskip("aiosqlite")
+
+ROLES = [
+    {"id": i, "name": f"role-{i}", "description": f"설명 {i}", "text": f"You are role {i}."}
+    for i in range(1, 8)
+]
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / "roles.db"
+    db = LocalDatabase(f"sqlite:///{path}", async_url=f"sqlite+aiosqlite:///{path}", attach_public_schema=True)
+    db.create_prompt_roles(ROLES)
+    yield db
+    db.engine.dispose()
+
+def _no_sync_fallback(db):
+    """
+    async 조회가 스레드 풀의 sync 엔진으로 빠지면 실패하도록 sync 연결을 막습니다.
+    """
+    def _fail(*args, **kwargs):
+        raise AssertionError("sync engine used")
+    db.connect = _fail
+
+def test_fetch_all_async_uses_async_engine(db):
+    _no_sync_fallback(db)
+
+    async def main():
+        try:
+            return await db.fetch_all_async(
+                "SELECT id, name FROM public.prompt_role WHERE id <= :n ORDER BY id", {"n": 3}
+            )
+        finally:
+            await db.close_async()
+
+    rows = asyncio.run(main())
+    assert rows == [{"id": 1, "name": "role-1"}, {"id": 2, "name": "role-2"}, {"id": 3, "name": "role-3"}]
+    assert db.async_wait_stats.count == 1
+    assert db.wait_stats.count == 0
+
+def test_iter_batches_async_streams_from_async_engine(db):
+    _no_sync_fallback(db)
+
+    async def main():
+        try:
+            return [
+                [row["id"] for row in batch]
+                async for batch in db.iter_batches_async("SELECT id FROM public.prompt_role ORDER BY id", batch_size=3)
+            ]
+        finally:
+            await db.close_async()
+
+    assert asyncio.run(main()) == [[1, 2, 3], [4, 5, 6], [7]]
+    assert db.async_wait_stats.count == 1
+
+def test_iter_batches_async_early_exit_returns_connection(db):
+    async def main():
+        batches = db.iter_batches_async("SELECT id FROM public.prompt_role ORDER BY id", batch_size=2)
+        first = await batches.__anext__()
+        await batches.aclose()
+        checked_out = db.async_engine.sync_engine.pool.checkedout()
+        await db.close_async()
+        return first, checked_out
+
+    first, checked_out = asyncio.run(main())
+    assert [row["id"] for row in first] == [1, 2]
+    assert checked_out == 0
+
+def test_warm_up_async_failure_returns_connections(db):
+    attempts = {"n": 0}
+
+    @event.listens_for(db.async_engine.sync_engine, "do_connect")
+    def _flaky_connect(dialect, conn_rec, cargs, cparams):
+        attempts["n"] += 1
+        if attempts["n"] == 2:
+            raise sqlite3.OperationalError("unable to open database file")
+
+    async def main():
+        with pytest.raises(Exception, match="unable to open database file"):
+            await db.warm_up_async(3)
+        checked_out = db.async_engine.sync_engine.pool.checkedout()
+        await db.close_async()
+        return checked_out
+
+    assert asyncio.run(main()) == 0
+    assert attempts["n"] == 3
@@ -0,0 +1,117 @@
+import json
+import time
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from utils import batch
+from utils.batch import BatchJobManager
+from utils.shared_state import MemorySharedState
+
+USAGE = SimpleNamespace(prompt_token_count=10, candidates_token_count=5)
+
+class SlowModel:
+    ## 블로킹 SDK 호출을 흉내내는 스텁 (행마다 latency초)
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def generate_content(self, query, generation_config=None, stream=False):
+        time.sleep(self.latency)
+        return SimpleNamespace(text="ok", usage_metadata=USAGE)
+
+@pytest.fixture(autouse=True)
+def slow_model(monkeypatch):
+    monkeypatch.setattr(batch, "get_model", lambda *a: (SlowModel(0.02), None))
+
+def _jsonl(n_rows: int) -> str:
+    return "\n".join(json.dumps({"query": f"q{i}", "model_name": "models/gemini-2.5-flash"}) for i in range(n_rows))
+
+async def _wait_done(manager: BatchJobManager, job_id: str, timeout: float = 10.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = await manager.get_status(job_id)
+        if status["status"] not in ("queued", "running"):
+            return status
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job did not finish: {status}")
+
+def test_only_one_worker_resumes_a_job(tmp_path):
+    async def main():
+        owner = BatchJobManager(str(tmp_path), default_concurrency=2)
+        other = BatchJobManager(str(tmp_path))
+        job_id = (await owner.create_job(_jsonl(20)))["job_id"]
+        ## 다른 워커의 시작 시 재개: 소유 워커가 잠금을 쥐고 있으므로 건너뜀
+        assert await other.resume_incomplete() == []
+        status = await _wait_done(owner, job_id)
+        await asyncio.sleep(0)
+        ## 끝난 작업은 잠금이 풀려도 다시 실행하지 않음
+        assert await other.resume_incomplete() == []
+        return job_id, status
+
+    job_id, status = asyncio.run(main())
+    assert status["status"] == "completed"
+    with open(tmp_path / job_id / "results.jsonl", "r", encoding="utf-8") as f:
+        indices = [json.loads(line)["index"] for line in f]
+    assert sorted(indices) == list(range(20))
+
+def test_resume_after_owner_stops(tmp_path):
+    async def main():
+        owner = BatchJobManager(str(tmp_path), default_concurrency=1)
+        job_id = (await owner.create_job(_jsonl(30)))["job_id"]
+        await asyncio.sleep(0.1)
+        await owner.shutdown()
+        other = BatchJobManager(str(tmp_path), default_concurrency=4)
+        assert await other.resume_incomplete() == [job_id]
+        return await _wait_done(other, job_id)
+
+    assert asyncio.run(main())["completed"] == 30
+
+def test_cancel_from_another_worker_reaches_owner(tmp_path):
+    async def main():
+        shared_state = MemorySharedState()
+        owner = BatchJobManager(str(tmp_path), shared_state=shared_state, default_concurrency=1)
+        other = BatchJobManager(str(tmp_path), shared_state=shared_state)
+        listener = asyncio.create_task(owner.listen_for_cancels())
+        await asyncio.sleep(0)
+        job_id = (await owner.create_job(_jsonl(50)))["job_id"]
+        await asyncio.sleep(0.1)
+
+        assert await other.cancel(job_id)
+        status = await _wait_done(other, job_id)
+        ## 소유 워커가 나중에 completed로 덮어쓰지 않음
+        await asyncio.sleep(0.2)
+        final = await other.get_status(job_id)
+        listener.cancel()
+        return status, final
+
+    status, final = asyncio.run(main())
+    assert status["status"] == "cancelled"
+    assert final["status"] == "cancelled"
+    assert final["completed"] < 50
+
+def test_cancel_owned_elsewhere_without_shared_state(tmp_path):
+    async def main():
+        owner = BatchJobManager(str(tmp_path), default_concurrency=1)
+        other = BatchJobManager(str(tmp_path))
+        job_id = (await owner.create_job(_jsonl(20)))["job_id"]
+        with pytest.raises(RuntimeError):
+            await other.cancel(job_id)
+        await owner.shutdown()
+
+    asyncio.run(main())
+
+def test_cancel_unowned_job_is_not_resumed(tmp_path):
+    async def main():
+        owner = BatchJobManager(str(tmp_path), default_concurrency=1)
+        job_id = (await owner.create_job(_jsonl(20)))["job_id"]
+        await owner.shutdown()
+        other = BatchJobManager(str(tmp_path))
+        assert await other.cancel(job_id)
+        assert not await other.cancel("0" * 32)
+        resumed = await other.resume_incomplete()
+        return resumed, await other.list_jobs()
+
+    resumed, jobs = asyncio.run(main())
+    assert resumed == []
+    assert [job["status"] for job in jobs] == ["cancelled"]
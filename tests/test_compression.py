@@ -0,0 +1,104 @@
+import gzip
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from utils.compression import CompressionMiddleware
+
+BODY = {"items": ["role prompt " * 20] * 10}
+
+def _make_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/large")
+    def _large():
+        return JSONResponse(BODY)
+
+    @app.get("/small")
+    def _small():
+        return PlainTextResponse("ok")
+
+    @app.get("/stream")
+    def _stream():
+        return StreamingResponse((f"chunk-{i} " * 50 for i in range(5)), media_type="text/plain")
+
+    @app.get("/encoded")
+    def _encoded():
+        return Response(gzip.compress(b"x" * 1000), headers={"Content-Encoding": "gzip"})
+
+    return app
+
+@pytest.fixture
+def client():
+    return TestClient(_make_app())
+
+def test_gzip_large_response(client):
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    ## content-length는 압축된 크기, content는 해제된 본문
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert response.json() == BODY
+
+def test_brotli_preferred(client):
+    pytest.importorskip("brotli")
+    response = client.get("/large", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.json() == BODY
+
+def test_small_and_identity_responses_are_not_compressed(client):
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert small.text == "ok"
+    identity = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert identity.json() == BODY
+
+def test_streaming_response_is_compressed_per_chunk(client):
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text == "".join(f"chunk-{i} " * 50 for i in range(5))
+
+def test_already_encoded_response_passes_through(client):
+    response = client.get("/encoded", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == b"x" * 1000
+
+def test_sse_is_not_buffered_or_compressed():
+    ## 첫 청크가 다음 청크를 기다리지 않고 바로 전달되는지 ASGI 수준에서 확인
+    release = asyncio.Event()
+    sent = []
+
+    async def sse_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream; charset=utf-8")]})
+        await send({"type": "http.response.body", "body": b"data: first\n\n", "more_body": True})
+        await release.wait()
+        await send({"type": "http.response.body", "body": b"data: last\n\n", "more_body": False})
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def main():
+        middleware = CompressionMiddleware(sse_app, minimum_size=0)
+        scope = {"type": "http", "method": "GET", "path": "/sse", "headers": [(b"accept-encoding", b"gzip, br")]}
+        task = asyncio.create_task(middleware(scope, receive, send))
+        await asyncio.sleep(0.05)
+        before_release = list(sent)
+        release.set()
+        await task
+        return before_release
+
+    before_release = asyncio.run(main())
+    assert [m["type"] for m in before_release] == ["http.response.start", "http.response.body"]
+    assert before_release[1]["body"] == b"data: first\n\n"
+    assert all(name != b"content-encoding" for name, _ in sent[0]["headers"])
+    assert sent[-1]["body"] == b"data: last\n\n"
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+import db.utils as db_utils
+from config.db import db_settings
+
+POOL_SETTINGS = {
+    "DB_POOL_SIZE": 7,
+    "DB_MAX_OVERFLOW": 3,
+    "DB_POOL_TIMEOUT": 4.5,
+    "DB_POOL_RECYCLE": 600,
+    "DB_POOL_PRE_PING": False,
+}
+
+@pytest.fixture
+def pool_settings(monkeypatch):
+    for key, value in POOL_SETTINGS.items():
+        monkeypatch.setattr(db_settings, key, value)
+
+def _assert_pool(pool):
+    assert pool.size() == 7
+    assert pool._max_overflow == 3
+    assert pool._timeout == 4.5
+    assert pool._recycle == 600
+    assert pool._pre_ping is False
+
+def test_local_database_uses_pool_settings(pool_settings, monkeypatch):
+    pytest.importorskip("psycopg2")
+    pytest.importorskip("asyncpg")
+    ## create_engine은 연결을 만들지 않으므로 실제 Postgres 없이 풀 설정만 확인
+    monkeypatch.setattr(db_settings, "DB_LOCAL_URL", "postgresql+psycopg2://user:pw@localhost/test")
+    monkeypatch.setattr(db_settings, "DB_LOCAL_ASYNC_URL", "postgresql+asyncpg://user:pw@localhost/test")
+    db = db_utils.make_db_from_env()
+    try:
+        _assert_pool(db.engine.pool)
+        _assert_pool(db.async_engine.sync_engine.pool)
+    finally:
+        db.close()
+        asyncio.run(db.close_async())
+
+def test_sqlite_local_database_keeps_default_pool(pool_settings, monkeypatch, tmp_path):
+    monkeypatch.setattr(db_settings, "DB_LOCAL_URL", f"sqlite:///{tmp_path / 'local.db'}")
+    monkeypatch.setattr(db_settings, "DB_LOCAL_ASYNC_URL", None)
+    db = db_utils.make_db_from_env()
+    try:
+        assert db.pool_options == {}
+        assert db.fetch_all("SELECT 1 AS one") == [{"one": 1}]
+    finally:
+        db.close()
+
+def test_cloud_sql_database_gets_pool_settings(pool_settings, monkeypatch):
+    pytest.importorskip("google.cloud.sql.connector")
+    created = {}
+
+    def _fake_cloud_sql(**kwargs):
+        created.update(kwargs)
+        return kwargs
+
+    monkeypatch.setattr(db_settings, "DB_LOCAL_URL", None)
+    monkeypatch.setattr(db_utils, "CloudSQLDatabase", _fake_cloud_sql)
+    db_utils.make_db_from_env()
+    assert created["pool_options"] == {
+        "pool_size": 7,
+        "max_overflow": 3,
+        "pool_timeout": 4.5,
+        "pool_recycle": 600,
+        "pool_pre_ping": False,
+    }
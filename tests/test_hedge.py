@@ -0,0 +1,97 @@
+import asyncio
+
+from utils.hedge import Hedger
+
+MODEL = "models/gemini-2.5-flash"
+
+class SlowFirstCall:
+    """
+    첫 호출만 slow초, 이후 호출은 fast초 걸리는 call. 반환값은 호출 순번.
+    """
+    def __init__(self, slow: float, fast: float = 0.0):
+        self.slow = slow
+        self.fast = fast
+        self.calls = 0
+        self.finished = []
+
+    async def __call__(self):
+        self.calls += 1
+        n = self.calls
+        await asyncio.sleep(self.slow if n == 1 else self.fast)
+        self.finished.append(n)
+        return n
+
+def test_hedge_budget_caps_extra_calls_per_model():
+    ## min_samples를 크게 두어 지연 기준을 default_delay로 고정
+    hedger = Hedger(default_delay=0.01, min_samples=1000, max_ratio=0.1, burst=2.0)
+
+    async def main():
+        total_calls = 0
+        results = []
+        for _ in range(50):
+            call = SlowFirstCall(slow=0.03)
+            result, info = await hedger.run(MODEL, call)
+            total_calls += call.calls
+            results.append((result, info["hedged"]))
+        return total_calls, results
+
+    total_calls, results = asyncio.run(main())
+    ## 예산: 요청마다 0.1씩 적립, 1 이상일 때만 hedge -> 50개 요청에 최대 5회
+    assert hedger.requests == 50
+    assert 4 <= hedger.hedges <= 5
+    assert total_calls == 50 + hedger.hedges
+    assert hedger.budget_skips == 50 - hedger.hedges
+    ## hedge한 요청은 빠른 중복 호출(2번째)의 결과를 사용
+    assert all(result == (2 if hedged else 1) for result, hedged in results)
+    assert hedger.hedge_wins == hedger.hedges
+
+def test_hedge_budget_is_per_model():
+    hedger = Hedger(default_delay=0.01, max_ratio=0.4, burst=1.0)
+
+    async def main():
+        ## 다른 모델의 빠른 요청으로 쌓인 예산은 느린 모델이 쓰지 못함
+        for _ in range(10):
+            await hedger.run("models/other", SlowFirstCall(slow=0.0))
+        _, first = await hedger.run(MODEL, SlowFirstCall(slow=0.03))
+        _, second = await hedger.run(MODEL, SlowFirstCall(slow=0.03))
+        return first["hedged"], second["hedged"]
+
+    assert asyncio.run(main()) == (False, False)
+    assert hedger.hedges == 0
+
+def test_loser_is_cancelled_without_on_loser():
+    hedger = Hedger(default_delay=0.01, max_ratio=1.0, burst=1.0)
+    call = SlowFirstCall(slow=0.05)
+
+    async def main():
+        hedger._budgets[MODEL] = 1.0
+        result, info = await hedger.run(MODEL, call)
+        await asyncio.sleep(0.1)
+        return result, info
+
+    result, info = asyncio.run(main())
+    assert info["hedged"] and info["winner"] == "hedge"
+    assert result == 2
+    assert call.finished == [2]
+    assert hedger.loser_completed == 0
+
+def test_loser_runs_to_completion_and_reports_result():
+    hedger = Hedger(default_delay=0.01, max_ratio=1.0, burst=1.0)
+    call = SlowFirstCall(slow=0.05)
+    losers = []
+
+    async def main():
+        hedger._budgets[MODEL] = 1.0
+        result, info = await hedger.run(MODEL, call, on_loser=losers.append)
+        ## 응답 시점에는 진 쪽이 아직 실행 중
+        pending = list(losers)
+        await asyncio.sleep(0.1)
+        return result, info, pending
+
+    result, info, pending = asyncio.run(main())
+    assert result == 2 and info["winner"] == "hedge"
+    assert pending == []
+    ## 진 쪽(1번째 호출)의 실제 결과가 전달됨
+    assert losers == [1]
+    assert call.finished == [2, 1]
+    assert hedger.loser_completed == 1
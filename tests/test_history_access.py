@@ -0,0 +1,44 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from config.db import DBSettings, db_settings
+from app.api_routers import export, history
+
+class FakeWriter:
+    async def query(self, before_id=None, limit=50, model_name=None):
+        return {"items": [{"id": 1, "response_text": "secret"}], "next_before_id": None}
+
+    def stats(self):
+        return {"buffered": 0}
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setitem(export.EXPORT_QUERIES, "query_history", "SELECT 1")
+    app = FastAPI()
+    app.include_router(history.router)
+    app.include_router(export.router)
+    app.state.history_writer = FakeWriter()
+    return TestClient(app)
+
+def test_history_is_opt_in():
+    assert DBSettings.model_fields["HISTORY_ENABLED"].default is False
+
+def test_history_reads_are_refused_without_configured_token(client, monkeypatch):
+    monkeypatch.setattr(db_settings, "HISTORY_ACCESS_TOKEN", None)
+    assert client.get("/query_history").status_code == 403
+    assert client.get("/query_history", headers={"Authorization": "Bearer anything"}).status_code == 403
+    assert client.get("/export/query_history").status_code == 403
+
+def test_history_reads_require_bearer_token(client, monkeypatch):
+    monkeypatch.setattr(db_settings, "HISTORY_ACCESS_TOKEN", "s3cret")
+    assert client.get("/query_history").status_code == 401
+    assert client.get("/query_history", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/export/query_history", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/query_history", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert response.json()["items"][0]["id"] == 1
+    ## 인증을 통과하면 DB 확인 단계로 넘어감 (이 앱에는 DB가 없음)
+    assert client.get("/export/query_history", headers={"Authorization": "Bearer s3cret"}).status_code == 503
+    ## writer 통계에는 이력 내용이 없으므로 토큰 없이 조회 가능
+    assert client.get("/_internal/history").status_code == 200
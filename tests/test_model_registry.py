@@ -0,0 +1,28 @@
+from model.gemini_utils import ModelRegistry
+
+MODEL = "models/gemini-2.5-flash"
+
+def test_generation_config_lru_eviction():
+    registry = ModelRegistry([MODEL], config_cache_size=2)
+    first = registry.get_generation_config(100, 40, 0.9, 0.0)
+    second = registry.get_generation_config(200, 40, 0.9, 0.0)
+    ## 최근 사용: first -> 가장 오래 사용되지 않은 항목은 second
+    assert registry.get_generation_config(100, 40, 0.9, 0.0) is first
+    registry.get_generation_config(300, 40, 0.9, 0.0)
+
+    assert registry.get_generation_config(100, 40, 0.9, 0.0) is first
+    assert registry.get_generation_config(200, 40, 0.9, 0.0) is not second
+    stats = registry.stats()
+    assert stats["config_cache_size"] == 2
+    assert stats["config_misses"] == 4
+
+def test_models_cached_only_for_allowed_names():
+    registry = ModelRegistry([MODEL])
+    registry.warm()
+    assert registry.get_model(MODEL) is registry.get_model(MODEL)
+    other = "models/not-in-settings"
+    assert registry.get_model(other) is not registry.get_model(other)
+    stats = registry.stats()
+    assert stats["models"] == [MODEL]
+    assert stats["model_hits"] == 2
+    assert stats["model_misses"] == 2
@@ -0,0 +1,42 @@
+import sqlite3
+
+import pytest
+from sqlalchemy.pool import QueuePool
+
+from db.local_database import LocalDatabase
+
+class FlakyConnector:
+    """
+    fail_on번째 연결 시도만 실패하는 sqlite3 연결 생성기.
+    """
+    def __init__(self, path, fail_on: int):
+        self.path = path
+        self.fail_on = fail_on
+        self.attempts = 0
+
+    def __call__(self):
+        self.attempts += 1
+        if self.attempts == self.fail_on:
+            raise sqlite3.OperationalError("unable to open database file")
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+def test_warm_up_fills_pool(tmp_path):
+    db = LocalDatabase(f"sqlite:///{tmp_path / 'pool.db'}", pool_size=4, max_overflow=0)
+    assert db.warm_up(4) >= 0
+    pool = db.engine.pool
+    assert pool.checkedin() == 4
+    assert pool.checkedout() == 0
+
+def test_warm_up_failure_raises_and_returns_connections(tmp_path):
+    connector = FlakyConnector(str(tmp_path / "pool.db"), fail_on=2)
+    db = LocalDatabase("sqlite://", creator=connector, poolclass=QueuePool, pool_size=4, max_overflow=0)
+    with pytest.raises(Exception, match="unable to open database file"):
+        db.warm_up(4)
+    ## 실패해도 열린 연결은 모두 풀에 반납
+    assert connector.attempts == 4
+    assert db.engine.pool.checkedout() == 0
+
+def test_warm_up_unreachable_database(tmp_path):
+    db = LocalDatabase(f"sqlite:///{tmp_path / 'missing' / 'pool.db'}")
+    with pytest.raises(Exception, match="unable to open database file"):
+        db.warm_up(2)
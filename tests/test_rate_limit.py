@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from model.fake_backend import FakeGenerativeModel, FakeResourceExhausted, LatencyDistribution
+from model.gemini_utils import generate_async
+from utils.rate_limit import AIMDLimiter, ModelRateLimiter, RateLimitExceeded, is_overload_error
+from utils.shared_state import MemorySharedState
+
+MODEL = "models/gemini-2.5-flash"
+
+def test_aimd_decreases_multiplicatively_and_increases_additively():
+    async def main():
+        limiter = AIMDLimiter(initial=8, max_limit=16, backoff_cooldown=0)
+        trace = []
+        assert await limiter.acquire(1.0)
+        await limiter.release(overloaded=True)
+        trace.append(limiter.limit)
+        ## limit 개 성공(한 윈도우)마다 약 +1
+        for _ in range(4):
+            assert await limiter.acquire(1.0)
+            await limiter.release()
+        trace.append(limiter.limit)
+        assert await limiter.acquire(1.0)
+        await limiter.release(overloaded=True)
+        trace.append(limiter.limit)
+        return trace
+
+    halved, grown, halved_again = asyncio.run(main())
+    assert halved == 4.0
+    assert 4.9 < grown < 5.0
+    assert halved_again == pytest.approx(grown / 2)
+
+def test_aimd_backoff_cooldown_ignores_burst_of_429s():
+    async def main():
+        limiter = AIMDLimiter(initial=8, backoff_cooldown=60)
+        for _ in range(3):
+            assert await limiter.acquire(1.0)
+        for _ in range(3):
+            await limiter.release(overloaded=True)
+        return limiter.limit, limiter.overloads
+
+    assert asyncio.run(main()) == (4.0, 3)
+
+def test_concurrency_settles_near_fake_backend_429_threshold():
+    ## fake 백엔드: 동시 호출 4개를 넘으면 429. 상한 16에서 시작해 4 근처로 줄어야 함
+    model = FakeGenerativeModel(
+        MODEL, LatencyDistribution("fixed", 0.02), output_tokens=1, max_concurrency=4
+    )
+    limiter = ModelRateLimiter(
+        {"default": {"max_concurrency": 16, "initial_concurrency": 16}},
+        queue_timeout=30.0,
+        max_retries=100,
+        retry_base_delay=0.001,
+        retry_max_delay=0.005,
+    )
+    concurrency = limiter._limits(MODEL).concurrency
+    concurrency.backoff_cooldown = 0.02
+
+    async def main():
+        remaining = iter(range(120))
+        trace = []
+
+        async def _client():
+            for _ in remaining:
+                await limiter.run(MODEL, 0, lambda: generate_async(model, None, query="q", stream=False))
+                trace.append(concurrency.limit)
+
+        await asyncio.gather(*(_client() for _ in range(16)))
+        return trace
+
+    trace = asyncio.run(main())
+    assert len(trace) == 120
+    assert model.rejected > 0
+    assert concurrency.overloads == model.rejected
+    tail = trace[-40:]
+    assert 1.5 <= sum(tail) / len(tail) <= 6.0
+    assert max(tail) < 8.0
+
+def test_fake_backend_429_is_overload_error():
+    model = FakeGenerativeModel(MODEL, LatencyDistribution("fixed", 0.0), output_tokens=1, max_concurrency=1)
+    stream = model.generate_content("q", stream=True)
+    with pytest.raises(FakeResourceExhausted) as info:
+        model.generate_content("q")
+    assert is_overload_error(info.value)
+    ## 스트림을 다 읽으면 슬롯 반납
+    list(stream)
+    assert model.generate_content("q").text
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_concurrency_timeout_refunds_reserved_tokens(shared):
+    limiter = ModelRateLimiter(
+        {"default": {"rpm": 60, "tpm": 1000, "max_concurrency": 1}},
+        queue_timeout=0.05,
+        shared_state=MemorySharedState() if shared else None,
+    )
+
+    async def main():
+        permit = await limiter.acquire(MODEL, 100)
+        limits = limiter._limits(MODEL)
+        before = (limits.requests.tokens, limits.tokens.tokens)
+        with pytest.raises(RateLimitExceeded) as info:
+            await limiter.acquire(MODEL, 300)
+        after = (limits.requests.tokens, limits.tokens.tokens)
+        await permit.release()
+        return info.value.reason, before, after
+
+    reason, before, after = asyncio.run(main())
+    assert reason == "concurrency"
+    ## 시간 초과된 요청의 rpm 1개, tpm 300개는 돌려받음 (그 사이 채워진 양만큼만 차이)
+    assert after[0] == pytest.approx(before[0], abs=0.1)
+    assert after[1] == pytest.approx(before[1], abs=1.0)
+
+def test_redis_bucket_refund():
+    fakeredis = pytest.importorskip("fakeredis")
+    from utils.shared_state import RedisSharedState
+
+    async def main():
+        state = RedisSharedState(fakeredis.FakeAsyncRedis())
+        bucket = state.token_bucket("tpm", 1000 / 60.0, 1000)
+        await bucket.reserve(400, 1.0)
+        reserved = bucket.tokens
+        await bucket.refund(400)
+        refunded = bucket.tokens
+        ## 가득 찬 버킷 이상으로는 채우지 않음
+        await bucket.refund(400)
+        await state.close()
+        return reserved, refunded, bucket.tokens
+
+    reserved, refunded, overfilled = asyncio.run(main())
+    assert reserved == pytest.approx(600, abs=1.0)
+    assert refunded == pytest.approx(1000, abs=1.0)
+    assert overfilled == pytest.approx(1000, abs=1.0)
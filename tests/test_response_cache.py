@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from utils.response_cache import ResponseCache
+
+fakeredis = pytest.importorskip("fakeredis")
+
+USAGE = {"prompt_token_count": 10, "candidates_token_count": 5}
+
+def _make_cache(**kwargs) -> ResponseCache:
+    return ResponseCache(fakeredis.aioredis.FakeRedis(), **kwargs)
+
+def test_oldest_entries_evicted_over_max_entries():
+    async def main():
+        cache = _make_cache(max_entries=2)
+        for key in ("a", "b", "c"):
+            assert await cache.set(key, f"text-{key}", USAGE)
+            await asyncio.sleep(0.01)
+        return [await cache.get(key) for key in ("a", "b", "c")], cache.stats()
+
+    (a, b, c), stats = asyncio.run(main())
+    assert a is None
+    assert b["text"] == "text-b"
+    assert c == {"text": "text-c", "usage_metadata": USAGE}
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+def test_oversize_entry_not_stored():
+    async def main():
+        cache = _make_cache(max_entry_bytes=64)
+        stored = await cache.set("big", "x" * 100, USAGE)
+        return stored, await cache.get("big"), cache.stats()
+
+    stored, value, stats = asyncio.run(main())
+    assert stored is False
+    assert value is None
+    assert stats["skipped_oversize"] == 1
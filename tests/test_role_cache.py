@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+import sqlalchemy
+
+from db.local_database import LocalDatabase
+from db.role_cache import ROLE_VERSION_SQL_ROWS, RolePromptCache
+
+ROLES = [
+    {"id": 1, "name": "번역가", "description": "한영 번역", "text": "You translate."},
+    {"id": 2, "name": "요약가", "description": "긴 글 요약", "text": "You summarize."},
+]
+
+@pytest.fixture
+def db(tmp_path):
+    db = LocalDatabase(f"sqlite:///{tmp_path / 'roles.db'}", attach_public_schema=True)
+    db.create_prompt_roles(ROLES)
+    yield db
+    db.engine.dispose()
+
+class CountingDatabase:
+    """
+    fetch_all_async 호출 수를 세고, gate가 열릴 때까지 조회를 붙잡아 둡니다.
+    """
+    def __init__(self, db):
+        self.db = db
+        self.calls = 0
+        self.gate = None
+
+    async def fetch_all_async(self, sql, params=None):
+        self.calls += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        return await self.db.fetch_all_async(sql, params)
+
+def _update(db, role_id, **values):
+    sets = ", ".join(f"{column} = :{column}" for column in values)
+    with db.engine.begin() as conn:
+        conn.execute(sqlalchemy.text(f"UPDATE public.prompt_role SET {sets} WHERE id = :id"), {"id": role_id, **values})
+
+def test_hit_miss_and_missing_role(db):
+    async def main():
+        cache = RolePromptCache(db)
+        assert await cache.get_role_text(1) == "You translate."
+        assert await cache.get_role_text(1) == "You translate."
+        assert await cache.get_role_text(99) is None
+        assert [row["id"] for row in await cache.get_metadata()] == [1, 2]
+        return cache.stats()
+
+    stats = asyncio.run(main())
+    assert stats["hits"] == 1
+    assert stats["misses"] == 3
+    ## 없는 role은 캐시하지 않음
+    assert stats["size"] == 2
+
+def test_lru_eviction(db):
+    async def main():
+        cache = RolePromptCache(db, max_size=1)
+        await cache.get_role_text(1)
+        await cache.get_role_text(2)
+        return cache.stats()
+
+    stats = asyncio.run(main())
+    assert stats["size"] == 1
+    assert stats["evictions"] == 1
+
+def test_concurrent_misses_share_one_query(db):
+    counting = CountingDatabase(db)
+
+    async def main():
+        cache = RolePromptCache(counting)
+        counting.gate = asyncio.Event()
+        waiters = [asyncio.ensure_future(cache.get_role_text(1)) for _ in range(10)]
+        await asyncio.sleep(0)
+        counting.gate.set()
+        return await asyncio.gather(*waiters), cache.stats()
+
+    texts, stats = asyncio.run(main())
+    assert texts == ["You translate."] * 10
+    assert counting.calls == 1
+    assert stats["coalesced"] == 9
+
+def test_invalidate_during_fetch_discards_stale_value(db):
+    counting = CountingDatabase(db)
+
+    async def main():
+        cache = RolePromptCache(counting)
+        counting.gate = asyncio.Event()
+        stale = asyncio.ensure_future(cache.get_role_text(1))
+        await asyncio.sleep(0)
+        ## 조회가 DB에서 대기 중인 동안 role이 바뀌고 무효화됨
+        cache.invalidate(1)
+        counting.gate.set()
+        await stale
+        _update(db, 1, text="You translate carefully.")
+        return await cache.get_role_text(1), cache.stats()
+
+    text, stats = asyncio.run(main())
+    assert text == "You translate carefully."
+    assert stats["stale_discards"] == 1
+
+@pytest.mark.parametrize("change", [
+    {"text": "You translate!"},           ## 길이가 같은 수정
+    {"name": "통역가"},
+    {"description": "영한 번역"},
+])
+def test_version_check_detects_changes(db, change):
+    async def main():
+        cache = RolePromptCache(db, version_sql=ROLE_VERSION_SQL_ROWS)
+        assert await cache.check_version() is False
+        await cache.get_role_text(1)
+        _update(db, 1, **change)
+        changed = await cache.check_version()
+        return changed, cache.stats()
+
+    changed, stats = asyncio.run(main())
+    assert changed is True
+    assert stats["size"] == 0
+    assert stats["invalidations"] == 1
+
+def test_version_check_without_changes(db):
+    async def main():
+        cache = RolePromptCache(db, version_sql=ROLE_VERSION_SQL_ROWS)
+        await cache.check_version()
+        await cache.get_role_text(1)
+        return await cache.check_version(), cache.stats()
+
+    changed, stats = asyncio.run(main())
+    assert changed is False
+    assert stats["size"] == 1
@@ -0,0 +1,140 @@
+import time
+import asyncio
+
+import pytest
+
+from config.base import settings
+from model.fake_backend import FakeGenerativeModel, LatencyDistribution
+from utils.single_flight import SingleFlight
+from utils.stream import StreamStalled, _STREAM_END
+
+MODEL = "models/gemini-2.5-flash"
+
+@pytest.fixture(autouse=True)
+def small_buffers(monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_QUEUE_MAXSIZE", 8)
+    monkeypatch.setattr(settings, "STREAM_STALL_TIMEOUT", 0.2)
+
+class CountingOpener:
+    """
+    fake 백엔드 스트림을 여는 open_stream. 업스트림 호출 수를 셉니다.
+    """
+    def __init__(self, n_chunks: int, tokens_per_sec: float = 100000.0):
+        self.model = FakeGenerativeModel(
+            MODEL, LatencyDistribution("fixed", 0.0), output_tokens=n_chunks,
+            tokens_per_sec=tokens_per_sec, chunk_tokens=1,
+        )
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.model.generate_content("q", stream=True), time.perf_counter(), None
+
+async def _read_all(subscription, delay: float = 0.0):
+    texts = []
+    while True:
+        item = await subscription.get()
+        if item is _STREAM_END:
+            return texts
+        texts.append(item[0])
+        if delay:
+            await asyncio.sleep(delay)
+
+def test_broadcast_shares_one_upstream_call():
+    opener = CountingOpener(20, tokens_per_sec=2000.0)
+
+    async def main():
+        flight = SingleFlight()
+        subscriptions = [await flight.stream("k", opener) for _ in range(3)]
+        assert [shared for _, _, shared in subscriptions] == [False, True, True]
+        results = await asyncio.gather(*[_read_all(sub) for sub, _, _ in subscriptions])
+        completed = [await sub.wait() for sub, _, _ in subscriptions]
+        return results, completed, flight.stats()
+
+    results, completed, stats = asyncio.run(main())
+    assert opener.calls == 1
+    assert len(results[0]) == 20
+    assert results[0] == results[1] == results[2]
+    assert completed == [True, True, True]
+    assert stats["coalesced"] == 2
+    assert stats["in_flight_streams"] == 0
+
+def test_broadcast_buffer_is_bounded_and_paced_by_slowest_subscriber():
+    opener = CountingOpener(60)
+
+    async def main():
+        flight = SingleFlight()
+        fast, _, _ = await flight.stream("k", opener)
+        slow, _, _ = await flight.stream("k", opener)
+        broadcast = fast.broadcast
+        max_buffered = 0
+        max_lead = 0
+
+        async def _fast():
+            nonlocal max_buffered, max_lead
+            texts = []
+            while (item := await fast.get()) is not _STREAM_END:
+                texts.append(item[0])
+                max_buffered = max(max_buffered, len(broadcast.items))
+                max_lead = max(max_lead, broadcast._end() - slow._index)
+            return texts
+
+        fast_texts, slow_texts = await asyncio.gather(_fast(), _read_all(slow, delay=0.002))
+        return fast_texts, slow_texts, max_buffered, max_lead, await slow.wait()
+
+    fast_texts, slow_texts, max_buffered, max_lead, slow_completed = asyncio.run(main())
+    assert len(fast_texts) == len(slow_texts) == 60
+    ## 업스트림을 빠르게 다 읽어 버리지 않고 느린 구독자보다 버퍼 크기 이상 앞서지 않음
+    assert max_buffered <= 8
+    assert max_lead <= 8
+    assert slow_completed
+
+def test_stalled_subscriber_is_evicted_and_others_continue():
+    opener = CountingOpener(40)
+
+    async def main():
+        flight = SingleFlight()
+        reader, _, _ = await flight.stream("k", opener)
+        stalled, _, _ = await flight.stream("k", opener)
+        texts = await _read_all(reader)
+        ## 떠나지 않고 읽지도 않던 구독자는 내보내져 오류로 끝남
+        end = await stalled.get()
+        return texts, await reader.wait(), end, await stalled.wait(), stalled.error, reader.broadcast.evicted
+
+    texts, reader_completed, end, stalled_completed, error, evicted = asyncio.run(main())
+    assert len(texts) == 40
+    assert reader_completed
+    assert end is _STREAM_END
+    assert not stalled_completed
+    assert isinstance(error, StreamStalled)
+    assert evicted == 1
+
+def test_all_subscribers_stalled_stops_upstream():
+    opener = CountingOpener(40)
+
+    async def main():
+        flight = SingleFlight()
+        subscription, _, _ = await flight.stream("k", opener)
+        await asyncio.wait_for(subscription.broadcast._finished.wait(), 2.0)
+        return subscription, flight.stats()
+
+    subscription, stats = asyncio.run(main())
+    assert isinstance(subscription.error, StreamStalled)
+    assert subscription.broadcast.completed is False
+    assert stats["in_flight_streams"] == 0
+
+def test_late_joiner_does_not_join_after_buffer_trimmed():
+    opener = CountingOpener(30)
+
+    async def main():
+        flight = SingleFlight()
+        first, _, _ = await flight.stream("k", opener)
+        texts = await _read_all(first)
+        ## 버퍼 앞부분을 버린 스트림에는 합류하지 않고 새 업스트림 호출
+        second, _, shared = await flight.stream("k", opener)
+        return texts, shared, await _read_all(second)
+
+    texts, shared, second_texts = asyncio.run(main())
+    assert shared is False
+    assert opener.calls == 2
+    assert texts == second_texts
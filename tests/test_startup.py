@@ -0,0 +1,64 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from utils.startup import ReadinessMiddleware, StartupTracker
+
+def _make_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(ReadinessMiddleware)
+    app.state.startup = StartupTracker()
+
+    @app.get("/roles")
+    def _roles():
+        return {"ok": True}
+
+    @app.get("/_internal/ready")
+    def _ready():
+        return app.state.startup.status()
+
+    return app
+
+async def _get(app: FastAPI, path: str) -> httpx.Response:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await client.get(path)
+
+def test_requests_get_503_until_ready():
+    app = _make_app()
+
+    async def main():
+        before = await _get(app, "/roles")
+        internal = await _get(app, "/_internal/ready")
+        async with app.state.startup.step("db"):
+            pass
+        app.state.startup.mark_ready()
+        after = await _get(app, "/roles")
+        return before, internal, after
+
+    before, internal, after = asyncio.run(main())
+    assert before.status_code == 503
+    assert before.headers["retry-after"] == "1"
+    assert before.json()["ready"] is False
+    ## /_internal 경로는 준비 전에도 통과 (readiness probe)
+    assert internal.status_code == 200
+    assert after.status_code == 200
+    assert after.json() == {"ok": True}
+
+def test_failed_startup_stays_unavailable():
+    app = _make_app()
+    tracker = app.state.startup
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            async with tracker.step("db"):
+                raise RuntimeError("DB 연결 테스트 실패")
+        tracker.mark_failed(RuntimeError("DB 연결 테스트 실패"))
+        return await _get(app, "/roles")
+
+    response = asyncio.run(main())
+    assert response.status_code == 503
+    body = response.json()
+    assert body["error"] == "DB 연결 테스트 실패"
+    assert body["steps"]["db"]["status"] == "failed"
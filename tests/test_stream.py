@@ -0,0 +1,118 @@
+import json
+import asyncio
+
+import pytest
+
+from config.base import settings
+from model.fake_backend import FakeGenerativeModel, LatencyDistribution
+from model.static_response import StaticChunk, StaticUsageMetadata
+from utils.stream import ResponsePump, StreamStalled, stream_generator
+
+MODEL = "models/gemini-2.5-flash"
+METADATA_SEPARATOR = "\n<--METADATA-->\n"
+
+@pytest.fixture(autouse=True)
+def small_queue(monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_QUEUE_MAXSIZE", 2)
+
+def _fake_stream(n_chunks: int):
+    model = FakeGenerativeModel(
+        MODEL, LatencyDistribution("fixed", 0.0), output_tokens=n_chunks, tokens_per_sec=100000.0, chunk_tokens=1
+    )
+    return model.generate_content("q", stream=True)
+
+class FailingStream:
+    """
+    청크 n개를 보낸 뒤 업스트림 오류(중간 429 등)로 끊기는 스트림.
+    """
+    usage_metadata = StaticUsageMetadata(prompt_token_count=10, candidates_token_count=3)
+
+    def __init__(self, n_chunks: int, error: Exception):
+        self.n_chunks = n_chunks
+        self.error = error
+
+    def __iter__(self):
+        for i in range(self.n_chunks):
+            yield StaticChunk(f"chunk-{i} ")
+        raise self.error
+
+async def _collect(body):
+    return [part async for part in body]
+
+def _split(parts):
+    text = "".join(parts)
+    body, _, trailer = text.partition(METADATA_SEPARATOR)
+    return body, json.loads(trailer)
+
+def test_pump_stops_upstream_when_reader_stalls():
+    response = _fake_stream(20)
+
+    async def main():
+        pump = ResponsePump(response, stall_timeout=0.1)
+        ## 큐(2개)가 찬 뒤 아무도 읽지 않음
+        completed = await asyncio.wait_for(pump.wait(), 2.0)
+        return completed, pump.error, pump.queue.qsize()
+
+    completed, error, buffered = asyncio.run(main())
+    assert completed is False
+    assert isinstance(error, StreamStalled)
+    ## 업스트림은 끊기고 버퍼는 큐 크기를 넘지 않음
+    assert response._cancelled.is_set()
+    assert buffered <= 2
+
+def test_pump_applies_backpressure_to_slow_reader():
+    response = _fake_stream(10)
+
+    async def main():
+        pump = ResponsePump(response, stall_timeout=1.0)
+        texts = []
+        max_buffered = 0
+        while True:
+            max_buffered = max(max_buffered, pump.queue.qsize())
+            item = await pump.get()
+            if not isinstance(item, tuple):
+                break
+            texts.append(item[0])
+            await asyncio.sleep(0.01)
+        return texts, max_buffered, await pump.wait(), pump.error
+
+    texts, max_buffered, completed, error = asyncio.run(main())
+    assert len(texts) == 10
+    assert max_buffered <= 2
+    assert completed is True
+    assert error is None
+
+def test_upstream_error_sends_error_trailer_and_skips_on_complete():
+    completions = []
+
+    async def on_complete(text, usage_metadata, metadata):
+        completions.append(text)
+
+    async def main():
+        body = stream_generator(
+            FailingStream(3, RuntimeError("429 Resource exhausted")), MODEL, 0.0, on_complete=on_complete
+        )
+        return await _collect(body)
+
+    body, trailer = _split(asyncio.run(main()))
+    assert body == "chunk-0 chunk-1 chunk-2 "
+    assert trailer["error"] == "RuntimeError: 429 Resource exhausted"
+    assert trailer["output_tokens"] > 0
+    ## 정상 완료 메타데이터(비용 등)는 보내지 않고, 캐시/이력 콜백도 호출하지 않음
+    assert "cost" not in trailer
+    assert completions == []
+
+def test_completed_stream_sends_usage_trailer():
+    completions = []
+
+    async def on_complete(text, usage_metadata, metadata):
+        completions.append((text, metadata["output_tokens"]))
+
+    async def main():
+        return await _collect(stream_generator(_fake_stream(5), MODEL, 0.0, on_complete=on_complete))
+
+    body, trailer = _split(asyncio.run(main()))
+    assert "error" not in trailer
+    assert trailer["output_tokens"] == 5
+    assert trailer["cost"] > 0
+    assert completions == [(body, 5)]
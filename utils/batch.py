@@ -0,0 +1,521 @@
+import os
+import re
+import json
+import time
+import uuid
+import fcntl
+import asyncio
+from typing import Dict, List, Optional, Set
+
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from model.gemini_schemas import GeminiTestQueryRequest
+from model.gemini_utils import get_model, generate_async
+from utils.cost import calculate_cost
+from utils import metrics
+from utils.rate_limit import estimate_tokens
+from utils.log import get_logger
+from metadata.script_format.main_script_format import TEST_SYSTEM_PROMPT
+
+logger = get_logger("batch")
+
+## 다른 워커가 실행 중인 작업의 취소 요청을 소유 워커에 전달하는 채널 (shared_state)
+BATCH_CANCEL_CHANNEL = "batch:cancel"
+
+## create_job()이 만드는 job_id 형식 (uuid4().hex). 경로에 쓰이므로 다른 값은 거부
+_JOB_ID_RE = re.compile(r"[0-9a-f]{32}")
+
+def is_valid_job_id(job_id: str) -> bool:
+    return bool(_JOB_ID_RE.fullmatch(job_id or ""))
+
+def _append_lines(f, lines: List[str]):
+    f.write("".join(lines))
+    f.flush()
+
+def _try_lock(path: str) -> Optional[int]:
+    ## 배타적 flock을 기다리지 않고 시도. 성공하면 잠금을 쥔 fd, 다른 프로세스가 쥐고 있으면 None
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+class RateLimiter:
+    """
+    초당 요청 수(qps)를 제한하는 단순 비동기 리미터. qps가 None이면 제한하지 않습니다.
+    """
+    def __init__(self, qps: Optional[float] = None):
+        self.interval = 1.0 / qps if qps else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class BatchJobManager:
+    """
+    JSONL(GeminiTestQueryRequest 형식의 행) 배치 평가 작업을 실행/관리합니다.
+
+    작업별 디렉토리 구조 (base_dir/{job_id}/):
+      - input.jsonl   : 업로드된 원본 행
+      - results.jsonl : 행별 결과 (index, 응답, 토큰, 비용, 지연시간 또는 error). 완료되는 즉시 추가 기록
+      - state.json    : 상태/진행률 체크포인트
+      - lock          : 소유권 잠금. 작업을 실행하는 워커가 끝날 때까지 flock을 쥠
+
+    results.jsonl에 기록된 index는 완료된 것으로 보고, 재시작(resume) 시 나머지 행만 다시 실행합니다.
+    멀티 워커에서는 잠금을 얻은 한 워커만 작업을 실행/재개하고 상태와 결과를 기록합니다.
+    다른 워커로 들어온 취소 요청은 shared_state(BATCH_CANCEL_CHANNEL)로 소유 워커에 전달합니다.
+    파일 읽기/쓰기는 스레드 풀에서 수행하여 이벤트 루프(대화형 요청)를 막지 않습니다.
+    """
+
+    def __init__(
+        self,
+        base_dir: str,
+        role_cache=None,
+        rate_limiter=None,
+        preflight=None,
+        shared_state=None,
+        default_concurrency: int = 8,
+        default_qps: Optional[float] = None,
+        checkpoint_interval: float = 1.0,
+    ):
+        self.base_dir = base_dir
+        self.checkpoint_interval = checkpoint_interval
+        self.role_cache = role_cache
+        self.rate_limiter = rate_limiter
+        ## 행별 입력 토큰/최대 비용 추정과 한도 검사 (대화형 요청과 같은 기준, utils.preflight)
+        self.preflight = preflight
+        self.shared_state = shared_state
+        self.default_concurrency = default_concurrency
+        self.default_qps = default_qps
+        self._tasks: Dict[str, asyncio.Task] = {}
+        ## 실행 중인 작업의 최신 상태 (state.json은 checkpoint_interval 마다만 기록)
+        self._live: Dict[str, dict] = {}
+        ## 이 워커가 소유한 작업의 잠금 fd, 취소 요청을 받은 작업
+        self._locks: Dict[str, int] = {}
+        self._cancel_requested: Set[str] = set()
+        os.makedirs(base_dir, exist_ok=True)
+
+    ## --- 파일 헬퍼 ---
+
+    def _path(self, job_id: str, name: str) -> str:
+        if not is_valid_job_id(job_id):
+            raise ValueError(f"잘못된 job_id: {job_id!r}")
+        return os.path.join(self.base_dir, job_id, name)
+
+    def _read_state(self, job_id: str) -> Optional[dict]:
+        try:
+            with open(self._path(job_id, "state.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_state(self, job_id: str, state: dict):
+        tmp_path = self._path(job_id, "state.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(job_id, "state.json"))
+
+    async def _save_state(self, job_id: str, state: dict):
+        ## 스레드에서 직렬화하는 동안 작업자가 state를 바꿔도 되도록 복사본을 기록
+        state["updated_at"] = time.time()
+        await run_in_threadpool(self._write_state, job_id, dict(state))
+
+    def _load_rows(self, job_id: str) -> List[GeminiTestQueryRequest]:
+        with open(self._path(job_id, "input.jsonl"), "r", encoding="utf-8") as f:
+            return [GeminiTestQueryRequest(**json.loads(line)) for line in f if line.strip()]
+
+    def _scan_results(self, job_id: str):
+        """
+        results.jsonl을 읽어 (완료된 index 집합, 성공 수, 실패 수)를 반환합니다.
+        비정상 종료로 잘린 마지막 줄은 잘라내어 이후 기록이 깨지지 않도록 합니다. (해당 행은 다시 실행)
+        """
+        done, completed, failed = set(), 0, 0
+        path = self.results_path(job_id)
+        if not os.path.exists(path):
+            return done, completed, failed
+
+        valid_size = 0
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                    index = result["index"]
+                except (ValueError, KeyError):
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                valid_size += len(line)
+                done.add(index)
+                if "error" in result:
+                    failed += 1
+                else:
+                    completed += 1
+
+        if valid_size != os.path.getsize(path):
+            with open(path, "r+b") as f:
+                f.truncate(valid_size)
+        return done, completed, failed
+
+    ## --- 공개 API ---
+
+    async def create_job(self, jsonl_text: str, concurrency: Optional[int] = None, qps: Optional[float] = None) -> dict:
+        """
+        JSONL 텍스트를 검증/저장하고 작업을 시작합니다. 형식 오류가 있으면 ValueError.
+        """
+        job_id, lock_fd = await run_in_threadpool(self._create_job_files, jsonl_text, concurrency, qps)
+        self._start(job_id, lock_fd)
+        return await self.get_status(job_id)
+
+    def _create_job_files(self, jsonl_text: str, concurrency: Optional[int], qps: Optional[float]):
+        ## 검증 + input.jsonl/state.json 기록 (스레드 풀에서 실행)
+        rows = []
+        for line_no, line in enumerate(jsonl_text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(GeminiTestQueryRequest(**json.loads(line)))
+            except (ValueError, TypeError, ValidationError) as e:
+                raise ValueError(f"{line_no}번째 줄 형식 오류: {e}")
+        if not rows:
+            raise ValueError("실행할 행이 없습니다.")
+
+        job_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.base_dir, job_id))
+        with open(self._path(job_id, "input.jsonl"), "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(row.model_dump_json() + "\n")
+
+        state = {
+            "job_id": job_id,
+            "status": "queued",
+            "total": len(rows),
+            "completed": 0,
+            "failed": 0,
+            "concurrency": concurrency or self.default_concurrency,
+            "qps": qps if qps is not None else self.default_qps,
+            "created_at": time.time(),
+            "updated_at": time.time(),
+            "error": None,
+        }
+        self._write_state(job_id, state)
+        ## 새 작업이므로 경합 없이 바로 소유
+        return job_id, _try_lock(self._path(job_id, "lock"))
+
+    def _acquire_job(self, job_id: str) -> Optional[int]:
+        """
+        작업 소유권 잠금을 시도합니다. 다른 워커가 실행 중이거나 더 실행할 필요가 없으면(완료/취소) None.
+        """
+        fd = _try_lock(self._path(job_id, "lock"))
+        if fd is None:
+            return None
+        ## 잠금을 얻은 뒤 다시 확인 (그 사이 이전 소유 워커가 작업을 끝냈을 수 있음)
+        state = self._read_state(job_id)
+        if state is None or state["status"] not in ("queued", "running"):
+            os.close(fd)
+            return None
+        return fd
+
+    def _claim_incomplete(self, running: Set[str]):
+        ## queued/running 상태로 남은 작업 중 소유권을 얻은 것 (스레드 풀에서 실행)
+        claimed = []
+        for job_id in sorted(os.listdir(self.base_dir)):
+            if not is_valid_job_id(job_id) or job_id in running:
+                continue
+            state = self._read_state(job_id)
+            if not state or state["status"] not in ("queued", "running"):
+                continue
+            fd = self._acquire_job(job_id)
+            if fd is not None:
+                claimed.append((job_id, fd))
+        return claimed
+
+    async def resume_incomplete(self) -> List[str]:
+        """
+        서버 재시작 시 queued/running 상태로 남아 있는 작업을 이어서 실행합니다.
+        다른 워커가 이미 실행 중인(잠금을 쥔) 작업은 건너뜁니다.
+        """
+        claimed = await run_in_threadpool(self._claim_incomplete, set(self._tasks))
+        for job_id, fd in claimed:
+            self._start(job_id, fd)
+        resumed = [job_id for job_id, _ in claimed]
+        if resumed:
+            logger.info("배치 작업 재개: %s", resumed)
+        return resumed
+
+    @staticmethod
+    def _with_progress(state: dict) -> dict:
+        done = state["completed"] + state["failed"]
+        state["progress"] = round(done / state["total"], 4) if state["total"] else 1.0
+        elapsed = state["updated_at"] - state.get("started_at", state["created_at"])
+        state["throughput_rps"] = round(done / elapsed, 4) if elapsed > 0 else 0.0
+        return state
+
+    async def get_status(self, job_id: str) -> Optional[dict]:
+        """
+        작업 상태와 진행률. 이 워커가 실행 중인 작업은 메모리의 최신 상태, 나머지는 state.json (스레드 풀에서 읽음).
+        """
+        if not is_valid_job_id(job_id):
+            return None
+        live = self._live.get(job_id)
+        state = dict(live, updated_at=time.time()) if live else await run_in_threadpool(self._read_state, job_id)
+        if state is None:
+            return None
+        return self._with_progress(state)
+
+    def _read_states(self, skip: Set[str]) -> List[dict]:
+        states = []
+        for job_id in sorted(os.listdir(self.base_dir)):
+            if is_valid_job_id(job_id) and job_id not in skip:
+                state = self._read_state(job_id)
+                if state is not None:
+                    states.append(state)
+        return states
+
+    async def list_jobs(self) -> List[dict]:
+        live = {job_id: dict(state, updated_at=time.time()) for job_id, state in self._live.items()}
+        states = await run_in_threadpool(self._read_states, set(live))
+        states.extend(live.values())
+        states.sort(key=lambda state: state["job_id"])
+        return [self._with_progress(state) for state in states]
+
+    def results_path(self, job_id: str) -> str:
+        return self._path(job_id, "results.jsonl")
+
+    def _cancel_local(self, job_id: Optional[str]) -> bool:
+        ## 이 워커가 실행 중인 작업이면 태스크를 취소 (태스크가 종료되면서 cancelled 상태를 기록)
+        task = self._tasks.get(job_id)
+        if task is None:
+            return False
+        self._cancel_requested.add(job_id)
+        live = self._live.get(job_id)
+        if live is not None:
+            live["status"] = "cancelled"
+        task.cancel()
+        return True
+
+    def _cancel_unowned(self, job_id: str) -> Optional[bool]:
+        """
+        실행 중인 워커가 없는 작업을 디스크에서 cancelled로 바꿉니다. (스레드 풀에서 실행)
+        작업이 없으면 None, 다른 워커가 소유(실행 중)하고 있으면 False.
+        """
+        if self._read_state(job_id) is None:
+            return None
+        fd = _try_lock(self._path(job_id, "lock"))
+        if fd is None:
+            return False
+        try:
+            self._mark_cancelled(job_id)
+        finally:
+            os.close(fd)
+        return True
+
+    def _mark_cancelled(self, job_id: str):
+        state = self._read_state(job_id)
+        if state["status"] in ("queued", "running"):
+            state["status"] = "cancelled"
+            state["updated_at"] = time.time()
+            self._write_state(job_id, state)
+
+    async def cancel(self, job_id: str) -> bool:
+        """
+        작업을 취소합니다. 작업이 없으면 False.
+        다른 워커가 실행 중이면 shared_state로 소유 워커에 전달하며, shared_state가 없으면 RuntimeError.
+        """
+        if not is_valid_job_id(job_id):
+            return False
+        if self._cancel_local(job_id):
+            return True
+
+        result = await run_in_threadpool(self._cancel_unowned, job_id)
+        if result is not None and not result:
+            if self.shared_state is None:
+                raise RuntimeError("다른 워커에서 실행 중인 작업입니다. 워커 간 취소에는 SHARED_STATE_BACKEND가 필요합니다.")
+            await self.shared_state.publish(BATCH_CANCEL_CHANNEL, {"job_id": job_id})
+        return result is not None
+
+    async def listen_for_cancels(self):
+        """
+        다른 워커로 들어온 취소 요청을 받아 이 워커가 실행 중인 작업에 적용하는 루프. (shared_state가 있을 때만)
+        """
+        await self.shared_state.listen(BATCH_CANCEL_CHANNEL, lambda msg: self._cancel_local(msg.get("job_id")))
+
+    async def shutdown(self):
+        """
+        실행 중인 작업 태스크를 중단합니다. 상태는 running으로 남겨 두어 다음 시작 시 재개됩니다.
+        """
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+    ## --- 실행 ---
+
+    def _start(self, job_id: str, lock_fd: int):
+        ## lock_fd: 소유권 잠금. 태스크가 끝나면 닫아서 다른 워커가 재개할 수 있게 함
+        task = asyncio.create_task(self._run_job(job_id))
+        self._tasks[job_id] = task
+        self._locks[job_id] = lock_fd
+        def _cleanup(_):
+            self._tasks.pop(job_id, None)
+            self._live.pop(job_id, None)
+            self._cancel_requested.discard(job_id)
+            os.close(self._locks.pop(job_id))
+        task.add_done_callback(_cleanup)
+
+    async def _run_row(self, index: int, row: GeminiTestQueryRequest) -> dict:
+        role_text = None
+        if row.role_id is not None:
+            if self.role_cache is None:
+                raise RuntimeError("DB not initialized")
+            role_text = await self.role_cache.get_role_text(row.role_id)
+
+        role_content = role_text.rstrip() if role_text else ""
+        combined_query = TEST_SYSTEM_PROMPT.format(role=role_content, query=(row.query or "").strip())
+
+        ## 호출 전 입력 토큰/최대 비용 추정. 한도를 넘는 행은 호출하지 않고 실패로 기록 (PreflightRejected)
+        estimate = None
+        if self.preflight is not None:
+            estimate = await self.preflight.estimate(
+                row.model_name, (row.query or "").strip(), row.max_output_tokens, row.role_id, role_text
+            )
+            self.preflight.check(estimate)
+        input_tokens_estimate = estimate["input_tokens"] if estimate is not None else estimate_tokens(combined_query)
+
+        model, generation_config = get_model(
+            row.model_name, row.max_output_tokens, row.top_k, row.top_p, row.temperature
+        )
+        call = lambda: generate_async(model, generation_config, query=combined_query, stream=False)
+        if self.rate_limiter is not None:
+            ## 대화형 요청과 같은 모델별 한도를 공유 (429 시 동시성 축소 후 재시도)
+            (response, start_time), _ = await self.rate_limiter.run(row.model_name, input_tokens_estimate, call)
+        else:
+            response, start_time = await call()
+        latency_s = time.perf_counter() - start_time
+
+        input_tokens = response.usage_metadata.prompt_token_count
+        output_tokens = response.usage_metadata.candidates_token_count
+        cached_tokens = getattr(response.usage_metadata, "cached_content_token_count", 0) or 0
+        if self.rate_limiter is not None:
+            await self.rate_limiter.charge(row.model_name, output_tokens)
+        cost = calculate_cost(row.model_name, input_tokens, output_tokens, cached_tokens)
+        metrics.record_usage(row.model_name, input_tokens, output_tokens, cost, cached_tokens)
+        result = {
+            "index": index,
+            "model_name": row.model_name,
+            "role_id": row.role_id,
+            "response_text": response.text,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost": cost,
+            "latency": round(latency_s, 4),
+        }
+        if estimate is not None:
+            result["estimated_input_tokens"] = estimate["input_tokens"]
+            result["estimated_max_cost"] = estimate["max_cost"]
+        return result
+
+    async def _write_results(self, job_id: str, results_file, results: asyncio.Queue, state: dict):
+        """
+        작업자들이 넣은 결과를 모아 스레드 풀에서 results.jsonl에 추가하고, checkpoint_interval 마다 state.json을 기록합니다.
+        None을 받으면 남은 결과를 모두 기록하고 종료합니다.
+        """
+        last_checkpoint = time.monotonic()
+        while True:
+            batch = [await results.get()]
+            while not results.empty():
+                batch.append(results.get_nowait())
+            lines = [json.dumps(result, ensure_ascii=False) + "\n" for result in batch if result is not None]
+            if lines:
+                await run_in_threadpool(_append_lines, results_file, lines)
+            if None in batch:
+                return
+            if time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                last_checkpoint = time.monotonic()
+                await self._save_state(job_id, state)
+
+    def _prepare_job(self, job_id: str):
+        ## 상태/입력 행/이미 기록된 결과 읽기 (스레드 풀에서 실행)
+        state = self._read_state(job_id)
+        rows = self._load_rows(job_id)
+        ## 재시작 시 카운터를 결과 파일 기준으로 다시 맞춤
+        done, state["completed"], state["failed"] = self._scan_results(job_id)
+        results_file = open(self.results_path(job_id), "a", encoding="utf-8")
+        return state, rows, done, results_file
+
+    async def _run_job(self, job_id: str):
+        try:
+            await self._execute_job(job_id)
+        except asyncio.CancelledError:
+            ## 취소 요청이면 cancelled로 기록 (종료(shutdown)로 인한 취소는 running으로 남겨 다음 시작 시 재개)
+            if job_id in self._cancel_requested:
+                await run_in_threadpool(self._mark_cancelled, job_id)
+            raise
+
+    async def _execute_job(self, job_id: str):
+        state, rows, done, results_file = await run_in_threadpool(self._prepare_job, job_id)
+
+        try:
+            state["status"] = "running"
+            state.setdefault("started_at", time.time())
+            await self._save_state(job_id, state)
+            self._live[job_id] = state
+
+            pending: asyncio.Queue = asyncio.Queue()
+            for index in range(len(rows)):
+                if index not in done:
+                    pending.put_nowait(index)
+
+            limiter = RateLimiter(state["qps"])
+            results: asyncio.Queue = asyncio.Queue()
+            writer = asyncio.ensure_future(self._write_results(job_id, results_file, results, state))
+
+            async def _worker():
+                while True:
+                    try:
+                        index = pending.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    await limiter.wait()
+                    try:
+                        result = await self._run_row(index, rows[index])
+                        state["completed"] += 1
+                    except Exception as e:
+                        result = {"index": index, "error": f"{type(e).__name__}: {e}"}
+                        state["failed"] += 1
+                    ## 결과를 바로 writer에 넘김 -> 비정상 종료 시에도 기록된 행까지는 체크포인트로 남음
+                    results.put_nowait(result)
+
+            try:
+                await asyncio.gather(*[_worker() for _ in range(max(1, state["concurrency"]))])
+            except asyncio.CancelledError:
+                ## 취소/종료 시점까지의 결과와 진행률을 체크포인트로 남김
+                results.put_nowait(None)
+                await writer
+                await self._save_state(job_id, state)
+                raise
+            except Exception as e:
+                results.put_nowait(None)
+                await writer
+                state["status"] = "failed"
+                state["error"] = str(e)
+                await self._save_state(job_id, state)
+                return
+            results.put_nowait(None)
+            await writer
+        finally:
+            await run_in_threadpool(results_file.close)
+
+        state["status"] = "completed"
+        await self._save_state(job_id, state)
+        logger.info("배치 작업 완료: %s (%d 성공 / %d 실패)", job_id, state["completed"], state["failed"])
@@ -0,0 +1,104 @@
+"""
+스트리밍 요청 취소 (클라이언트 연결 종료, /cancel/{request_id}).
+
+- CancelToken: 요청 1건의 취소 신호. stream_generator가 청크를 기다리는 동안 함께 기다리다가
+  취소되면 업스트림 스트림을 끊고(ResponsePump.cancel) 워커 스레드와 rate limit 슬롯을 바로 반납합니다.
+- CancelRegistry: request_id(X-Request-ID) -> 진행 중인 스트림의 CancelToken.
+  멀티 워커에서는 /cancel 요청이 다른 워커로 갈 수 있으므로 shared_state(CANCEL_CHANNEL)로 전파합니다.
+- watch_cancellation: 스트리밍 응답 본문을 감싸 Request.is_disconnected()를 주기적으로 확인합니다.
+  (ASGI spec 2.4 서버처럼 연결 종료가 다음 전송 시점에야 드러나는 경우에도, 첫 토큰을 기다리는 동안 끊긴 연결을 감지)
+"""
+import asyncio
+from typing import Any, Dict, Optional
+
+from utils.log import get_logger
+
+logger = get_logger("cancellation")
+
+CANCEL_CHANNEL = "stream:cancel"
+
+class CancelToken:
+    def __init__(self, request_id: Optional[str] = None):
+        self.request_id = request_id
+        self.reason: Optional[str] = None
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.future.done()
+
+    def cancel(self, reason: str) -> bool:
+        """
+        처음 취소할 때만 True. reason: "disconnect" (클라이언트 연결 종료) 또는 "explicit" (/cancel 호출).
+        """
+        if self.future.done():
+            return False
+        self.reason = reason
+        self.future.set_result(reason)
+        return True
+
+class CancelRegistry:
+    """
+    진행 중인 스트림의 취소 토큰 목록 (워커별).
+    """
+    def __init__(self):
+        self._tokens: Dict[str, CancelToken] = {}
+
+        self.requested = 0
+        self.cancelled = 0
+        self.not_found = 0
+
+    def register(self, request_id: Optional[str]) -> CancelToken:
+        token = CancelToken(request_id)
+        if request_id:
+            self._tokens[request_id] = token
+        return token
+
+    def unregister(self, token: CancelToken):
+        if token.request_id and self._tokens.get(token.request_id) is token:
+            del self._tokens[token.request_id]
+
+    def cancel(self, request_id: str, reason: str = "explicit", record: bool = True) -> bool:
+        """
+        이 워커에서 진행 중인 스트림이면 취소하고 True.
+        record=False면 요청/미발견 횟수에 세지 않습니다 (다른 워커에서 전파된 취소).
+        """
+        if record:
+            self.requested += 1
+        token = self._tokens.get(request_id)
+        if token is None:
+            if record:
+                self.not_found += 1
+            return False
+        if token.cancel(reason):
+            self.cancelled += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": len(self._tokens),
+            "requested": self.requested,
+            "cancelled": self.cancelled,
+            "not_found": self.not_found,
+        }
+
+async def _watch_disconnect(request, token: CancelToken, interval: float):
+    while not token.cancelled:
+        if await request.is_disconnected():
+            token.cancel("disconnect")
+            return
+        await asyncio.sleep(interval)
+
+async def watch_cancellation(agen, token: CancelToken, registry: Optional[CancelRegistry] = None, request=None, interval: float = 0.5):
+    """
+    스트리밍 응답 본문을 감싸, 전송하는 동안 클라이언트 연결 종료를 감시하고 끝나면 토큰 등록을 해제합니다.
+    """
+    watcher = asyncio.ensure_future(_watch_disconnect(request, token, interval)) if request is not None else None
+    try:
+        async for item in agen:
+            yield item
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if registry is not None:
+            registry.unregister(token)
@@ -0,0 +1,122 @@
+"""
+응답 압축 미들웨어 (brotli 우선, 없으면 gzip).
+
+starlette 내부 구현(GZipResponder 등)에 의존하지 않는 자체 ASGI 구현으로,
+- Accept-Encoding에 br이 있고 brotli 패키지가 설치되어 있으면 brotli로 압축합니다.
+- minimum_size보다 작은 단일 본문 응답은 압축하지 않습니다.
+- 여러 번에 나뉘어 오는 본문(StreamingResponse)은 청크마다 flush하여 그대로 흘려보냅니다.
+- text/event-stream(SSE 스트리밍 응답)과 이미 Content-Encoding이 있는 응답은 http.response.start를
+  붙잡아 두지 않고 바로 그대로 전달합니다. (첫 청크 전송 지연 없음)
+"""
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+EXCLUDED_CONTENT_TYPES = ("text/event-stream",)
+
+class _GZipCompressor:
+    content_encoding = "gzip"
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        data = self._compressor.compress(body)
+        return data + self._compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+class _BrotliCompressor:
+    content_encoding = "br"
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        data = self._compressor.process(body)
+        return data + (self._compressor.flush() if more_body else self._compressor.finish())
+
+class _CompressionResponder:
+    """
+    요청 1개의 응답을 압축합니다. http.response.start는 첫 본문을 보고 압축 여부를 정할 때까지 붙잡아 둡니다.
+    """
+    def __init__(self, app: ASGIApp, compressor, minimum_size: int) -> None:
+        self.app = app
+        self.compressor = compressor
+        self.minimum_size = minimum_size
+        self.send: Optional[Send] = None
+        self.start_message: Optional[Message] = None
+        ## None: 아직 모름, True: 그대로 전달, False: 압축
+        self.passthrough: Optional[bool] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    async def send_with_compression(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if headers.get("content-type", "").startswith(EXCLUDED_CONTENT_TYPES) or "content-encoding" in headers:
+                self.passthrough = True
+                await self.send(message)
+                return
+            self.start_message = message
+            return
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.passthrough is None:
+            if not more_body and len(body) < self.minimum_size:
+                ## 작은 단일 본문: 압축하지 않음
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+            self.passthrough = False
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Encoding"] = self.compressor.content_encoding
+            headers.add_vary_header("Accept-Encoding")
+            compressed = self.compressor.compress(body, more_body)
+            if more_body:
+                ## 스트리밍 본문은 전체 길이를 미리 알 수 없음
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(compressed))
+            await self.send(self.start_message)
+            await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            return
+
+        await self.send(
+            {"type": "http.response.body", "body": self.compressor.compress(body, more_body), "more_body": more_body}
+        )
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, gzip_level: int = 6, brotli_quality: int = 4) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("Accept-Encoding", "")
+        if brotli is not None and "br" in accept_encoding:
+            compressor = _BrotliCompressor(self.brotli_quality)
+        elif "gzip" in accept_encoding:
+            compressor = _GZipCompressor(self.gzip_level)
+        else:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self.app, compressor, self.minimum_size)(scope, receive, send)
@@ -1,13 +1,16 @@
 from config.base import settings
 
-def calculate_cost(model_name: str, input_tokens: int, output_tokens: int) -> float:
+def calculate_cost(model_name: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> float:
     
     pricing = settings.MODEL_PRICING.get(model_name)
     # pricing = MODEL_PRICING.get(model_name.replace('models/', ''), MODEL_PRICING.get("gemini-2.5-flash")) 
     if not pricing:
         return 0.0
     
-    input_cost = (input_tokens / 1_000_000) * pricing["input"]
+    ## input_tokens 중 컨텍스트 캐시에서 읽은 토큰은 cached_input 단가 (없으면 input 단가)
+    cached_tokens = min(cached_tokens or 0, input_tokens)
+    input_cost = ((input_tokens - cached_tokens) / 1_000_000) * pricing["input"]
+    cached_cost = (cached_tokens / 1_000_000) * pricing.get("cached_input", pricing["input"])
     output_cost = (output_tokens / 1_000_000) * pricing["output"]
     
-    return input_cost + output_cost
\ No newline at end of file
+    return input_cost + cached_cost + output_cost
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""
+비스트리밍 Gemini 호출의 꼬리 지연(tail latency)을 줄이기 위한 hedged request.
+
+첫 호출이 모델별 최근 지연의 p95(HEDGE_QUANTILE) 안에 끝나지 않으면 같은 요청을 한 번 더 보내고,
+먼저 끝난 응답을 사용합니다. hedge 비율은 모델별 예산(budget)으로 제한합니다.
+
+주의: Gemini SDK 호출은 블로킹이라 진 쪽을 취소해도 executor 스레드는 호출이 끝날 때까지 돌고,
+업스트림 요청도 끝까지 처리되어 과금됩니다. hedge 1회마다 그 요청의 executor 스레드 점유와 quota/비용이 2배가 됩니다.
+on_loser를 넘기면 진 쪽을 취소하지 않고 끝까지 기다려 실제 결과(사용량)를 전달합니다.
+"""
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from utils.timing import percentile
+from utils.log import get_logger
+
+logger = get_logger("hedge")
+
+def _discard_result(task: asyncio.Future):
+    ## 버려진 시도의 예외가 "never retrieved" 경고로 남지 않도록 소비
+    if not task.cancelled():
+        task.exception()
+
+class LatencyTracker:
+    """
+    모델 1개의 최근 window 개 호출 지연(초).
+    """
+    def __init__(self, window: int):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, latency: float):
+        self.samples.append(latency)
+
+    def quantile(self, q: float) -> float:
+        return percentile(self.samples, q)
+
+class Hedger:
+    """
+    모델별 적응형 지연 + hedge 비율 상한.
+
+    hedge 예산(모델별): 요청마다 max_ratio 만큼 적립되고 hedge 1회에 1을 사용합니다.
+    (적립 상한 burst) 따라서 모델마다 장기적으로 hedge 수 <= max_ratio * 요청 수.
+    한 모델이 느려져도 다른 모델 요청으로 쌓인 예산을 쓰지 못하므로 그 모델의 추가 호출이 max_ratio를 넘지 않습니다.
+    """
+    def __init__(
+        self,
+        quantile: float = 95.0,
+        window: int = 200,
+        min_samples: int = 20,
+        default_delay: float = 2.0,
+        min_delay: float = 0.05,
+        max_ratio: float = 0.1,
+        burst: float = 5.0,
+    ):
+        self.q = quantile
+        self.window = window
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_ratio = max_ratio
+        self.burst = burst
+
+        self._trackers: Dict[str, LatencyTracker] = {}
+        ## 모델 이름 -> 적립된 hedge 예산
+        self._budgets: Dict[str, float] = {}
+
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.budget_skips = 0
+        self.loser_completed = 0
+
+    def _tracker(self, model_name: str) -> LatencyTracker:
+        tracker = self._trackers.get(model_name)
+        if tracker is None:
+            tracker = self._trackers[model_name] = LatencyTracker(self.window)
+        return tracker
+
+    def delay(self, model_name: str) -> float:
+        """
+        hedge를 보내기 전까지 기다릴 시간(초).
+        """
+        tracker = self._tracker(model_name)
+        if len(tracker.samples) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, tracker.quantile(self.q))
+
+    async def _timed(self, model_name: str, call: Callable[[], Awaitable[Any]]):
+        ## 성공한 시도와 취소된 시도(hedge에 진 쪽)의 경과 시간을 기록합니다.
+        ## 취소된 시도의 값은 실제 지연의 하한이지만, 빼 버리면 느린 호출이 표본에서 빠져 p95가 낮게 추정됩니다.
+        ## (on_loser를 쓰면 진 쪽도 끝까지 실행되므로 실제 지연이 기록됨)
+        start = time.perf_counter()
+        observe = True
+        try:
+            return await call()
+        except asyncio.CancelledError:
+            raise
+        except BaseException:
+            ## 빠르게 실패한 호출(429 등)은 지연 표본에서 제외
+            observe = False
+            raise
+        finally:
+            if observe:
+                self._tracker(model_name).observe(time.perf_counter() - start)
+
+    async def run(
+        self,
+        model_name: str,
+        call: Callable[[], Awaitable[Any]],
+        on_loser: Optional[Callable[[Any], None]] = None,
+    ) -> Tuple[Any, Dict[str, Any]]:
+        """
+        call()을 실행하고, delay 안에 끝나지 않으면 call()을 한 번 더 실행해 먼저 끝난 결과를 반환합니다.
+        반환: (결과, {"hedged": bool, "winner": "primary" | "hedge", "hedge_delay": 초})
+        on_loser: 지정하면 진 쪽을 취소하지 않고, 성공적으로 끝났을 때 그 결과로 호출합니다. (실제 사용량/비용 집계용)
+        """
+        self.requests += 1
+        self._budgets[model_name] = min(self.burst, self._budgets.get(model_name, 0.0) + self.max_ratio)
+        delay = self.delay(model_name)
+        info = {"hedged": False, "winner": "primary", "hedge_delay": round(delay, 4)}
+
+        primary = asyncio.ensure_future(self._timed(model_name, call))
+        tasks = {primary}
+        winner = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result(), info
+
+            if self._budgets[model_name] < 1.0:
+                self.budget_skips += 1
+                return await primary, info
+
+            self._budgets[model_name] -= 1.0
+            self.hedges += 1
+            info["hedged"] = True
+            hedge = asyncio.ensure_future(self._timed(model_name, call))
+            tasks.add(hedge)
+
+            pending = tasks
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [t for t in (primary, hedge) if t in done and t.exception() is None]
+                ## 먼저 끝난 쪽이 실패하면 남은 쪽 결과를 기다림
+                if succeeded or not pending:
+                    winner = succeeded[0] if succeeded else hedge
+                    break
+        finally:
+            for task in tasks:
+                if not task.done():
+                    if winner is not None and on_loser is not None:
+                        ## 진 쪽은 끝까지 실행해 실제 결과를 on_loser로 전달
+                        task.add_done_callback(lambda t: self._loser_done(t, on_loser))
+                        continue
+                    ## 진 쪽 취소 (이미 블로킹 SDK 호출 중인 스레드는 끝날 때까지 돌지만 결과는 버림)
+                    task.cancel()
+                task.add_done_callback(_discard_result)
+
+        if winner is hedge:
+            self.hedge_wins += 1
+            info["winner"] = "hedge"
+        return winner.result(), info
+
+    def _loser_done(self, task: asyncio.Future, on_loser: Callable[[Any], None]):
+        if task.cancelled() or task.exception() is not None:
+            return
+        self.loser_completed += 1
+        try:
+            on_loser(task.result())
+        except Exception as e:
+            logger.warning("hedge에 진 호출의 결과 처리 실패: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_ratio": round(self.hedges / self.requests, 4) if self.requests else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "budget_skips": self.budget_skips,
+            "loser_completed": self.loser_completed,
+            "delay": {name: round(self.delay(name), 4) for name in self._trackers},
+            "budget": {name: round(budget, 4) for name, budget in self._budgets.items()},
+        }
+
+def make_hedger_from_settings(settings) -> Hedger:
+    return Hedger(
+        quantile=settings.HEDGE_QUANTILE,
+        window=settings.HEDGE_WINDOW,
+        min_samples=settings.HEDGE_MIN_SAMPLES,
+        default_delay=settings.HEDGE_DEFAULT_DELAY,
+        min_delay=settings.HEDGE_MIN_DELAY,
+        max_ratio=settings.HEDGE_MAX_RATIO,
+    )
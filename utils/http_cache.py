@@ -0,0 +1,124 @@
+"""
+HTTP 캐싱: JSON 응답의 ETag/304, 정적 파일의 fingerprint URL + immutable Cache-Control.
+
+- JsonPayload: 같은 객체(예: RolePromptCache가 돌려준 목록)는 JSON 직렬화와 ETag 계산을 한 번만 합니다.
+  내용이 바뀌면(캐시 무효화 후 새 목록) ETag도 바뀝니다.
+- etag_response: If-None-Match가 현재 ETag와 같으면 본문 없이 304.
+- StaticAssets / FingerprintedStaticFiles: 템플릿에서 static_url("js/script.js")는
+  "/static/js/script.js?v=<내용 해시>"를 돌려주고, v가 현재 해시와 같은 요청은 1년 immutable로 캐시됩니다.
+"""
+import os
+import json
+import hashlib
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.staticfiles import StaticFiles
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+## 브라우저가 캐시해 두되 사용할 때마다 ETag로 재검증
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+def make_etag(body: bytes) -> str:
+    ## 압축(gzip/br) 여부와 관계없이 같은 내용이면 같은 값이므로 weak ETag
+    return f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def etag_response(request: Request, body: bytes, etag: str, cache_control: str = REVALIDATE_CACHE_CONTROL) -> Response:
+    """
+    JSON 본문 응답. If-None-Match가 etag와 같으면 304 (본문 없음).
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+class JsonPayload:
+    """
+    마지막으로 직렬화한 객체의 (JSON 바이트, ETag)를 보관합니다. 같은 객체면 다시 계산하지 않습니다.
+    """
+    def __init__(self):
+        self._last: Tuple[Any, bytes, str] = (None, b"", "")
+        self._lock = threading.Lock()
+
+    def get(self, obj) -> Tuple[bytes, str]:
+        last = self._last
+        if last[0] is obj and obj is not None:
+            return last[1], last[2]
+        body = json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+        etag = make_etag(body)
+        with self._lock:
+            self._last = (obj, body, etag)
+        return body, etag
+
+class StaticAssets:
+    """
+    정적 파일 내용 해시(fingerprint). 파일의 (mtime, size)가 바뀔 때만 다시 계산합니다.
+    """
+    def __init__(self, directory: str, url_prefix: str = "/static"):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        ## 상대 경로 -> ((mtime_ns, size), 해시)
+        self._hashes: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        self._lock = threading.Lock()
+
+    def fingerprint(self, path: str) -> Optional[str]:
+        full_path = os.path.join(self.directory, path)
+        try:
+            st = os.stat(full_path)
+        except OSError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._hashes.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with open(full_path, "rb") as f:
+            digest = hashlib.md5(f.read()).hexdigest()[:12]
+        with self._lock:
+            self._hashes[path] = (stamp, digest)
+        return digest
+
+    def url(self, path: str) -> str:
+        """
+        템플릿용 fingerprint URL. 파일이 없으면 fingerprint 없이 원래 경로를 돌려줍니다.
+        """
+        path = path.lstrip("/")
+        digest = self.fingerprint(path)
+        base = f"{self.url_prefix}/{path}"
+        return f"{base}?v={digest}" if digest else base
+
+class FingerprintedStaticFiles(StaticFiles):
+    """
+    ?v=<현재 내용 해시> 로 요청된 정적 파일은 immutable로 장기 캐시하고,
+    그 밖의 요청은 ETag/Last-Modified 재검증(no-cache)으로 응답합니다.
+    """
+    def __init__(self, *args, assets: StaticAssets, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.assets = assets
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        version = Request(scope).query_params.get("v")
+        path = os.path.relpath(full_path, self.assets.directory)
+        if version and version == self.assets.fingerprint(path):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+        return response
+
+## 템플릿(static_url)과 /static 마운트가 함께 사용
+static_assets = StaticAssets("static")
@@ -0,0 +1,178 @@
+"""
+구조화(JSON) 로깅.
+
+요청 처리 스레드/이벤트 루프에서는 로그 레코드를 큐에 넣기만 하고(QueueHandler),
+직렬화와 stdout 쓰기는 백그라운드 스레드(QueueListener)가 담당합니다.
+큐가 가득 차면 레코드를 버리고(dropped 카운트) 요청을 막지 않습니다.
+"""
+import json
+import os
+import queue
+import random
+import logging
+import logging.handlers
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+from config.base import settings
+
+LOGGER_NAMESPACE = "llm"
+
+## 현재 요청의 ID (RequestIdMiddleware가 설정)
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+def get_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+class _RequestIdFilter(logging.Filter):
+    ## contextvar는 리스너 스레드에서 보이지 않으므로 큐에 넣기 전에 기록
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        ## logger.info(..., extra={...})로 넘긴 필드
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+_queue_handler: Optional[_DroppingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def setup_logging(level: Optional[str] = None, stream=None):
+    """
+    "llm" 네임스페이스 로거에 큐 기반 JSON 핸들러를 설정하고 백그라운드 writer를 시작합니다.
+    여러 번 호출해도 한 번만 설정됩니다.
+    """
+    global _queue_handler, _listener
+    logger = logging.getLogger(LOGGER_NAMESPACE)
+    logger.setLevel((level or settings.LOG_LEVEL).upper())
+    if _listener is not None:
+        return _listener
+
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _queue_handler = _DroppingQueueHandler(log_queue)
+    _queue_handler.addFilter(_RequestIdFilter())
+
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, writer, respect_handler_level=True)
+    _listener.start()
+
+    logger.addHandler(_queue_handler)
+    logger.propagate = False
+    return _listener
+
+def shutdown_logging():
+    """
+    큐에 남은 로그를 모두 쓰고 writer 스레드를 종료합니다.
+    """
+    global _queue_handler, _listener
+    if _listener is not None:
+        _listener.stop()
+        logging.getLogger(LOGGER_NAMESPACE).removeHandler(_queue_handler)
+        _listener = None
+        _queue_handler = None
+
+def _restart_after_fork():
+    ## gunicorn --preload: 마스터에서 시작한 writer 스레드는 fork된 워커에 없으므로 워커에서 다시 시작
+    global _queue_handler, _listener
+    if _listener is None:
+        return
+    logging.getLogger(LOGGER_NAMESPACE).removeHandler(_queue_handler)
+    _listener = None
+    _queue_handler = None
+    setup_logging()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+def dropped_count() -> int:
+    return _queue_handler.dropped if _queue_handler else 0
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{LOGGER_NAMESPACE}.{name}")
+
+def log_prompt(logger: logging.Logger, prompt: str, **fields):
+    """
+    프롬프트 본문 로깅. LOG_PROMPTS로 끄고, LOG_PROMPT_SAMPLE_RATE로 샘플링하며,
+    LOG_PROMPT_MAX_CHARS 글자를 넘으면 잘라서 기록합니다.
+    """
+    if not settings.LOG_PROMPTS or not logger.isEnabledFor(logging.INFO):
+        return
+    if settings.LOG_PROMPT_SAMPLE_RATE < 1.0 and random.random() >= settings.LOG_PROMPT_SAMPLE_RATE:
+        return
+    max_chars = settings.LOG_PROMPT_MAX_CHARS
+    truncated = len(prompt) > max_chars
+    logger.info(
+        "prompt",
+        extra={
+            "prompt": prompt[:max_chars] if truncated else prompt,
+            "prompt_chars": len(prompt),
+            "prompt_truncated": truncated,
+            **fields,
+        },
+    )
+
+class RequestIdMiddleware:
+    """
+    요청마다 request_id를 정하고(X-Request-ID 헤더가 있으면 그대로 사용) contextvar에 설정한 뒤,
+    응답 헤더 X-Request-ID로 돌려주는 ASGI 미들웨어.
+    """
+    header = b"x-request-id"
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = None
+        for key, value in scope.get("headers", []):
+            if key == self.header:
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or new_request_id()
+        token = request_id_var.set(request_id)
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(self.header, request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            request_id_var.reset(token)
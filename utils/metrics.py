@@ -0,0 +1,97 @@
+"""
+Prometheus 지표 정의와 기록 헬퍼.
+
+uvicorn/gunicorn 멀티 워커 환경에서는 PROMETHEUS_MULTIPROC_DIR 환경변수를 지정하면
+prometheus_client가 워커별 mmap 파일에 값을 기록(락 경합 없음)하고,
+/metrics 조회 시 모든 워커의 값을 합산합니다.
+"""
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+from config.base import settings
+
+## LLM 응답은 수 초 ~ 수십 초 단위이므로 기본 버킷보다 넓게 설정
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 21, 34, 60, 120)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+REQUEST_LATENCY = Histogram(
+    "llm_request_latency_seconds", "/gemini_test_query 전체 처리 시간", ["model", "stream"],
+    buckets=LATENCY_BUCKETS,
+)
+TTFT = Histogram(
+    "llm_ttft_seconds", "첫 청크까지 걸린 시간 (비스트리밍은 전체 추론 시간)", ["model", "stream"],
+    buckets=LATENCY_BUCKETS,
+)
+ROLE_LOOKUP_LATENCY = Histogram(
+    "llm_role_lookup_seconds", "role 프롬프트 조회 시간 (캐시 포함)", ["model"],
+    buckets=FAST_BUCKETS,
+)
+GET_MODEL_LATENCY = Histogram(
+    "llm_get_model_seconds", "get_model() 시간", ["model"],
+    buckets=FAST_BUCKETS,
+)
+TOKENS = Counter("llm_tokens_total", "입력/출력 토큰 수", ["model", "kind"])
+COST = Counter("llm_cost_usd_total", "calculate_cost 기준 누적 비용(USD)", ["model"])
+IN_FLIGHT = Gauge("llm_in_flight_requests", "처리 중인 요청 수", multiprocess_mode="livesum")
+ACTIVE_STREAMS = Gauge("llm_active_streams", "전송 중인 스트리밍 응답 수", multiprocess_mode="livesum")
+HEDGES = Counter("llm_hedged_requests_total", "hedge 요청 수 (winner: 먼저 끝난 쪽)", ["model", "winner"])
+HEDGE_LOSER_COST = Counter(
+    "llm_hedge_loser_cost_usd_total", "hedge에 진 호출의 실제 비용(USD, 끝난 뒤 usage_metadata 기준). llm_cost_usd_total에도 포함", ["model"]
+)
+COALESCED = Counter("llm_coalesced_requests_total", "진행 중인 동일 요청의 업스트림 호출을 공유한 요청 수", ["model", "stream"])
+CANCELLED_STREAMS = Counter(
+    "llm_cancelled_streams_total", "중간에 취소된 스트리밍 응답 수 (disconnect: 연결 종료, explicit: /cancel)", ["model", "reason"]
+)
+CANCEL_SAVED_TOKENS = Counter(
+    "llm_cancel_saved_output_tokens_total", "취소로 생성하지 않은 출력 토큰 수 추정 (max_output_tokens - 받은 토큰)", ["model"]
+)
+ERRORS = Counter("llm_errors_total", "예외 유형/HTTP 상태별 오류 수", ["type", "status"])
+
+def model_label(model_name: str) -> str:
+    ## 설정에 없는 모델 이름은 라벨 폭증을 막기 위해 하나로 묶음
+    return model_name if model_name in settings.GEMINI_MODELS else "other"
+
+def record_usage(model_name: str, input_tokens: int, output_tokens: int, cost: float, cached_tokens: int = 0):
+    label = model_label(model_name)
+    TOKENS.labels(label, "input").inc(input_tokens or 0)
+    TOKENS.labels(label, "output").inc(output_tokens or 0)
+    if cached_tokens:
+        TOKENS.labels(label, "cached_input").inc(cached_tokens)
+    COST.labels(label).inc(cost or 0.0)
+
+def record_error(exc: BaseException, status: int):
+    ERRORS.labels(type(exc).__name__, str(status)).inc()
+
+async def track_stream(agen, model_name: str, start_time: float):
+    """
+    스트리밍 응답 제너레이터를 감싸 전송 중 스트림 수와 전체 처리 시간을 기록합니다.
+    요청 처리 중(IN_FLIGHT) 카운트는 스트림이 끝날 때 감소시킵니다.
+    """
+    ACTIVE_STREAMS.inc()
+    try:
+        async for item in agen:
+            yield item
+    finally:
+        ACTIVE_STREAMS.dec()
+        IN_FLIGHT.dec()
+        REQUEST_LATENCY.labels(model_label(model_name), "true").observe(time.perf_counter() - start_time)
+
+def render_metrics() -> bytes:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
@@ -0,0 +1,186 @@
+"""
+Gemini 호출 전(pre-flight) 입력 토큰 수와 최악의 경우 비용 추정.
+
+- 입력 토큰: TEST_SYSTEM_PROMPT 틀 + role 텍스트 + query 의 토큰 수 합.
+  role 텍스트(수천 토큰일 수 있음)의 토큰 수는 (role_id, role 텍스트 버전)별로 한 번만 계산해 캐시하므로
+  요청마다 새로 세는 것은 짧은 query 뿐입니다.
+- 토큰 수는 로컬 근사(approx_tokens)로 셉니다. exact_counter를 주면 role 텍스트는
+  모델의 count_tokens로 정확히 셉니다 (role 버전당 1회 API 호출).
+- 최악의 경우 비용: 추정 입력 토큰 + max_output_tokens 를 MODEL_PRICING으로 계산합니다.
+- 한도(max_input_tokens, max_cost)를 넘는 요청은 PreflightRejected로 거절합니다.
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from utils.cost import calculate_cost
+from utils.log import get_logger
+
+logger = get_logger("preflight")
+
+_ASCII_WORD_RE = re.compile(r"[A-Za-z]+")
+_OTHER_RE = re.compile(r"[^\sA-Za-z]")
+
+def approx_tokens(text: str) -> int:
+    """
+    로컬 토큰 수 근사. 영문 단어는 4글자당 1토큰, 숫자/기호/한글 등 나머지는 글자당 1토큰.
+    (SentencePiece 계열 토크나이저보다 약간 많게 세어 한도 검사에서 안전한 쪽으로 치우침)
+    """
+    if not text:
+        return 0
+    words = sum((len(w) + 3) // 4 for w in _ASCII_WORD_RE.findall(text))
+    return words + len(_OTHER_RE.findall(text))
+
+class PreflightRejected(Exception):
+    """
+    추정 입력 토큰 수 또는 최악의 경우 비용이 한도를 넘는 요청.
+    """
+    def __init__(self, reason: str, limit: float, estimate: Dict[str, Any]):
+        value = estimate["input_tokens"] if reason == "input_tokens" else estimate["max_cost"]
+        super().__init__(f"{reason} 한도 초과: {value} > {limit}")
+        self.reason = reason
+        self.limit = limit
+        self.estimate = estimate
+
+class PreflightEstimator:
+    """
+    요청별 입력 토큰/비용 추정기.
+    """
+    def __init__(
+        self,
+        template: str,
+        max_input_tokens: Optional[int] = None,
+        max_cost: Optional[float] = None,
+        exact_counter: Optional[Callable[[str, str], Awaitable[Optional[int]]]] = None,
+        max_roles: int = 1024,
+    ):
+        """
+        Args:
+            template (str): "{role}", "{query}" 자리를 가진 프롬프트 틀 (TEST_SYSTEM_PROMPT).
+            max_input_tokens (int, optional): 추정 입력 토큰 수 상한. None이면 검사하지 않습니다.
+            max_cost (float, optional): 요청 1건의 최악의 경우 비용(USD) 상한. None이면 검사하지 않습니다.
+            exact_counter: (model_name, text) -> 정확한 토큰 수(코루틴). 실패하거나 None을 돌려주면 근사값 사용.
+            max_roles (int): role 토큰 수 캐시의 최대 항목 수 (LRU).
+        """
+        self.max_input_tokens = max_input_tokens
+        self.max_cost = max_cost
+        self.exact_counter = exact_counter
+        self.max_roles = max_roles
+        ## 틀 자체(구분선, 줄바꿈)의 토큰 수는 고정이므로 한 번만 계산
+        self.template_tokens = approx_tokens(template.format(role="", query=""))
+
+        ## (role_id, model_name 또는 None) -> (role 텍스트, 토큰 수, exact 여부)
+        self._roles: "OrderedDict[Tuple[int, Optional[str]], Tuple[str, int, bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.role_hits = 0
+        self.role_misses = 0
+        self.rejected = 0
+
+    async def role_tokens(self, model_name: str, role_id: int, role_text: str) -> Tuple[int, bool]:
+        """
+        role 텍스트의 토큰 수와 exact 여부. 같은 role_id라도 텍스트가 바뀌면(새 버전) 다시 셉니다.
+        """
+        ## 정확한 토큰 수는 모델(토크나이저)마다 다를 수 있으므로 모델별로 캐시
+        key = (role_id, model_name if self.exact_counter is not None else None)
+        with self._lock:
+            entry = self._roles.get(key)
+            ## RolePromptCache hit이면 같은 str 객체이므로 비교는 대부분 `is`로 끝남
+            if entry is not None and (entry[0] is role_text or entry[0] == role_text):
+                self._roles.move_to_end(key)
+                self.role_hits += 1
+                return entry[1], entry[2]
+            self.role_misses += 1
+
+        tokens, exact = None, False
+        if self.exact_counter is not None:
+            try:
+                tokens = await self.exact_counter(model_name, role_text)
+                exact = tokens is not None
+            except Exception as e:
+                logger.warning("role 토큰 수 계산(count_tokens) 실패, 근사값을 사용합니다: %s", e)
+        if tokens is None:
+            tokens = approx_tokens(role_text)
+
+        with self._lock:
+            self._roles[key] = (role_text, tokens, exact)
+            self._roles.move_to_end(key)
+            while len(self._roles) > self.max_roles:
+                self._roles.popitem(last=False)
+        return tokens, exact
+
+    async def estimate(
+        self,
+        model_name: str,
+        query: str,
+        max_output_tokens: int,
+        role_id: Optional[int] = None,
+        role_text: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        입력 토큰 수와 최악의 경우 비용(출력이 max_output_tokens까지 나오는 경우)을 추정합니다.
+        """
+        role_tokens, exact = 0, False
+        if role_text:
+            role_tokens, exact = await self.role_tokens(model_name, role_id, role_text)
+        query_tokens = approx_tokens(query)
+        input_tokens = self.template_tokens + role_tokens + query_tokens
+        return {
+            "input_tokens": input_tokens,
+            "role_tokens": role_tokens,
+            "query_tokens": query_tokens,
+            "role_tokens_exact": exact,
+            "max_output_tokens": max_output_tokens,
+            "max_cost": calculate_cost(model_name, input_tokens, max_output_tokens),
+        }
+
+    def check(self, estimate: Dict[str, Any], record: bool = True):
+        """
+        한도를 넘으면 PreflightRejected. record=False면 거절 횟수에 세지 않습니다 (추정 전용 조회).
+        """
+        error = None
+        if self.max_input_tokens is not None and estimate["input_tokens"] > self.max_input_tokens:
+            error = PreflightRejected("input_tokens", self.max_input_tokens, estimate)
+        elif self.max_cost is not None and estimate["max_cost"] > self.max_cost:
+            error = PreflightRejected("max_cost", self.max_cost, estimate)
+        if error is not None:
+            if record:
+                self.rejected += 1
+            raise error
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.role_hits + self.role_misses
+        return {
+            "max_input_tokens": self.max_input_tokens,
+            "max_cost": self.max_cost,
+            "exact_role_tokens": self.exact_counter is not None,
+            "template_tokens": self.template_tokens,
+            "role_entries": len(self._roles),
+            "role_hits": self.role_hits,
+            "role_misses": self.role_misses,
+            "role_hit_ratio": round(self.role_hits / total, 4) if total else 0.0,
+            "rejected": self.rejected,
+        }
+
+def make_preflight_from_settings(settings, template: str) -> Optional[PreflightEstimator]:
+    """
+    PREFLIGHT_ENABLED가 켜져 있으면 PreflightEstimator를, 아니면 None을 반환합니다.
+    PREFLIGHT_EXACT_TOKENS면 role 텍스트는 모델의 count_tokens로 셉니다.
+    """
+    if not settings.PREFLIGHT_ENABLED:
+        return None
+    exact_counter = None
+    if settings.PREFLIGHT_EXACT_TOKENS:
+        from model.gemini_utils import model_registry, count_tokens_async
+
+        async def exact_counter(model_name: str, text: str) -> Optional[int]:
+            return await count_tokens_async(model_registry.get_model(model_name), text)
+
+    return PreflightEstimator(
+        template,
+        max_input_tokens=settings.PREFLIGHT_MAX_INPUT_TOKENS,
+        max_cost=settings.PREFLIGHT_MAX_COST_USD,
+        exact_counter=exact_counter,
+        max_roles=settings.PREFLIGHT_ROLE_CACHE_SIZE,
+    )
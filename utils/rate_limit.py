@@ -0,0 +1,357 @@
+"""
+모델별 호출 한도와 적응형 동시성 제어.
+
+- TokenBucket: 분당 요청 수(rpm), 분당 토큰 수(tpm) 제한. 한도를 넘으면 짧게 대기(예약)합니다.
+- AIMDLimiter: 동시 호출 수 상한을 성공 시 조금씩(additive) 늘리고,
+  429/RESOURCE_EXHAUSTED 발생 시 크게(multiplicative) 줄여 업스트림이 허용하는 수준 근처로 수렴합니다.
+- ModelRateLimiter: 위 두 가지를 모델별로 묶고, 429 시 지수 백오프(jitter) 후 재시도까지 처리합니다.
+
+멀티 워커에서는 shared_state(utils.shared_state)를 넘기면 rpm/tpm 버킷을 모든 워커가 공유합니다.
+AIMD 동시성은 각 워커의 429 응답으로 조정되는 워커별 값으로 둡니다.
+"""
+import time
+import random
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from utils.log import get_logger
+
+logger = get_logger("rate_limit")
+
+class RateLimitExceeded(Exception):
+    """
+    대기 시간(queue timeout) 안에 호출 한도를 얻지 못한 경우.
+    """
+    def __init__(self, model_name: str, reason: str, retry_after: float):
+        super().__init__(f"{model_name}: {reason} 한도 초과 (retry after {retry_after:.1f}s)")
+        self.model_name = model_name
+        self.reason = reason
+        self.retry_after = retry_after
+
+def estimate_tokens(text: str) -> int:
+    """
+    tpm 예약용 대략적인 입력 토큰 수 (문자 4개 ≈ 1 토큰). 정확한 값은 응답의 usage_metadata로 보정합니다.
+    """
+    return max(1, len(text or "") // 4)
+
+def is_overload_error(e: BaseException) -> bool:
+    """
+    Gemini의 429 / RESOURCE_EXHAUSTED 오류인지 판별합니다.
+    (google.api_core.exceptions.ResourceExhausted / TooManyRequests 등)
+    """
+    if type(e).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    if getattr(e, "code", None) == 429:
+        return True
+    return "RESOURCE_EXHAUSTED" in str(e)
+
+def retry_after_seconds(e: BaseException) -> Optional[float]:
+    """
+    오류가 알려 주는 재시도 대기 시간(초). 없으면 None.
+    (retry_after 속성, 또는 HTTP 응답의 Retry-After 헤더)
+    """
+    value = getattr(e, "retry_after", None)
+    if value is None:
+        response = getattr(e, "response", None)
+        headers = getattr(response, "headers", None)
+        if headers is not None:
+            try:
+                value = headers.get("retry-after") or headers.get("Retry-After")
+            except Exception:
+                value = None
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """
+    초당 rate 만큼 채워지는 토큰 버킷. 토큰이 부족하면 음수(부채)로 예약하여 FIFO 순서로 대기시킵니다.
+    이벤트 루프 스레드에서만 사용하므로 락이 필요 없습니다.
+    """
+    def __init__(self, rate_per_sec: float, capacity: float):
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float, max_wait: float) -> Optional[float]:
+        """
+        amount 만큼 예약하고 기다려야 할 시간(초)을 반환합니다. max_wait을 넘으면 예약하지 않고 None.
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        wait = max(0.0, (amount - self.tokens) / self.rate)
+        if wait > max_wait:
+            return None
+        self.tokens -= amount
+        return wait
+
+    def charge(self, amount: float):
+        ## 실제 사용량이 예약보다 많을 때 추가 차감 (다음 요청들이 그만큼 대기)
+        self._refill()
+        self.tokens -= amount
+
+    def refund(self, amount: float):
+        ## 예약했지만 호출하지 않은 만큼 돌려줌
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+class AIMDLimiter:
+    """
+    Additive-Increase / Multiplicative-Decrease 동시성 제한기.
+    """
+    def __init__(
+        self,
+        initial: float = 8,
+        min_limit: float = 1,
+        max_limit: float = 64,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        backoff_cooldown: float = 1.0,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.backoff_cooldown = backoff_cooldown
+
+        self.in_flight = 0
+        self._last_backoff = 0.0
+        self._cond = asyncio.Condition()
+
+        self.successes = 0
+        self.overloads = 0
+
+    async def acquire(self, timeout: float) -> bool:
+        async with self._cond:
+            try:
+                await asyncio.wait_for(
+                    self._cond.wait_for(lambda: self.in_flight < int(self.limit)), timeout
+                )
+            except asyncio.TimeoutError:
+                return False
+            self.in_flight += 1
+            return True
+
+    async def release(self, overloaded: bool = False):
+        async with self._cond:
+            self.in_flight -= 1
+            if overloaded:
+                self.overloads += 1
+                ## 같은 혼잡 구간의 연속 429로 여러 번 줄이지 않도록 cooldown 적용
+                now = time.monotonic()
+                if now - self._last_backoff >= self.backoff_cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self._last_backoff = now
+            else:
+                self.successes += 1
+                ## 한 "윈도우"(limit 개 요청) 성공마다 +increase
+                self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self._cond.notify_all()
+
+class Permit:
+    """
+    ModelRateLimiter.acquire()로 얻은 동시성 슬롯. 반드시 release()로 반납합니다.
+    """
+    def __init__(self, limiter: AIMDLimiter):
+        self._limiter = limiter
+        self._released = False
+
+    async def release(self, error: Optional[BaseException] = None):
+        if self._released:
+            return
+        self._released = True
+        await self._limiter.release(overloaded=error is not None and is_overload_error(error))
+
+async def _maybe_await(value):
+    ## 공유 버킷(utils.shared_state)의 reserve/charge는 코루틴
+    if asyncio.iscoroutine(value):
+        return await value
+    return value
+
+class _ModelLimits:
+    def __init__(self, config: Dict[str, float], key: str = "default", shared_state=None):
+        rpm = config.get("rpm")
+        tpm = config.get("tpm")
+        if shared_state is not None:
+            self.requests = shared_state.token_bucket(f"{key}:rpm", rpm / 60.0, rpm) if rpm else None
+            self.tokens = shared_state.token_bucket(f"{key}:tpm", tpm / 60.0, tpm) if tpm else None
+        else:
+            self.requests = TokenBucket(rpm / 60.0, rpm) if rpm else None
+            self.tokens = TokenBucket(tpm / 60.0, tpm) if tpm else None
+        max_concurrency = config.get("max_concurrency", 64)
+        self.concurrency = AIMDLimiter(
+            initial=config.get("initial_concurrency", max_concurrency),
+            min_limit=config.get("min_concurrency", 1),
+            max_limit=max_concurrency,
+        )
+
+class ModelRateLimiter:
+    """
+    모델별 rpm/tpm 토큰 버킷 + AIMD 동시성 제어.
+    limits_config: {"모델 이름": {"rpm", "tpm", "max_concurrency", "initial_concurrency"}, "default": {...}}
+    shared_state: 지정하면 rpm/tpm 버킷을 워커 간에 공유합니다.
+    """
+    def __init__(
+        self,
+        limits_config: Dict[str, Dict[str, float]],
+        queue_timeout: float = 10.0,
+        max_retries: int = 2,
+        shared_state=None,
+        retry_base_delay: float = 0.5,
+        retry_max_delay: float = 8.0,
+    ):
+        self.limits_config = limits_config
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.shared_state = shared_state
+        ## 설정 키("모델 이름" 또는 "default") -> 한도
+        self._models: Dict[str, _ModelLimits] = {}
+
+    def _limits(self, model_name: str) -> _ModelLimits:
+        ## 설정에 없는 모델은 "default" 항목 하나를 공유
+        key = model_name if model_name in self.limits_config else "default"
+        limits = self._models.get(key)
+        if limits is None:
+            limits = _ModelLimits(self.limits_config.get(key, {}), key, self.shared_state)
+            self._models[key] = limits
+        return limits
+
+    async def acquire(self, model_name: str, tokens: int = 0) -> Permit:
+        """
+        rpm/tpm 예약 후 동시성 슬롯을 얻습니다. queue_timeout 안에 얻지 못하면 RateLimitExceeded.
+        """
+        limits = self._limits(model_name)
+        deadline = time.monotonic() + self.queue_timeout
+
+        reserved = []
+        try:
+            for bucket, amount, reason in ((limits.requests, 1, "rpm"), (limits.tokens, tokens, "tpm")):
+                if bucket is None or not amount:
+                    continue
+                wait = await _maybe_await(bucket.reserve(amount, max(0.0, deadline - time.monotonic())))
+                if wait is None:
+                    raise RateLimitExceeded(model_name, reason, (amount - bucket.tokens) / bucket.rate)
+                reserved.append((bucket, amount))
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+            if not await limits.concurrency.acquire(max(0.0, deadline - time.monotonic())):
+                raise RateLimitExceeded(model_name, "concurrency", 1.0)
+        except BaseException:
+            ## 슬롯을 얻지 못하면(시간 초과, 취소) 호출하지 않으므로 예약한 rpm/tpm을 돌려줌
+            for bucket, amount in reserved:
+                await _maybe_await(bucket.refund(amount))
+            raise
+        return Permit(limits.concurrency)
+
+    async def charge(self, model_name: str, tokens: int):
+        """
+        응답 후 알게 된 출력 토큰 등을 tpm 버킷에 추가 차감합니다.
+        """
+        bucket = self._limits(model_name).tokens
+        if bucket is not None and tokens:
+            await _maybe_await(bucket.charge(tokens))
+
+    def retry_delay(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        """
+        attempt번째(0부터) 재시도 전 대기 시간. retry-after가 있으면 그 값, 없으면 지수 백오프 + full jitter.
+        (동시에 429를 받은 요청들이 같은 순간에 다시 몰리지 않도록 분산)
+        """
+        retry_after = retry_after_seconds(error) if error is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.retry_max_delay)
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)))
+
+    async def run(
+        self,
+        model_name: str,
+        tokens: int,
+        call: Callable[[], Awaitable[Any]],
+        hold: bool = False,
+    ) -> Tuple[Any, Optional[Permit]]:
+        """
+        한도 안에서 call()을 실행합니다. 429/RESOURCE_EXHAUSTED면 동시성을 줄이고 retry_delay() 만큼 기다린 뒤
+        다시 대기열에 넣어 재시도합니다.
+        hold=True면 슬롯을 반납하지 않고 Permit을 함께 반환합니다 (스트리밍: 스트림 종료 시 반납).
+        """
+        for attempt in range(self.max_retries + 1):
+            permit = await self.acquire(model_name, tokens)
+            try:
+                result = await call()
+            except asyncio.CancelledError:
+                ## 클라이언트 연결 종료, hedge 패배 등으로 취소된 경우에도 슬롯 반납
+                await permit.release()
+                raise
+            except Exception as e:
+                await permit.release(e)
+                if is_overload_error(e) and attempt < self.max_retries:
+                    delay = self.retry_delay(attempt, e)
+                    logger.warning(
+                        "429/RESOURCE_EXHAUSTED, %.2fs 후 재시도 %d/%d: %s", delay, attempt + 1, self.max_retries, model_name
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+                raise
+            if hold:
+                return result, permit
+            await permit.release()
+            return result, None
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {}
+        for key, limits in self._models.items():
+            concurrency = limits.concurrency
+            stats[key] = {
+                "concurrency_limit": round(concurrency.limit, 2),
+                "in_flight": concurrency.in_flight,
+                "successes": concurrency.successes,
+                "overloads": concurrency.overloads,
+                "rpm_tokens": round(limits.requests.tokens, 2) if limits.requests else None,
+                "tpm_tokens": round(limits.tokens.tokens, 2) if limits.tokens else None,
+            }
+        return stats
+
+async def release_on_close(agen, permit: Permit, source=None):
+    """
+    스트리밍 응답이 끝나거나 중단될 때 동시성 슬롯을 반납합니다.
+    스트림 도중 발생한 오류(본문 예외 또는 source.error, 예: 중간 429)는 release(e)로 넘겨 AIMD 한도에 반영합니다.
+    source: 업스트림을 읽는 ChunkSource (ResponsePump). 펌프 스레드의 오류는 본문 예외가 아닌 error 속성으로 남습니다.
+    """
+    error = None
+    try:
+        async for item in agen:
+            yield item
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        if error is None and source is not None:
+            error = getattr(source, "error", None)
+        await permit.release(error)
+
+def make_rate_limiter_from_settings(settings, shared_state=None) -> Optional[ModelRateLimiter]:
+    """
+    RATE_LIMIT_ENABLED가 켜져 있으면 MODEL_RATE_LIMITS 설정으로 ModelRateLimiter를, 아니면 None을 반환합니다.
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    return ModelRateLimiter(
+        settings.MODEL_RATE_LIMITS,
+        queue_timeout=settings.RATE_LIMIT_QUEUE_TIMEOUT,
+        max_retries=settings.RATE_LIMIT_MAX_RETRIES,
+        shared_state=shared_state,
+        retry_base_delay=settings.RATE_LIMIT_RETRY_BASE_DELAY,
+        retry_max_delay=settings.RATE_LIMIT_RETRY_MAX_DELAY,
+    )
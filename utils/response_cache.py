@@ -0,0 +1,125 @@
+import json
+import hashlib
+import time
+from typing import Any, Dict, Optional
+
+from utils.log import get_logger
+
+logger = get_logger("response_cache")
+
+def make_cache_key(model_name: str, prompt: str, **generation_params) -> str:
+    """
+    모델 이름, 전체 생성 설정, 최종 프롬프트(TEST_SYSTEM_PROMPT 결합 결과)로 만든 SHA-256 키.
+    """
+    payload = json.dumps(
+        {"model_name": model_name, "generation_config": generation_params, "prompt": prompt},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    여러 워커가 공유하는 Redis 기반 응답 캐시.
+    결정적인 요청(temperature == 0)의 응답 텍스트와 usage_metadata를 저장합니다.
+
+    - 항목별 TTL(ttl)
+    - 항목 크기 상한(max_entry_bytes): 초과하는 응답은 저장하지 않습니다.
+    - 전체 항목 수 상한(max_entries): 인덱스(sorted set)에서 가장 오래된 항목부터 제거합니다.
+    """
+
+    def __init__(
+        self,
+        client,
+        ttl: int = 86400,
+        max_entry_bytes: int = 256 * 1024,
+        max_entries: int = 10000,
+        prefix: str = "llm:resp:",
+    ):
+        """
+        Args:
+            client: redis.asyncio.Redis 호환 클라이언트 (테스트에서는 fakeredis 사용 가능).
+        """
+        self.client = client
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self.index_key = f"{prefix}index"
+
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    @staticmethod
+    def is_cacheable(request) -> bool:
+        return request.temperature == 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = await self.client.get(self.prefix + key)
+        except Exception as e:
+            logger.warning("응답 캐시 조회 실패: %s", e)
+            return None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key: str, text: str, usage_metadata: Dict[str, int]) -> bool:
+        raw = json.dumps({"text": text, "usage_metadata": usage_metadata}, ensure_ascii=False)
+        if len(raw.encode("utf-8")) > self.max_entry_bytes:
+            self.skipped += 1
+            return False
+
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.set(self.prefix + key, raw, ex=self.ttl)
+                pipe.zadd(self.index_key, {key: time.time()})
+                ## TTL이 지난 인덱스 항목과 상한을 넘는 오래된 항목 정리
+                pipe.zremrangebyscore(self.index_key, 0, time.time() - self.ttl)
+                pipe.zrange(self.index_key, 0, -(self.max_entries + 1))
+                results = await pipe.execute()
+
+            overflow = results[-1]
+            if overflow:
+                async with self.client.pipeline(transaction=True) as pipe:
+                    pipe.delete(*[self.prefix + (k.decode() if isinstance(k, bytes) else k) for k in overflow])
+                    pipe.zrem(self.index_key, *overflow)
+                    await pipe.execute()
+        except Exception as e:
+            logger.warning("응답 캐시 저장 실패: %s", e)
+            return False
+        return True
+
+    async def close(self):
+        await self.client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "skipped_oversize": self.skipped,
+            "ttl": self.ttl,
+            "max_entry_bytes": self.max_entry_bytes,
+            "max_entries": self.max_entries,
+        }
+
+def make_response_cache_from_settings(settings) -> Optional[ResponseCache]:
+    """
+    RESPONSE_CACHE_ENABLED가 켜져 있으면 REDIS_URL로 접속하는 ResponseCache를, 아니면 None을 반환합니다.
+    """
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return None
+    import redis.asyncio as aioredis
+
+    client = aioredis.from_url(settings.REDIS_URL)
+    return ResponseCache(
+        client,
+        ttl=settings.RESPONSE_CACHE_TTL,
+        max_entry_bytes=settings.RESPONSE_CACHE_MAX_ENTRY_BYTES,
+        max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    )
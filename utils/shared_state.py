@@ -0,0 +1,207 @@
+"""
+멀티 워커(gunicorn/uvicorn --workers) 환경에서 워커끼리 공유하는 상태.
+
+- 토큰 버킷: 모델별 rpm/tpm 한도를 워커 수와 관계없이 전체 합계로 적용합니다.
+  (워커별 버킷이면 N 워커일 때 업스트림 한도의 N배까지 보내게 됨)
+- pub/sub: role 캐시 무효화 등 한 워커에서 일어난 이벤트를 모든 워커에 전달합니다.
+
+백엔드
+- RedisSharedState: REDIS_URL의 Redis 사용 (운영)
+- MemorySharedState: 프로세스 내부 구현. 단일 워커 또는 테스트용 stand-in
+  (RedisSharedState도 fakeredis 클라이언트로 테스트 가능)
+
+Prometheus 지표는 여기서 다루지 않고 PROMETHEUS_MULTIPROC_DIR(mmap 파일)로 합산합니다. (utils/metrics 참고)
+"""
+import json
+import time
+import random
+import asyncio
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.rate_limit import TokenBucket
+from utils.log import get_logger
+
+logger = get_logger("shared_state")
+
+ROLE_CACHE_CHANNEL = "role_cache:invalidate"
+
+class MemoryTokenBucket:
+    """
+    TokenBucket을 RedisTokenBucket과 같은 async 인터페이스로 감싼 것.
+    """
+    def __init__(self, rate_per_sec: float, capacity: float):
+        self._bucket = TokenBucket(rate_per_sec, capacity)
+        self.rate = rate_per_sec
+        self.capacity = capacity
+
+    @property
+    def tokens(self) -> float:
+        return self._bucket.tokens
+
+    async def reserve(self, amount: float, max_wait: float) -> Optional[float]:
+        return self._bucket.reserve(amount, max_wait)
+
+    async def charge(self, amount: float):
+        self._bucket.charge(amount)
+
+    async def refund(self, amount: float):
+        self._bucket.refund(amount)
+
+class RedisTokenBucket:
+    """
+    Redis에 저장하는 GCRA(Generic Cell Rate Algorithm) 버킷. TokenBucket과 동작이 같습니다.
+
+    남은 토큰 수 대신 "이론상 다음 도착 시각"(tat) 하나만 저장하므로
+    tokens = capacity - (tat - now) * rate 이고, 음수(부채) 예약도 그대로 표현됩니다.
+    WATCH/MULTI 낙관적 트랜잭션으로 갱신합니다 (Lua 스크립트 없이 fakeredis에서도 동작).
+    워커 안에서는 asyncio.Lock으로 직렬화하므로 충돌(재시도)은 워커 사이에서만 일어납니다.
+    시각은 각 워커의 time.time()을 쓰므로 워커들이 같은 호스트(또는 NTP 동기화)에 있다고 가정합니다.
+    """
+    def __init__(self, client, key: str, rate_per_sec: float, capacity: float, max_attempts: int = 20):
+        self.client = client
+        self.key = key
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self.max_attempts = max_attempts
+        self._lock = asyncio.Lock()
+        ## 마지막으로 관측한 값 (stats, Retry-After 계산용)
+        self.tokens = capacity
+
+    async def _update(self, amount: float, max_wait: Optional[float]) -> Optional[float]:
+        async with self._lock:
+            return await self._update_locked(amount, max_wait)
+
+    async def _update_locked(self, amount: float, max_wait: Optional[float]) -> Optional[float]:
+        from redis.exceptions import WatchError
+
+        ## 버킷이 가득 찬 뒤에는 키가 필요 없으므로 그 시점에 만료
+        ttl_ms = max(1000, int(self.capacity / self.rate * 1000) + 1000)
+        for _ in range(self.max_attempts):
+            async with self.client.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(self.key)
+                    raw = await pipe.get(self.key)
+                    now = time.time()
+                    tat = max(float(raw) if raw is not None else now, now)
+                    ## amount가 음수(반환)여도 now보다 앞당기지 않음 (가득 찬 버킷 이상으로 채우지 않음)
+                    new_tat = max(now, tat + amount / self.rate)
+                    ## 부채(now 이후로 밀린 시간)가 버킷 하나 분량을 넘는 만큼 대기
+                    wait = max(0.0, new_tat - now - self.capacity / self.rate)
+                    if max_wait is not None and wait > max_wait:
+                        await pipe.unwatch()
+                        self.tokens = self.capacity - (tat - now) * self.rate
+                        return None
+                    pipe.multi()
+                    pipe.set(self.key, repr(new_tat), px=ttl_ms + int((new_tat - now) * 1000))
+                    await pipe.execute()
+                except WatchError:
+                    ## 다른 워커가 먼저 갱신함 -> 잠깐 쉬고 다시 읽어 재시도
+                    await asyncio.sleep(random.uniform(0, 0.002))
+                    continue
+            self.tokens = self.capacity - (new_tat - now) * self.rate
+            return wait
+        raise RuntimeError(f"공유 버킷 갱신 경합이 계속됩니다: {self.key}")
+
+    async def reserve(self, amount: float, max_wait: float) -> Optional[float]:
+        """
+        amount 만큼 예약하고 기다려야 할 시간(초)을 반환합니다. max_wait을 넘으면 예약하지 않고 None.
+        """
+        return await self._update(min(amount, self.capacity), max_wait)
+
+    async def charge(self, amount: float):
+        await self._update(amount, None)
+
+    async def refund(self, amount: float):
+        ## 예약했지만 호출하지 않은 만큼 돌려줌
+        await self._update(-min(amount, self.capacity), None)
+
+class MemorySharedState:
+    """
+    프로세스 내부 공유 상태 (단일 워커 / 테스트용).
+    """
+    backend = "memory"
+
+    def __init__(self):
+        self._listeners: Dict[str, List[asyncio.Queue]] = {}
+
+    def token_bucket(self, name: str, rate_per_sec: float, capacity: float) -> MemoryTokenBucket:
+        return MemoryTokenBucket(rate_per_sec, capacity)
+
+    async def publish(self, channel: str, message: Dict[str, Any]):
+        for queue in self._listeners.get(channel, []):
+            queue.put_nowait(message)
+
+    async def listen(self, channel: str, handler: Callable[[Dict[str, Any]], Any]):
+        """
+        channel에 발행된 메시지마다 handler(message)를 호출하는 루프. 취소될 때까지 실행됩니다.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._listeners.setdefault(channel, []).append(queue)
+        try:
+            while True:
+                handler(await queue.get())
+        finally:
+            self._listeners[channel].remove(queue)
+
+    async def close(self):
+        pass
+
+class RedisSharedState:
+    """
+    Redis 기반 공유 상태. 키와 채널 이름에는 prefix를 붙입니다.
+    """
+    backend = "redis"
+
+    def __init__(self, client, prefix: str = "llm:shared:", reconnect_delay: float = 1.0):
+        """
+        Args:
+            client: redis.asyncio.Redis 호환 클라이언트 (테스트에서는 fakeredis 사용 가능).
+        """
+        self.client = client
+        self.prefix = prefix
+        self.reconnect_delay = reconnect_delay
+
+    def token_bucket(self, name: str, rate_per_sec: float, capacity: float) -> RedisTokenBucket:
+        return RedisTokenBucket(self.client, f"{self.prefix}bucket:{name}", rate_per_sec, capacity)
+
+    async def publish(self, channel: str, message: Dict[str, Any]):
+        await self.client.publish(self.prefix + channel, json.dumps(message))
+
+    async def listen(self, channel: str, handler: Callable[[Dict[str, Any]], Any]):
+        """
+        channel에 발행된 메시지마다 handler(message)를 호출하는 루프. 취소될 때까지 실행되며,
+        Redis 연결이 끊기면 reconnect_delay 후 다시 구독합니다.
+        """
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.prefix + channel)
+                async for item in pubsub.listen():
+                    if item.get("type") != "message":
+                        continue
+                    try:
+                        handler(json.loads(item["data"]))
+                    except Exception as e:
+                        logger.warning("공유 메시지 처리 실패 (%s): %s", channel, e)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("공유 상태 구독 끊김 (%s), 재연결합니다: %s", channel, e)
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                await pubsub.aclose()
+
+    async def close(self):
+        await self.client.aclose()
+
+def make_shared_state_from_settings(settings):
+    """
+    SHARED_STATE_BACKEND에 따라 RedisSharedState(REDIS_URL) / MemorySharedState / None을 반환합니다.
+    """
+    if settings.SHARED_STATE_BACKEND == "redis":
+        import redis.asyncio as aioredis
+
+        return RedisSharedState(aioredis.from_url(settings.REDIS_URL))
+    if settings.SHARED_STATE_BACKEND == "memory":
+        return MemorySharedState()
+    return None
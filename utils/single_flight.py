@@ -0,0 +1,327 @@
+"""
+동일한 요청의 single-flight 병합.
+
+같은 키(렌더링된 프롬프트 + 생성 설정의 해시)로 동시에 들어온 요청들은 업스트림 호출 1회를 공유합니다.
+결정적인 요청(temperature == 0)만 병합합니다. 샘플링 요청은 같은 설정이어도 요청마다 다른 응답을 기대하므로 병합하지 않습니다.
+- 비스트리밍: 먼저 온 요청(leader)의 호출 결과를 모두가 함께 받습니다.
+- 스트리밍: 업스트림 스트림 1개를 StreamBroadcast가 읽어 모든 구독자에게 나눠주고,
+  늦게 합류한 구독자에게는 이미 받은 청크부터 다시 재생합니다.
+  버퍼는 STREAM_QUEUE_MAXSIZE 개로 제한되어 가장 느린 구독자 속도에 맞춰 업스트림을 읽고,
+  STREAM_STALL_TIMEOUT 동안 읽지 않는 구독자는 내보냅니다. (단독 스트림의 ResponsePump와 같은 기준)
+"""
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from config.base import settings
+from utils.stream import ChunkSource, ResponsePump, StreamStalled, _STREAM_END
+from utils.log import get_logger
+
+logger = get_logger("single_flight")
+
+def _discard_result(task: asyncio.Future):
+    ## 모든 대기자가 떠난 호출의 예외가 "never retrieved" 경고로 남지 않도록 소비
+    if not task.cancelled():
+        task.exception()
+
+class StreamBroadcast:
+    """
+    업스트림 스트림 1개를 여러 구독자에게 전달합니다.
+
+    받은 청크는 늦게 합류한 구독자에게 재생하도록 items에 최대 max_buffer 개까지 보관합니다.
+    가득 차면 모든 구독자가 읽은 앞부분을 버리고, 그래도 자리가 없으면(가장 느린 구독자가 max_buffer 개 뒤처짐)
+    업스트림 읽기를 멈춥니다(backpressure). stall_timeout 동안 자리가 나지 않으면 가장 뒤처진 구독자를
+    StreamStalled로 내보냅니다. 앞부분을 버린 뒤에는 처음부터 재생할 수 없으므로 SingleFlight에서 분리하여
+    새 요청이 합류하지 않게 합니다.
+    """
+    def __init__(
+        self,
+        on_close: Callable[["StreamBroadcast"], None],
+        max_buffer: Optional[int] = None,
+        stall_timeout: Optional[float] = None,
+    ):
+        self.items: List[Tuple[str, float]] = []
+        self.done = False
+        self.completed = False
+        self.usage_metadata = None
+        self.error: Optional[BaseException] = None
+        self.start_time: Optional[float] = None
+        self.max_buffer = max_buffer or settings.STREAM_QUEUE_MAXSIZE
+        self.stall_timeout = stall_timeout or settings.STREAM_STALL_TIMEOUT
+        ## items[0]의 스트림 내 위치 (앞부분을 버린 개수)
+        self.base = 0
+        self.evicted = 0
+
+        self._subs: Set["Subscription"] = set()
+        self._on_close = on_close
+        self._changed = asyncio.Condition()
+        self._opened: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._finished = asyncio.Event()
+        self._source: Optional[ResponsePump] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, open_stream: Callable[[], Awaitable[Tuple[Any, float, Any]]]):
+        self._task = asyncio.ensure_future(self._run(open_stream))
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subs)
+
+    def _end(self) -> int:
+        return self.base + len(self.items)
+
+    def _consumed(self) -> int:
+        ## 모든 구독자가 이미 읽은 (버릴 수 있는) 보관 청크 수
+        return min(sub._index for sub in self._subs) - self.base if self._subs else 0
+
+    def _trim(self):
+        ## 모든 구독자가 읽은 청크를 버림 (_changed 잠금 안에서 호출)
+        consumed = self._consumed()
+        if consumed > 0:
+            del self.items[:consumed]
+            self.base += consumed
+            self._on_close(self)
+
+    def _evict_slowest(self):
+        slowest = min(sub._index for sub in self._subs)
+        for sub in [sub for sub in self._subs if sub._index == slowest]:
+            self._subs.discard(sub)
+            sub.stalled = StreamStalled(f"구독자가 {self.stall_timeout}초 동안 공유 스트림을 읽지 않았습니다.")
+            self.evicted += 1
+        logger.warning("공유 스트림을 읽지 않는 구독자를 내보냅니다 (남은 구독자 %d명)", len(self._subs))
+
+    async def _append(self, item) -> bool:
+        """
+        버퍼에 자리가 날 때까지 기다린 뒤 청크를 추가합니다. 남은 구독자가 없으면 False.
+        """
+        async with self._changed:
+            while self._subs and len(self.items) >= self.max_buffer:
+                self._trim()
+                if len(self.items) < self.max_buffer:
+                    break
+                try:
+                    await asyncio.wait_for(
+                        self._changed.wait_for(lambda: not self._subs or self._consumed() > 0),
+                        self.stall_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    self._evict_slowest()
+                    self._changed.notify_all()
+            if not self._subs:
+                return False
+            self.items.append(item)
+            self._changed.notify_all()
+            return True
+
+    async def opened(self):
+        ## 업스트림 호출 실패(429 등)는 StreamingResponse를 만들기 전에 모든 구독자에게 전달
+        await asyncio.shield(self._opened)
+
+    async def _run(self, open_stream):
+        permit = None
+        try:
+            try:
+                response, self.start_time, permit = await open_stream()
+            except asyncio.CancelledError:
+                self._opened.cancel()
+                raise
+            except Exception as e:
+                self._opened.set_exception(e)
+                self._opened.exception()
+                return
+            self._opened.set_result(None)
+
+            ## 펌프 큐의 대기 한도는 구독자 eviction(stall_timeout)보다 길게 두어,
+            ## 느린 구독자 한 명 때문에 업스트림 전체가 끊기지 않게 함
+            self._source = ResponsePump(response, stall_timeout=self.stall_timeout * 2)
+            while True:
+                item = await self._source.get()
+                if item is _STREAM_END:
+                    break
+                if not await self._append(item):
+                    ## 모든 구독자가 내보내짐 -> 업스트림 중단
+                    self._on_close(self)
+                    self._source.cancel()
+                    self.error = StreamStalled("공유 스트림의 모든 구독자가 읽기를 멈췄습니다.")
+                    break
+            self.completed = await self._source.wait() and self.error is None
+            self.error = self.error or self._source.error
+            self.usage_metadata = response.usage_metadata
+        except Exception as e:
+            self.error = e
+            logger.warning("공유 스트림 처리 중 오류: %s", e)
+        finally:
+            self.done = True
+            self._on_close(self)
+            async with self._changed:
+                self._changed.notify_all()
+            self._finished.set()
+            if permit is not None:
+                await permit.release(self.error)
+
+    def subscribe(self) -> "Subscription":
+        ## 처음부터 재생할 수 있을 때만 합류 (SingleFlight는 base > 0이 되면 분리하므로 항상 0)
+        subscription = Subscription(self)
+        subscription._index = self.base
+        self._subs.add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: "Subscription", finished: bool) -> bool:
+        """
+        마지막 구독자가 중간에 떠나 업스트림 생성을 멈췄으면 True.
+        """
+        if subscription not in self._subs:
+            ## 이미 내보낸 구독자
+            return False
+        self._subs.discard(subscription)
+        ## 버퍼 자리를 기다리는 업스트림 읽기 루프를 깨움
+        self._notify()
+        ## 남은 구독자가 없으면 업스트림 읽기를 멈추고 새 요청이 합류하지 않도록 분리
+        if not finished and not self._subs and not self.done:
+            self._on_close(self)
+            if self._source is not None:
+                self._source.cancel()
+            if self._task is not None:
+                self._task.cancel()
+            return True
+        return False
+
+    def _notify(self):
+        async def _wake():
+            async with self._changed:
+                self._changed.notify_all()
+        if not self.done:
+            asyncio.ensure_future(_wake())
+
+class Subscription(ChunkSource):
+    """
+    StreamBroadcast의 구독자 1명. 합류 전에 도착한 청크는 합류 시각 기준으로 재생합니다.
+    """
+    def __init__(self, broadcast: StreamBroadcast):
+        self.broadcast = broadcast
+        self.joined_at = time.perf_counter()
+        ## 다음에 읽을 청크의 스트림 내 위치
+        self._index = 0
+        self._closed = False
+        ## 너무 오래 읽지 않아 내보내졌으면 StreamStalled
+        self.stalled: Optional[StreamStalled] = None
+
+    @property
+    def usage_metadata(self):
+        return self.broadcast.usage_metadata
+
+    @property
+    def error(self):
+        return self.stalled or self.broadcast.error
+
+    async def get(self):
+        broadcast = self.broadcast
+        async with broadcast._changed:
+            await broadcast._changed.wait_for(
+                lambda: self.stalled is not None or self._index < broadcast._end() or broadcast.done
+            )
+            if self.stalled is None and self._index < broadcast._end():
+                text, arrived_at = broadcast.items[self._index - broadcast.base]
+                self._index += 1
+                ## 버퍼 자리를 기다리는 업스트림 읽기 루프를 깨움
+                broadcast._changed.notify_all()
+                return text, max(arrived_at, self.joined_at)
+        self._close(finished=self.stalled is None)
+        return _STREAM_END
+
+    def cancel(self) -> bool:
+        return self._close(finished=False)
+
+    def _close(self, finished: bool) -> bool:
+        if not self._closed:
+            self._closed = True
+            return self.broadcast._unsubscribe(self, finished)
+        return False
+
+    async def wait(self) -> bool:
+        if self.stalled is not None:
+            return False
+        await self.broadcast._finished.wait()
+        return self.broadcast.completed and self._index == self.broadcast._end()
+
+class SingleFlight:
+    """
+    키별 진행 중 호출 테이블. 이벤트 루프 스레드에서만 사용합니다.
+    """
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._streams: Dict[str, StreamBroadcast] = {}
+
+        self.leaders = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def is_coalescable(request) -> bool:
+        ## 응답 캐시(ResponseCache.is_cacheable)와 같은 기준: 같은 입력이면 같은 출력이 기대되는 요청만
+        return request.temperature == 0
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        같은 key의 호출이 진행 중이면 그 결과를, 아니면 call()을 실행한 결과를 반환합니다.
+        반환: (결과, 다른 요청의 호출을 공유했는지 여부)
+        leader가 중간에 취소돼도 호출은 계속되어 나머지 요청이 결과를 받습니다.
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+
+            def _done(_):
+                if self._calls.get(key) is task:
+                    del self._calls[key]
+                _discard_result(task)
+            task.add_done_callback(_done)
+        return await asyncio.shield(task), shared
+
+    async def stream(
+        self,
+        key: str,
+        open_stream: Callable[[], Awaitable[Tuple[Any, float, Any]]],
+    ) -> Tuple[Subscription, float, bool]:
+        """
+        같은 key의 스트림이 진행 중이면 구독하고, 아니면 open_stream()으로 업스트림 스트림을 엽니다.
+        open_stream(): (동기 Gemini 스트림, 시작 시각, 종료 시 release()할 permit 또는 None)
+        반환: (구독, 시작 시각, 공유 여부). 공유한 요청의 시작 시각은 합류 시각입니다.
+        """
+        broadcast = self._streams.get(key)
+        shared = broadcast is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+
+            def _close(b: StreamBroadcast):
+                if self._streams.get(key) is b:
+                    del self._streams[key]
+
+            broadcast = StreamBroadcast(_close)
+            self._streams[key] = broadcast
+            broadcast.start(open_stream)
+
+        subscription = broadcast.subscribe()
+        try:
+            await broadcast.opened()
+        except BaseException:
+            subscription.cancel()
+            raise
+        start_time = subscription.joined_at if shared else broadcast.start_time
+        return subscription, start_time, shared
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.leaders + self.coalesced
+        return {
+            "upstream_calls": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesce_ratio": round(self.coalesced / total, 4) if total else 0.0,
+            "in_flight_calls": len(self._calls),
+            "in_flight_streams": len(self._streams),
+        }
@@ -0,0 +1,78 @@
+"""
+서버 시작 단계 추적과 준비 상태(readiness).
+
+각 초기화 단계의 상태/소요 시간을 기록하고, 모든 단계가 끝나야 ready가 됩니다.
+/_internal/ready 는 ready가 되기 전까지 503을 반환합니다.
+ReadinessMiddleware는 준비가 끝나기 전의 일반 요청에도 503을 반환합니다 (백그라운드 시작 시 app.state 미설정 방지).
+"""
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from utils.log import get_logger
+
+logger = get_logger("startup")
+
+class StartupTracker:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.ready = False
+        self.ready_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+
+    @asynccontextmanager
+    async def step(self, name: str):
+        self.steps[name] = {"status": "running"}
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.steps[name] = {"status": "failed", "seconds": round(time.perf_counter() - start, 4), "error": str(e)}
+            raise
+        self.steps[name] = {"status": "done", "seconds": round(time.perf_counter() - start, 4)}
+
+    def mark_ready(self):
+        self.ready = True
+        self.ready_seconds = round(time.perf_counter() - self.started_at, 4)
+        logger.info("ready", extra={"ready_seconds": self.ready_seconds, "steps": self.steps})
+
+    def mark_failed(self, e: BaseException):
+        self.error = str(e)
+        logger.error("startup failed: %s", e)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "ready_seconds": self.ready_seconds,
+            "error": self.error,
+            "steps": self.steps,
+        }
+
+class ReadinessMiddleware:
+    """
+    app.state.startup(StartupTracker)이 ready가 되기 전에는 exempt_prefixes 이외의 HTTP 요청에 503을 반환합니다.
+    시작이 실패했으면 error를 함께 반환합니다.
+    """
+    def __init__(self, app: ASGIApp, exempt_prefixes: Tuple[str, ...] = ("/_internal", "/metrics", "/static"), retry_after: int = 1):
+        self.app = app
+        self.exempt_prefixes = exempt_prefixes
+        self.retry_after = retry_after
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        tracker = getattr(scope["app"].state, "startup", None) if "app" in scope else None
+        if tracker is not None and tracker.ready:
+            await self.app(scope, receive, send)
+            return
+
+        detail = "서버 시작 실패" if tracker is not None and tracker.error else "서버를 준비하는 중입니다."
+        content = {"detail": detail, **(tracker.status() if tracker is not None else {"ready": False})}
+        response = JSONResponse(content, status_code=503, headers={"Retry-After": str(self.retry_after)})
+        await response(scope, receive, send)
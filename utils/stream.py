@@ -1,40 +1,294 @@
 import json 
 import asyncio
+import threading
 import time
+import concurrent.futures
 
+from config.base import settings
+from model.gemini_utils import get_stream_executor
 from utils.cost import calculate_cost
+from utils.preflight import approx_tokens
+from utils.timing import StreamTimer
+from utils import metrics
+from utils.log import get_logger
 
-async def stream_generator(response, model_name: str, start_time: float):
+logger = get_logger("stream")
 
+## 스트림 종료를 알리는 센티널
+_STREAM_END = object()
+## 취소 토큰이 먼저 완료되었음을 알리는 센티널
+_STREAM_CANCELLED = object()
+
+def _abort_upstream(response):
+    """
+    업스트림 스트림을 끊어, 다음 청크를 기다리며 블로킹 중인 펌프 스레드가 바로 돌아오게 합니다.
+    (fake 백엔드: cancel(), Gemini gRPC: 내부 스트리밍 호출의 cancel(), REST: close())
+    """
+    for target in (response, getattr(response, "_iterator", None)):
+        abort = getattr(target, "cancel", None) or getattr(target, "close", None)
+        if callable(abort):
+            try:
+                abort()
+            except Exception as e:
+                logger.debug("업스트림 스트림 중단 실패: %s", e)
+            return
+
+class StreamStalled(Exception):
+    """
+    클라이언트가 STREAM_STALL_TIMEOUT 동안 버퍼를 비우지 않아 업스트림 읽기를 중단함.
+    """
+
+def _put(queue: asyncio.Queue, loop, item, timeout: float):
+    ## 큐가 가득 차 있으면 최대 timeout초 동안만 대기 (backpressure)
+    future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+    try:
+        future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise StreamStalled(f"클라이언트가 {timeout}초 동안 스트림을 읽지 않았습니다.")
+
+def _pump_stream(response, queue: asyncio.Queue, loop, stop: threading.Event, stall_timeout: float):
+    """
+    펌프 전용 스레드에서 동기 Gemini 스트림을 순회하며 청크를 asyncio.Queue로 넘깁니다.
+    큐가 가득 차면 이 스레드가 최대 stall_timeout초 대기하므로(backpressure) 느린 클라이언트 때문에
+    메모리가 늘어나지 않고, 그보다 오래 읽지 않으면 업스트림을 끊고 스레드를 반납합니다.
+    (끝까지 정상적으로 순회했는지, 업스트림 오류) 를 반환합니다.
+    """
+    completed = False
+    error = None
     try:
         for chunk in response:
-            if chunk.text:
-                yield chunk.text
-                await asyncio.sleep(0)
+            if stop.is_set():
+                break
+            try:
+                text = chunk.text
+            except ValueError:
+                ## 텍스트가 없는 청크(안전 필터 등)는 건너뜀
+                continue
+            if text:
+                ## 청크 도착 시각을 함께 넘겨 TTFT/청크 간격을 정확히 측정
+                _put(queue, loop, (text, time.perf_counter()), stall_timeout)
+        else:
+            ## 취소(_abort_upstream)로 순회가 일찍 끝난 경우는 완료가 아님
+            completed = not stop.is_set()
+    except StreamStalled as e:
+        error = e
+        logger.warning("스트림 읽기 지연으로 업스트림을 중단합니다: %s", e)
+        _abort_upstream(response)
     except Exception as e:
-        pass
-        # print(f"스트리밍 중 오류 발생: {e}")
-        # yield f"\n\n오류: 스트리밍 중 문제가 발생했습니다: {e}"
+        if not stop.is_set():
+            error = e
+            logger.warning("업스트림 스트림 오류: %s", e)
+    finally:
+        if not stop.is_set():
+            ## 종료 표시는 기다리지 않고 넘김 (소비자가 읽거나 취소하면 이벤트 루프에서 완료됨)
+            try:
+                asyncio.run_coroutine_threadsafe(queue.put(_STREAM_END), loop)
+            except RuntimeError:
+                pass
+    return completed, error
+
+class ChunkSource:
+    """
+    stream_generator가 읽는 청크 공급원.
+    get(): (text, 도착 시각) 또는 _STREAM_END, cancel(): 중간 종료, wait(): 끝까지 받았는지 여부.
+    error: 업스트림 오류로 끝났으면 그 예외 (wait() 이후 유효).
+    """
+    usage_metadata = None
+    error = None
+
+    async def get(self):
+        raise NotImplementedError
+
+    def cancel(self) -> bool:
+        """
+        업스트림 생성까지 멈췄으면 True (다른 구독자가 남아 계속 생성되는 경우 등은 False).
+        """
+        return False
+
+    async def wait(self) -> bool:
+        raise NotImplementedError
+
+class ResponsePump(ChunkSource):
+    """
+    동기 Gemini 스트림 1개를 스트림 펌프 전용 스레드에서 읽어 큐로 넘깁니다.
+    """
+    def __init__(self, response, stall_timeout: float = None):
+        loop = asyncio.get_running_loop()
+        self.response = response
+        self.queue = asyncio.Queue(maxsize=settings.STREAM_QUEUE_MAXSIZE)
+        self.stop = threading.Event()
+        self.pump = loop.run_in_executor(
+            get_stream_executor(), _pump_stream, response, self.queue, loop, self.stop,
+            stall_timeout or settings.STREAM_STALL_TIMEOUT,
+        )
+
+    @property
+    def usage_metadata(self):
+        # Gemini API는 스트림이 끝나면 usage_metadata를 제공합니다.
+        return self.response.usage_metadata
+
+    async def get(self):
+        return await self.queue.get()
+
+    def cancel(self) -> bool:
+        ## 클라이언트가 중간에 끊긴 경우: 펌프를 멈추고, 대기 중인 put이 끝나도록 큐를 비웁니다.
+        self.stop.set()
+        _abort_upstream(self.response)
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        return True
+
+    async def wait(self) -> bool:
+        completed, self.error = await self.pump
+        return completed
+
+async def _next_item(source: ChunkSource, cancel_token):
+    ## 다음 청크와 취소 신호 중 먼저 오는 것 (취소 토큰이 없으면 청크만 기다림)
+    if cancel_token is None:
+        return await source.get()
+    get = asyncio.ensure_future(source.get())
+    try:
+        await asyncio.wait((get, cancel_token.future), return_when=asyncio.FIRST_COMPLETED)
+    except BaseException:
+        get.cancel()
+        raise
+    if get.done():
+        return get.result()
+    get.cancel()
+    return _STREAM_CANCELLED
+
+def _record_cancel(model_name: str, reason: str, texts, max_output_tokens, upstream_stopped: bool):
+    """
+    취소된 스트림 수와, 취소로 생성하지 않은 출력 토큰 수(max_output_tokens - 받은 토큰, 상한 추정)를 기록합니다.
+    """
+    label = metrics.model_label(model_name)
+    metrics.CANCELLED_STREAMS.labels(label, reason).inc()
+    received_tokens = approx_tokens("".join(texts))
+    saved_tokens = max(0, max_output_tokens - received_tokens) if upstream_stopped and max_output_tokens else 0
+    if saved_tokens:
+        metrics.CANCEL_SAVED_TOKENS.labels(label).inc(saved_tokens)
+    logger.info(
+        "stream cancelled",
+        extra={"model": model_name, "reason": reason, "received_tokens": received_tokens, "saved_tokens": saved_tokens},
+    )
+    return received_tokens, saved_tokens
+
+async def stream_generator(
+    response,
+    model_name: str,
+    start_time: float,
+    on_complete=None,
+    cached: bool = False,
+    coalesced: bool = False,
+    extra_metadata=None,
+    cancel_token=None,
+    max_output_tokens=None,
+):
+    """
+    Gemini 스트림을 텍스트 청크로 흘려보내고 마지막에 메타데이터를 붙입니다.
+
+    response: 동기 Gemini 스트림 또는 ChunkSource (single-flight 구독 등).
+    on_complete: 스트림이 끝까지 전송되면 (전체 텍스트, usage_metadata, 메타데이터 dict)로 호출되는 코루틴 함수.
+    cached: 캐시에서 재생한 응답이면 True (비용 0으로 표시).
+    coalesced: 다른 요청의 업스트림 스트림을 공유한 응답이면 True (비용 0으로 표시).
+    extra_metadata: 메타데이터에 덧붙일 항목 (pre-flight 추정치 등).
+    cancel_token: CancelToken. 취소되면 업스트림을 끊고, 명시적 취소(/cancel)면 취소 메타데이터를 보낸 뒤 종료합니다.
+    max_output_tokens: 취소로 아낀 출력 토큰 수 추정에 사용.
+    """
+
+    source = response if isinstance(response, ChunkSource) else ResponsePump(response)
+
+    timer = StreamTimer(start_time)
+    texts = []
+    finished = False
+    cancel_reason = None
+    cancel_info = None
+    try:
+        while True:
+            item = await _next_item(source, cancel_token)
+            if item is _STREAM_CANCELLED:
+                cancel_reason = cancel_token.reason
+                break
+            if item is _STREAM_END:
+                finished = True
+                break
+            text, arrived_at = item
+            timer.mark_chunk(arrived_at)
+            texts.append(text)
+            yield text
+    finally:
+        if not finished:
+            ## 취소 토큰 없이 중단된 경우(제너레이터 close/취소)는 전송 중 클라이언트 연결이 끊긴 경우
+            upstream_stopped = source.cancel() and not cached
+            cancel_info = _record_cancel(
+                model_name, cancel_reason or "disconnect", texts, max_output_tokens, upstream_stopped
+            )
+
+    if cancel_reason is not None:
+        ## 연결이 끊긴 클라이언트에는 보낼 수 없으므로 명시적 취소일 때만 취소 메타데이터 전송
+        if cancel_reason != "disconnect":
+            received_tokens, saved_tokens = cancel_info
+            metadata = {
+                "cancelled": True,
+                "cancel_reason": cancel_reason,
+                "output_tokens": received_tokens,
+                "saved_output_tokens": saved_tokens,
+                "inference_time": round(time.perf_counter() - start_time, 4),
+                **(extra_metadata or {}),
+            }
+            yield f"\n<--METADATA-->\n{json.dumps(metadata)}"
+        return
+
+    completed = await source.wait()
+
+    if source.error is not None:
+        ## 업스트림 오류로 중간에 끝난 스트림: 정상 종료처럼 보이지 않도록 오류 메타데이터를 전송
+        error = source.error
+        logger.warning("스트림이 업스트림 오류로 종료되었습니다 (%s): %s", model_name, error)
+        metrics.record_error(error, 502)
+        metadata = {
+            "error": f"{type(error).__name__}: {error}",
+            "output_tokens": approx_tokens("".join(texts)),
+            "inference_time": round(time.perf_counter() - start_time, 4),
+            "cached": cached,
+            "coalesced": coalesced,
+            **(extra_metadata or {}),
+        }
+        yield f"\n<--METADATA-->\n{json.dumps(metadata)}"
+        return
 
     end_time = time.perf_counter()
     # inference_time_ms = (end_time - start_time) * 1000
     inference_time_s = round((end_time - start_time), 4)
     # print(f"Inference Time: {inference_time_ms:.4f} ms")
-    print(f"Inference Time: {inference_time_s:.4f} s")
+    logger.info("inference", extra={"model": model_name, "stream": True, "inference_time": inference_time_s})
 
     try:
-        # Gemini API는 스트림이 끝나면 usage_metadata를 제공합니다.
-        usage_metadata = response.usage_metadata
+        usage_metadata = source.usage_metadata
         input_tokens = usage_metadata.prompt_token_count
         output_tokens = usage_metadata.candidates_token_count
-        cost = calculate_cost(model_name, input_tokens, output_tokens)
+        cached_tokens = getattr(usage_metadata, "cached_content_token_count", 0) or 0
+        cost = 0.0 if cached or coalesced else calculate_cost(model_name, input_tokens, output_tokens, cached_tokens)
 
         metadata = {
             "input_tokens": input_tokens,
+            "cached_input_tokens": cached_tokens,
+            "fresh_input_tokens": input_tokens - cached_tokens,
             "output_tokens": output_tokens,
             "cost": cost,
-            "inference_time": round(inference_time_s, 4)
+            "inference_time": round(inference_time_s, 4),
+            "cached": cached,
+            "coalesced": coalesced,
+            **timer.summary(output_tokens, end_time),
+            **(extra_metadata or {}),
         }
+
+        label = metrics.model_label(model_name)
+        if timer.ttft is not None:
+            metrics.TTFT.labels(label, "true").observe(timer.ttft)
+        metrics.record_usage(model_name, input_tokens, output_tokens, cost, cached_tokens)
+
         metadata_json_string = json.dumps(metadata)
         
         # 프론트엔드와 약속한 구분자와 함께 메타데이터 전송
@@ -42,4 +296,11 @@ async def stream_generator(response, model_name: str, start_time: float):
         await asyncio.sleep(0)
 
     except Exception as e:
-        print(f"메타데이터 처리 중 오류: {e}")
+        logger.warning("메타데이터 처리 중 오류: %s", e)
+        return
+
+    if on_complete is not None and completed:
+        try:
+            await on_complete("".join(texts), usage_metadata, metadata)
+        except Exception as e:
+            logger.warning("스트림 완료 콜백 처리 중 오류: %s", e)
@@ -0,0 +1,55 @@
+import math
+import time
+from typing import Dict, List, Optional, Sequence
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """
+    nearest-rank 방식의 백분위수 (q: 0~100). 값이 없으면 0.0.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+class StreamTimer:
+    """
+    요청 1건의 스트리밍 지연 지표를 기록합니다.
+
+    - ttft: 요청 시작부터 첫 청크 도착까지(초)
+    - inter_chunk_gap_ms: 연속된 청크 사이 간격 분포 (p50/p95/max/mean)
+    - tokens_per_sec: 첫 청크 이후 출력 토큰 생성 속도
+    """
+
+    def __init__(self, start_time: float):
+        self.start_time = start_time
+        self.chunk_times: List[float] = []
+
+    def mark_chunk(self, t: Optional[float] = None):
+        self.chunk_times.append(time.perf_counter() if t is None else t)
+
+    @property
+    def ttft(self) -> Optional[float]:
+        return self.chunk_times[0] - self.start_time if self.chunk_times else None
+
+    def summary(self, output_tokens: int, end_time: Optional[float] = None) -> Dict:
+        end_time = time.perf_counter() if end_time is None else end_time
+        gaps_ms = [(b - a) * 1000 for a, b in zip(self.chunk_times, self.chunk_times[1:])]
+
+        ## 첫 청크 이후 생성 구간 기준. 청크가 1개뿐이면(비스트리밍 포함) 전체 시간 기준
+        first = self.chunk_times[0] if len(self.chunk_times) > 1 else self.start_time
+        generation_s = end_time - first
+        tokens_per_sec = output_tokens / generation_s if generation_s > 0 and output_tokens else 0.0
+
+        ttft = self.ttft
+        return {
+            "ttft": round(ttft, 4) if ttft is not None else None,
+            "chunk_count": len(self.chunk_times),
+            "inter_chunk_gap_ms": {
+                "p50": round(percentile(gaps_ms, 50), 2),
+                "p95": round(percentile(gaps_ms, 95), 2),
+                "max": round(max(gaps_ms), 2) if gaps_ms else 0.0,
+                "mean": round(sum(gaps_ms) / len(gaps_ms), 2) if gaps_ms else 0.0,
+            },
+            "tokens_per_sec": round(tokens_per_sec, 2),
+        }